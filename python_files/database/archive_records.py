@@ -0,0 +1,37 @@
+"""Перенос старых отчетов и журнала инвентаризации в архив (archive.db).
+
+Строки старше границы (по умолчанию keep_days дней из раздела "archive"
+db_config.json) переносятся порциями, приложение при этом может работать.
+Выборки истории и отчетов за старые даты сами подключают архив.
+
+Запуск из корня проекта:
+    python -m python_files.database.archive_records               # граница из настроек
+    python -m python_files.database.archive_records 2024-01-01    # все, что раньше этой даты
+"""
+import sys
+from datetime import datetime
+
+from python_files.database.database_handler import DatabaseHandler
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cutoff = argv[0] if argv else None
+    if cutoff is not None:
+        try:
+            datetime.strptime(cutoff, "%Y-%m-%d")
+        except ValueError:
+            print(f"❌ Граница архивации должна быть датой ГГГГ-ММ-ДД, а не '{cutoff}'")
+            return 1
+    db = DatabaseHandler()
+    try:
+        print(f"🔄 Архивация в {db.archive_path}...")
+        db.archive_old_records(cutoff, progress=lambda logs, reports: print(
+            f"🔄 Перенесено: {logs} строк журнала, {reports} отчетов"))
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
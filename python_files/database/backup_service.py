@@ -0,0 +1,158 @@
+"""Резервное копирование company.db на ходу через SQLite backup API.
+
+Копия снимается порциями по pages_per_step страниц, между порциями
+соединение отпускает файл и выжидает step_pause_ms, так что окна
+приложения продолжают работать.
+На все время копирования на исходной БД держится транзакция чтения:
+в режиме WAL она не мешает записи, а копия получается согласованным
+снимком на момент начала (без нее каждая чужая запись перезапускала бы
+копирование с начала).
+
+Готовая копия проверяется PRAGMA integrity_check и только после этого
+получает свое имя; из старых копий остаются последние keep.
+
+Запуск из корня проекта:
+    python -m python_files.database.backup_service
+"""
+import glob
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from python_files.database.db_config import get_backup_settings
+
+BACKUP_PREFIX = "company_"
+BACKUP_SUFFIX = ".db"
+
+
+class BackupError(Exception):
+    """Копия не создана: копирование прервано или не прошла проверку"""
+
+
+class BackupService:
+    """Снятие, проверка и ротация резервных копий одного файла БД.
+
+    backup() можно вызывать из фонового потока; progress(скопировано,
+    всего) вызывается в том же потоке после каждой порции. cancel()
+    из любого потока прерывает идущее копирование.
+    """
+
+    def __init__(self, db_path, backup_dir=None, keep=None, pages_per_step=None, step_pause_ms=None):
+        settings = get_backup_settings()
+        self.db_path = db_path
+        self.backup_dir = backup_dir or settings["dir"]
+        self.keep = settings["keep"] if keep is None else keep
+        self.pages_per_step = pages_per_step or settings["pages_per_step"]
+        self.step_pause_ms = settings["step_pause_ms"] if step_pause_ms is None else step_pause_ms
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def backup(self, progress=None):
+        """Снимок БД в backup_dir; возвращает путь к проверенной копии"""
+        self._cancelled.clear()
+        os.makedirs(self.backup_dir, exist_ok=True)
+        # С микросекундами: две копии в одну секунду не заменяют друг друга,
+        # а сортировка по имени остается сортировкой по времени
+        name = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}{BACKUP_SUFFIX}"
+        path = os.path.join(self.backup_dir, name)
+        part_path = path + ".part"
+
+        def on_step(status, remaining, total):
+            if self._cancelled.is_set():
+                raise BackupError("Резервное копирование отменено")
+            if progress:
+                progress(total - remaining, total)
+            # Пауза отдает диск и процессор запросам окон
+            if remaining and self.step_pause_ms:
+                time.sleep(self.step_pause_ms / 1000)
+
+        try:
+            self._copy(part_path, on_step)
+            self._verify(part_path)
+            os.replace(part_path, path)
+        except BaseException:
+            self._remove(part_path)
+            raise
+
+        removed = self.rotate()
+        print(f"✅ Резервная копия: {path}" + (f" (удалено старых: {len(removed)})" if removed else ""))
+        return path
+
+    def _copy(self, part_path, on_step):
+        self._remove(part_path)
+        source = sqlite3.connect(self.db_path, isolation_level=None)
+        target = sqlite3.connect(part_path)
+        try:
+            source.execute("PRAGMA busy_timeout = 10000")
+            # Снимок на все время копирования (см. описание модуля)
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            try:
+                source.backup(target, pages=self.pages_per_step, progress=on_step)
+            finally:
+                source.execute("ROLLBACK")
+            # Копия - один самодостаточный файл, без -wal и -shm рядом
+            target.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            target.close()
+            source.close()
+
+    @staticmethod
+    def _verify(part_path):
+        conn = sqlite3.connect(part_path)
+        try:
+            result = [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()]
+        finally:
+            conn.close()
+        if result != ["ok"]:
+            raise BackupError(f"Копия не прошла проверку целостности: {'; '.join(result[:5])}")
+
+    def list_backups(self):
+        """Готовые копии, новые первыми"""
+        pattern = os.path.join(self.backup_dir, f"{BACKUP_PREFIX}*{BACKUP_SUFFIX}")
+        return sorted(glob.glob(pattern), reverse=True)
+
+    def rotate(self):
+        """Удаление копий сверх keep последних; возвращает удаленные пути"""
+        removed = self.list_backups()[self.keep:] if self.keep > 0 else []
+        for path in removed:
+            self._remove(path)
+        return removed
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def main():
+    from python_files.database.database_handler import DatabaseHandler
+
+    db = DatabaseHandler(pool_size=0)
+    db.close()
+    service = BackupService(db.db_path)
+    last_percent = [-1]
+
+    def show_progress(copied, total):
+        percent = copied * 100 // total if total else 100
+        if percent // 10 != last_percent[0] // 10:
+            print(f"🔄 Скопировано {percent}% ({copied} из {total} страниц)")
+        last_percent[0] = percent
+
+    try:
+        service.backup(show_progress)
+    except (BackupError, sqlite3.Error, OSError) as e:
+        print(f"❌ Резервная копия не создана: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
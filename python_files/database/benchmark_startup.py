@@ -0,0 +1,109 @@
+"""Замер обращений к БД при запуске окна отчетности (ReportWindow).
+
+Повторяет ту же последовательность вызовов DatabaseHandler, что выполняют
+ReportWindow.setup_tabs() и load_initial_data(), на временной копии БД с
+тестовыми данными. Сравнивает старый режим (новое соединение на каждый
+вызов, pool_size=0), пул соединений и пул вместе с кэшем справочников.
+
+Запуск из корня проекта:
+    python -m python_files.database.benchmark_startup
+"""
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from python_files.database.database_handler import DatabaseHandler
+
+ROUNDS = 50
+
+
+def fill_test_data(db, branches=3, floors=5, rooms_per_floor=10, equipment_per_room=5):
+    """Тестовые данные, по объему похожие на реальную БД"""
+    for b in range(1, branches + 1):
+        branch_id = db.add_branch(f"Филиал №{b}", floors, f"ул. Тестовая, {b}")
+        for e in range(10):
+            db.add_employee(f"Сотрудник {b}-{e}", "Медсестра", "2024-01-01", branch_id)
+        for floor in range(1, floors + 1):
+            for r in range(1, rooms_per_floor + 1):
+                room_id = db.add_room(f"{floor}{r:02d}", f"Кабинет {floor}{r:02d}", branch_id, floor, capacity=4)
+                for n in range(equipment_per_room):
+                    equip_id = db.add_equipment({
+                        'name': f"Монитор {n}",
+                        'category': "Оргтехника",
+                        'type': "Монитор",
+                        'serial_number': f"SN-{branch_id}-{room_id}-{n}",
+                    })
+                    db.update_equipment_room(equip_id, room_id)
+
+
+def report_window_startup(db_path, pool_size, use_cache=False):
+    """Вызовы БД при открытии ReportWindow и первом выборе комнаты.
+
+    Возвращает статистику кэша (или None без кэша).
+    """
+    db = DatabaseHandler(db_path, pool_size=pool_size, use_cache=use_cache)
+    if db.cache is not None:
+        db.cache.clear()  # каждый повтор - как первый запуск программы
+        db.cache.hits = db.cache.misses = 0
+
+    # setup_arrival_tab / setup_inventory_tab / setup_distribution_tab
+    for _ in range(6):
+        db.get_all_branches()
+    for _ in range(4):
+        db.get_employees()
+    db.get_all_equipment()
+    db.get_all_equipment()
+
+    # load_initial_data
+    for _ in range(6):
+        db.get_all_branches()
+    for _ in range(4):
+        db.get_employees()
+
+    # Выбор филиала, этажа и комнаты на вкладках
+    branch = db.get_all_branches()[0]
+    db.get_branch(branch['branch_id'])
+    rooms = db.get_rooms_by_branch_and_floor(branch['branch_id'], 1)
+    for room in rooms:
+        db.get_room(room['room_id'])
+        db.get_equipment_by_room(room['room_id'])
+
+    db.close()
+    return db.cache.stats() if db.cache is not None else None
+
+
+def measure(db_path, pool_size, use_cache=False, rounds=ROUNDS):
+    timings = []
+    for _ in range(rounds):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            cache_stats = report_window_startup(db_path, pool_size, use_cache)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], timings[0], cache_stats
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "company.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseHandler(db_path)
+            fill_test_data(db)
+            db.close()
+
+        before, before_min, _ = measure(db_path, pool_size=0)
+        after, after_min, _ = measure(db_path, pool_size=4)
+        cached, cached_min, cache_stats = measure(db_path, pool_size=4, use_cache=True)
+
+        print(f"Запуск ReportWindow, {ROUNDS} повторов (медиана / минимум):")
+        print(f"  без пула (pool_size=0): {before * 1000:8.2f} мс / {before_min * 1000:8.2f} мс")
+        print(f"  с пулом  (pool_size=4): {after * 1000:8.2f} мс / {after_min * 1000:8.2f} мс")
+        print(f"  пул + кэш справочников: {cached * 1000:8.2f} мс / {cached_min * 1000:8.2f} мс")
+        print(f"  ускорение: x{before / after:.1f} (пул), x{before / cached:.1f} (пул + кэш)")
+        print(f"  кэш: попаданий {cache_stats['hits']}, запросов к БД {cache_stats['misses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import functools
+import threading
+from collections import OrderedDict
+
+# Какие таблицы меняются вместе с данной из-за внешних ключей
+# (ON DELETE CASCADE / SET NULL): при записи в ключ сбрасываются и они
+CASCADES = {
+    "branches": ("employees", "room", "floor_maps", "environment"),
+    "employees": ("room",),
+    "room": ("room_markers",),
+    "floor_maps": ("room_markers",),
+}
+
+
+def affected_tables(tables):
+    """Таблицы вместе со всеми, на которые каскадно влияет запись в них"""
+    result = set()
+    stack = list(tables)
+    while stack:
+        table = stack.pop()
+        if table not in result:
+            result.add(table)
+            stack.extend(CASCADES.get(table, ()))
+    return result
+
+
+class QueryCache:
+    """LRU-кэш результатов справочных запросов (филиалы, сотрудники, комнаты, планы).
+
+    Каждая запись помнит, из каких таблиц прочитана, и сбрасывается при
+    записи в любую из них (invalidate). Значения - те же списки sqlite3.Row,
+    что возвращает DatabaseHandler, их нельзя изменять на месте.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # ключ -> (таблицы, значение)
+        self._generation = 0  # растет при каждом сбросе
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, tables, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        value = loader()
+        with self._lock:
+            # Пока шел запрос, таблицы могли измениться - такой результат не кэшируем
+            if generation != self._generation:
+                return value
+            self._entries[key] = (frozenset(tables), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, *tables):
+        """Сброс записей, прочитанных из tables (с учетом каскадов)"""
+        changed = affected_tables(tables)
+        with self._lock:
+            self._generation += 1
+            for key in [key for key, (used, _) in self._entries.items() if used & changed]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._entries), 'max_size': self.max_size}
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(db_path):
+    """Общий кэш для всех DatabaseHandler одного файла БД в процессе.
+
+    Окно настроек открывается из окна отчетности со своим DatabaseHandler,
+    и его изменения должны сбрасывать кэш окна отчетности.
+    """
+    with _caches_lock:
+        if db_path not in _caches:
+            _caches[db_path] = QueryCache()
+        return _caches[db_path]
+
+
+def cached(*tables):
+    """Декоратор метода DatabaseHandler: результат кэшируется по аргументам
+    и сбрасывается при записи в любую из tables"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.cache is None or self.in_read_snapshot():
+                return method(self, *args, **kwargs)
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            return self.cache.get_or_load(key, tables, lambda: method(self, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def invalidates(*tables):
+    """Декоратор пишущего метода DatabaseHandler: после вызова сбрасывает
+    кэш tables и сообщает о записи слушателям self.write_listeners
+    (даже если метод упал - часть изменений могла сохраниться)"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                if self.cache is not None:
+                    self.cache.invalidate(*tables)
+                for listener in self.write_listeners:
+                    listener(tables)
+        return wrapper
+    return decorator
@@ -0,0 +1,121 @@
+"""Отслеживание изменений company.db, сделанных другими соединениями и процессами.
+
+plane.py запускается отдельным процессом, окно настроек работает со своим
+DatabaseHandler, поэтому окна не знают об изменениях друг друга. Наблюдатель
+раз в interval мс читает PRAGMA data_version на собственном соединении
+(значение меняется только после чужих коммитов, проверка почти бесплатная),
+и только если оно изменилось - счетчики из таблицы table_changes (миграция 5).
+"""
+import sqlite3
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+
+class ChangeTracker:
+    """Определение изменившихся таблиц без Qt (используется наблюдателем)"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = None
+        self.data_version = None
+        self.counters = None  # {таблица: счетчик}, None - еще не проверяли
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA busy_timeout = 1000")
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _read_counters(self):
+        rows = self.conn.execute("SELECT table_name, change_count FROM table_changes").fetchall()
+        return dict(rows)
+
+    def poll(self):
+        """Список таблиц, изменившихся с прошлой проверки.
+
+        Первый вызов только запоминает текущее состояние и возвращает [].
+        """
+        if self.conn is None:
+            # У нового соединения свой data_version - сравниваем счетчики заново
+            self.conn = self._connect()
+            self.data_version = None
+
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self.data_version:
+            return []
+        self.data_version = data_version
+
+        counters = self._read_counters()
+        if self.counters is None:
+            self.counters = counters
+            return []
+        changed = sorted(table for table, count in counters.items()
+                         if self.counters.get(table) != count)
+        self.counters = counters
+        return changed
+
+    def acknowledge(self):
+        """Принять текущее состояние БД как известное (после своей записи).
+
+        Чужая запись, успевшая закоммититься одновременно со своей, при
+        этом тоже будет пропущена - для обновления окон это допустимо.
+        """
+        if self.conn is None or self.counters is None:
+            return
+        self.data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        self.counters = self._read_counters()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class DataVersionWatcher(QObject):
+    """Периодическая проверка БД; сигнал tables_changed со списком таблиц.
+
+    Перед сигналом сбрасывает кэш справочников по изменившимся таблицам,
+    чтобы обработчики сигнала сразу читали свежие данные. Записи, сделанные
+    через сам db (окно, которому принадлежит наблюдатель), сигнала не вызывают.
+    """
+
+    tables_changed = Signal(list)
+
+    def __init__(self, db, interval=1000, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.tracker = ChangeTracker(db.db_path)
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.check)
+        db.write_listeners.append(self.on_own_write)
+
+    def start(self):
+        self.check()  # запоминаем исходное состояние
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+        self.tracker.close()
+        if self.on_own_write in self.db.write_listeners:
+            self.db.write_listeners.remove(self.on_own_write)
+
+    def on_own_write(self, tables):
+        try:
+            self.tracker.acknowledge()
+        except sqlite3.Error as e:
+            print(f"⚠️ Ошибка проверки изменений БД: {e}")
+
+    def check(self):
+        try:
+            tables = self.tracker.poll()
+        except sqlite3.Error as e:
+            # БД занята или недоступна - попробуем на следующем тике
+            print(f"⚠️ Ошибка проверки изменений БД: {e}")
+            self.tracker.close()
+            return
+        if not tables:
+            return
+        if self.db.cache is not None:
+            self.db.cache.invalidate(*tables)
+        self.tables_changed.emit(tables)
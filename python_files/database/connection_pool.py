@@ -0,0 +1,133 @@
+import sqlite3
+import threading
+
+
+class PooledConnection(sqlite3.Connection):
+    """Соединение SQLite, которое при close() возвращается в пул, а не закрывается"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+    def force_close(self):
+        """Настоящее закрытие соединения (используется самим пулом)"""
+        self.pool = None
+        super().close()
+
+
+class PinnedOwner:
+    """Владелец соединения, закрепленного вне пула (снимок для выгрузок):
+    conn.close() в методах DatabaseHandler его не закрывает и не откатывает
+    транзакцию - соединение закрывает тот, кто его открыл (force_close)"""
+
+    def release(self, conn):
+        pass
+
+
+class ConnectionPool:
+    """Пул постоянных соединений с БД.
+
+    Соединение закрепляется за потоком на время работы с ним: повторный
+    acquire() из того же потока возвращает то же соединение (счётчик
+    вложенности), поэтому вложенные вызовы методов DatabaseHandler не
+    занимают лишних соединений. Свободные соединения хранятся стеком,
+    так что GUI-поток почти всегда получает одно и то же "прогретое"
+    соединение с заполненным кэшем подготовленных запросов.
+    """
+
+    def __init__(self, db_path, max_size=4, timeout=30.0, cached_statements=256, on_connect=None,
+                 factory=PooledConnection):
+        self.db_path = db_path
+        self.factory = factory  # подкласс PooledConnection
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.on_connect = on_connect
+
+        self._idle = []
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, factory=self.factory,
+                               check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        if self.on_connect:
+            self.on_connect(conn)
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        """Выдаёт соединение текущему потоку"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.depth += 1
+            return conn
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Пул соединений закрыт")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._created < self.max_size:
+                    self._created += 1
+                    break
+                if not self._cond.wait(self.timeout):
+                    raise sqlite3.OperationalError(
+                        f"Нет свободных соединений с БД за {self.timeout} с")
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        """Возвращает соединение в пул (вызывается из conn.close())"""
+        if getattr(self._local, "conn", None) is conn:
+            self._local.depth -= 1
+            if self._local.depth > 0:
+                return
+            self._local.conn = None
+
+        # Незавершённая транзакция не должна "переехать" к следующему владельцу
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._cond:
+            if self._closed:
+                self._created -= 1
+                conn.force_close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        """Закрывает все свободные соединения и запрещает выдачу новых"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().force_close()
+                self._created -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {'created': self._created, 'idle': len(self._idle), 'max_size': self.max_size}
@@ -1,10 +1,99 @@
+import contextlib
 import os
 import sqlite3
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
+
+from python_files.database.cache import cached, get_cache, invalidates
+from python_files.database.connection_pool import ConnectionPool, PinnedOwner, PooledConnection
+from python_files.database.db_config import (apply_profile, get_archive_settings, get_instrumentation_settings,
+                                             get_profile, get_profile_name, load_config)
+from python_files.database.events import DELETE, INSERT, UPDATE, ChangeEvent, coalesce
+from python_files.database.instrumentation import InstrumentedConnection, QueryStats, instrument_methods
+from python_files.database.inventory_session import InventorySession
+from python_files.database.migrations import (ARCHIVE_LOG_COLUMNS, ARCHIVE_REPORT_COLUMNS, EQUIPMENT_SUMMARY_SELECT,
+                                             FILL_EQUIPMENT_SUMMARY_SQL, LATEST_VERSION, create_archive_schema,
+                                             get_schema_version, migrate)
+
+INSERT_EQUIPMENT_SQL = """
+    INSERT INTO equipment (
+        name, category, type, quantity, serial_number,
+        supplier, price, date_incoming, state_incoming,
+        phone_supplier, email_supplier, status, notes
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Строк в одном INSERT при массовой загрузке. Триггеры полнотекстового
+# индекса сбрасывают его буфер после каждого оператора, поэтому вставка
+# по одной строке через executemany в разы медленнее многострочного INSERT.
+# 13 колонок * 50 строк = 650 параметров (старые SQLite допускают 999)
+EQUIPMENT_ROWS_PER_INSERT = 50
+
+# Колонки equipment, по которым search_equipment допускает точный фильтр
+EQUIPMENT_SEARCH_FILTERS = ("category", "type", "status", "room_id")
+
+# Допустимые статусы оборудования (колонка equipment.status)
+EQUIPMENT_STATUSES = ("in_use", "in_stock", "repair", "missing", "written_off")
+
+# Измерения get_equipment_summary: (колонки SELECT, колонки группировки и сортировки)
+SUMMARY_DIMENSIONS = {
+    "branch": (("b.branch_id", "b.name AS branch_name"), ("b.name", "b.branch_id")),
+    "floor": (("r.floor",), ("r.floor",)),
+    "room": (("r.room_id", "r.room_number", "r.room_name"), ("r.room_number", "r.room_id")),
+    "category": (("grp.category",), ("grp.category",)),
+    "type": (("grp.type",), ("grp.type",)),
+    "status": (("grp.status",), ("grp.status",)),
+}
+
+# Фильтры get_equipment_summary: ключ -> колонка. Фильтры по комнате
+# (филиал, этаж) отбирают комнаты, остальные - записи оборудования
+SUMMARY_FILTERS = {
+    "branch_id": "branch_id",
+    "floor": "floor",
+    "room_id": "room_id",
+    "category": "category",
+    "type": "type",
+    "status": "status",
+}
+SUMMARY_ROOM_FILTERS = ("branch_id", "floor")
+# Измерения и фильтры, которых нет в equipment_summary: с ними сводка
+# считается по самой таблице equipment
+SUMMARY_DETAIL_KEYS = ("category", "type")
+
+# Поля места в workplace_assignment (кроме комнаты и номера места)
+WORKPLACE_FIELDS = ("equipment_id", "type", "name", "serial", "has_monitor",
+                    "has_keyboard", "has_mouse", "has_power_cable", "notes")
+WORKPLACE_FLAGS = ("has_monitor", "has_keyboard", "has_mouse", "has_power_cable")
+WORKPLACE_UPSERT_SQL = f"""
+    INSERT INTO workplace_assignment (room_id, workplace_number, {', '.join(WORKPLACE_FIELDS)})
+    VALUES ({', '.join('?' * (len(WORKPLACE_FIELDS) + 2))})
+    ON CONFLICT (room_id, workplace_number) DO UPDATE SET
+        {', '.join(f'{field} = excluded.{field}' for field in WORKPLACE_FIELDS)}
+"""
+
+
+def _multi_row_insert_sql(count):
+    """INSERT_EQUIPMENT_SQL на count строк"""
+    head, values = INSERT_EQUIPMENT_SQL.rsplit("VALUES", 1)
+    return f"{head}VALUES {', '.join([values.strip()] * count)}"
+
+
+def _search_words(text):
+    return str(text or "").split()
+
+
+def _fts_prefix(word):
+    """Слово пользователя -> префиксная фраза FTS5 ("SN-12" -> "SN-12"*)"""
+    return '"' + word.replace('"', '""') + '"*'
+
+
+def _like_pattern(word):
+    escaped = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
 
 
 class DatabaseHandler:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, pool_size=4, profile=None, use_cache=True, instrument=None):
         if db_path is None:
             # database_handler.py находится в python_files/database/
             current_file = os.path.abspath(__file__)
@@ -15,184 +104,330 @@ class DatabaseHandler:
 
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         self.db_path = db_path
-        print(f"🔄 Подключение к БД: {db_path}")
-        self.create_tables()
+        config = load_config()
+        # Профиль производительности: явно переданный или из db_config.json
+        self.profile_name = profile or get_profile_name(config)
+        self.profile = get_profile(self.profile_name)
+        # pool_size=0 - старый режим: новое соединение на каждый вызов
+        self.pool = None
+        self._equipment_fts = None  # наличие equipment_fts, проверяется при первом поиске
+        # Кэш справочников (филиалы, сотрудники, комнаты, планы) общий для всех
+        # обработчиков этого файла БД в процессе
+        self.cache = get_cache(db_path) if use_cache else None
+        # Вызываются после каждого пишущего метода: listener(таблицы)
+        self.write_listeners = []
+        # Получают ChangeEvent после каждой записи (см. event_bus.DataEventBus)
+        self.change_listeners = []
+        # Соединение открытого в потоке read_snapshot()
+        self._snapshot = threading.local()
+        # Соединение и отложенные события открытого в потоке bulk_import()
+        self._bulk = threading.local()
+        # Архив старых отчетов и журнала: относительный путь - от папки с БД
+        self.archive_settings = get_archive_settings(config)
+        self.archive_path = os.path.join(os.path.dirname(os.path.abspath(db_path)),
+                                         self.archive_settings["path"])
+        # Замер запросов: явно переданный флаг или настройка из db_config.json
+        settings = get_instrumentation_settings(config)
+        if instrument is None:
+            instrument = settings["enabled"]
+        self.stats = QueryStats(settings["slow_query_ms"]) if instrument else None
+        self.stats_path = settings["dump_path"]
+        self._connection_class = InstrumentedConnection if instrument else PooledConnection
+        if pool_size > 0:
+            self.pool = ConnectionPool(db_path, max_size=pool_size, on_connect=self._init_connection,
+                                       factory=self._connection_class)
+        if self.stats is not None:
+            instrument_methods(self, self.stats)
+            print(f"🔄 Замер запросов включен (медленные - от {settings['slow_query_ms']} мс)")
+        print(f"🔄 Подключение к БД: {db_path} (профиль: {self.profile_name})")
+        self.migrate_schema()
 
         # 👇 ВОТ ЭТУ СТРОКУ УДАЛИ ИЛИ ЗАКОММЕНТИРУЙ:
         # self.add_test_data_if_empty()
 
-    def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
+    def _init_connection(self, conn, profile=None):
+        """Настройка только что открытого соединения"""
+        if self.stats is not None:
+            conn.stats = self.stats
+        apply_profile(conn, profile or self.profile)
         conn.execute("PRAGMA foreign_keys = ON")
         conn.row_factory = sqlite3.Row
+
+    def get_connection(self):
+        """Соединение из пула; conn.close() возвращает его обратно в пул.
+
+        Внутри read_snapshot() и bulk_import() - закрепленное соединение этого потока.
+        """
+        pinned = getattr(self._snapshot, "conn", None) or getattr(self._bulk, "conn", None)
+        if pinned is not None:
+            return pinned
+        if self.pool is not None:
+            return self.pool.acquire()
+        conn = sqlite3.connect(self.db_path, factory=self._connection_class)
+        self._init_connection(conn)
         return conn
 
-    def create_tables(self):
+    def close(self):
+        """Закрытие всех соединений (вызывается при выходе из приложения)"""
+        if self.stats is not None and self.stats_path:
+            try:
+                self.dump_query_stats()
+            except OSError as e:
+                print(f"⚠️ Не удалось сохранить статистику запросов: {e}")
+        if self.pool is not None:
+            self.pool.close_all()
+
+    @contextlib.contextmanager
+    def read_snapshot(self):
+        """Согласованное чтение для длинных выгрузок.
+
+        Внутри блока with все методы обработчика в этом потоке читают через
+        отдельное соединение с профилем read-only-report (query_only) в одной
+        транзакции чтения: в режиме WAL это снимок БД на момент входа, его
+        не меняют чужие записи, а сама выгрузка не блокирует пишущих.
+        Запись внутри блока завершается ошибкой, кэш справочников не
+        используется (он может быть новее снимка). Вложенный вызов
+        продолжает уже открытый снимок.
+        """
+        if self.in_read_snapshot():
+            yield self
+            return
+
+        conn = sqlite3.connect(self.db_path, factory=self._connection_class)
+        try:
+            self._init_connection(conn, get_profile("read-only-report"))
+            # Внутри транзакции ATTACH невозможен - подключаем архив заранее
+            self._attach_archive(conn)
+            conn.execute("BEGIN")
+            # Снимок фиксируется первым чтением, а не оператором BEGIN
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            conn.pool = PinnedOwner()
+            self._snapshot.conn = conn
+            try:
+                yield self
+            finally:
+                self._snapshot.conn = None
+        finally:
+            conn.force_close()
+
+    @contextlib.contextmanager
+    def bulk_import(self):
+        """Массовая загрузка (импорт накладных и т.п.).
+
+        Внутри блока with все методы обработчика в этом потоке пишут через
+        отдельное соединение с профилем bulk-import (synchronous OFF, большой
+        кэш): коммит каждой пачки не ждет fsync. События изменений копятся
+        и рассылаются в конце блока, схлопнутыми (одно массовое событие
+        вместо события на каждую пачку). Вложенный вызов продолжает уже
+        открытую загрузку.
+        """
+        if getattr(self._bulk, "conn", None) is not None:
+            yield self
+            return
+
+        conn = sqlite3.connect(self.db_path, factory=self._connection_class)
+        try:
+            self._init_connection(conn, get_profile("bulk-import"))
+            conn.pool = PinnedOwner()
+            self._bulk.conn = conn
+            self._bulk.events = []
+            try:
+                yield self
+            finally:
+                events = self._bulk.events
+                self._bulk.conn = None
+                self._bulk.events = None
+        finally:
+            conn.force_close()
+
+        # Закоммиченные пачки остаются в БД и при ошибке - подписчики узнают о них
+        for event in coalesce(events):
+            self._publish(event.entity, event.entity_id, event.operation)
+
+    def in_read_snapshot(self):
+        """Открыт ли read_snapshot() в текущем потоке"""
+        return getattr(self._snapshot, "conn", None) is not None
+
+    # ========== АРХИВ ==========
+
+    def _attach_archive(self, conn):
+        """Подключение archive.db к соединению как схемы archive.
+
+        Соединения пула живут долго, поэтому архив подключается при первом
+        обращении после его появления. Возвращает, подключен ли архив.
+        """
+        if getattr(conn, "archive_attached", False):
+            return True
+        if conn.in_transaction or not os.path.exists(self.archive_path):
+            return False
+        conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+        conn.archive_attached = True
+        return True
+
+    def _archived_before(self, conn):
+        """Граница архива: строки старше нее перенесены (None - архива нет)"""
+        if not self._attach_archive(conn):
+            return None
+        try:
+            row = conn.execute("SELECT value FROM archive.archive_meta WHERE key = 'archived_before'").fetchone()
+        except sqlite3.OperationalError:
+            return None  # файл есть, но архивация в него еще не выполнялась
+        return row[0] if row else None
+
+    def _with_archive(self, conn, table, date_from=None):
+        """Таблица рабочей БД и, если выборка с date_from заходит за границу
+        архива (None - без нижней границы), та же таблица архива"""
+        archived_before = self._archived_before(conn)
+        if archived_before is None or (date_from is not None and date_from >= archived_before):
+            return [table]
+        return [table, f"archive.{table}"]
+
+    @invalidates("reports", "inventory_log")
+    def archive_old_records(self, cutoff=None, batch_size=None, progress=None):
+        """Перенос старых строк журнала инвентаризации и отчетов в архив.
+
+        cutoff - дата 'YYYY-MM-DD' (по умолчанию - keep_days дней назад из
+        настроек): переносятся строки журнала, записанные раньше этого дня,
+        затем отчеты того же возраста, у которых в рабочей БД не осталось
+        строк журнала. Перенос идет порциями по batch_size строк, каждая
+        порция - своя транзакция, так что окна приложения не ждут всю
+        архивацию; прерванный перенос продолжается повторным запуском.
+        progress(строк журнала, отчетов) вызывается после каждой порции.
+        Возвращает (перенесено строк журнала, перенесено отчетов).
+        """
+        if cutoff is None:
+            cutoff = (datetime.now() - timedelta(days=self.archive_settings["keep_days"])).strftime("%Y-%m-%d")
+        batch_size = batch_size or self.archive_settings["batch_size"]
+        moved = {"inventory_log": 0, "reports": 0}
+
+        def on_batch(table, count):
+            moved[table] += count
+            if progress:
+                progress(moved["inventory_log"], moved["reports"])
+
+        # Отдельное соединение, как для миграций: у соединений пула может
+        # быть включен query_only
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+            conn.execute("PRAGMA archive.journal_mode = WAL")
+            create_archive_schema(conn.cursor())
+            # Граница сдвигается до переноса: пока он идет, выборки за
+            # старые даты уже смотрят и в архив
+            conn.execute("""
+                         INSERT INTO archive.archive_meta (key, value) VALUES ('archived_before', ?)
+                         ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)
+                         """, (cutoff,))
+            conn.commit()
+
+            self._move_to_archive(conn, "inventory_log", "log_id", ARCHIVE_LOG_COLUMNS,
+                                  "inventory_date < ?", (cutoff,), batch_size, on_batch)
+            self._move_to_archive(conn, "reports", "report_id", ARCHIVE_REPORT_COLUMNS,
+                                  """report_date < ? AND NOT EXISTS (
+                                         SELECT 1 FROM inventory_log WHERE inventory_log.report_id = reports.report_id)""",
+                                  (cutoff,), batch_size, on_batch)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        print(f"✅ В архив до {cutoff}: {moved['inventory_log']} строк журнала, {moved['reports']} отчетов")
+        return moved["inventory_log"], moved["reports"]
+
+    @staticmethod
+    def _move_to_archive(conn, table, key, columns, condition, params, batch_size, on_batch):
+        """Перенос строк table, подходящих под condition, порциями по ключу.
+
+        Порция - следующие batch_size подходящих строк по возрастанию key:
+        копия в архив и удаление из рабочей БД в одной транзакции. INSERT OR
+        REPLACE делает повтор порции после сбоя безопасным.
+        """
+        after = 0
+        while True:
+            last = conn.execute(f"""
+                                SELECT MAX({key}) FROM (
+                                    SELECT {key} FROM {table}
+                                    WHERE {key} > ? AND {condition}
+                                    ORDER BY {key}
+                                    LIMIT ?)
+                                """, (after, *params, batch_size)).fetchone()[0]
+            if last is None:
+                return
+            batch = f"{key} > ? AND {key} <= ? AND {condition}"
+            args = (after, last, *params)
+            conn.execute(f"""
+                         INSERT OR REPLACE INTO archive.{table} ({columns})
+                         SELECT {columns} FROM {table} WHERE {batch}
+                         """, args)
+            count = conn.execute(f"DELETE FROM {table} WHERE {batch}", args).rowcount
+            conn.commit()
+            after = last
+            on_batch(table, count)
+
+    # ========== ЗАМЕР ЗАПРОСОВ ==========
+
+    def get_query_stats(self):
+        """Статистика методов и SQL-операторов (None, если замер выключен).
+
+        Для медленных запросов дописывается EXPLAIN QUERY PLAN - на отдельном
+        соединении, чтобы сами EXPLAIN не попадали в статистику.
+        """
+        if self.stats is None:
+            return None
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.stats.explain_slow(conn)
+        finally:
+            conn.close()
+        return self.stats.summary()
+
+    def dump_query_stats(self, path=None):
+        """Сохранение статистики в JSON; возвращает путь к файлу"""
+        path = path or self.stats_path
+        self.stats.dump(path, self.get_query_stats())
+        print(f"✅ Статистика запросов сохранена: {path}")
+        return path
+
+    def reset_query_stats(self):
+        if self.stats is not None:
+            self.stats.reset()
+
+    def _publish(self, entity, entity_id, operation):
+        """Рассылка события изменения подписчикам (после коммита)"""
+        event = ChangeEvent(entity, entity_id, operation)
+        deferred = getattr(self._bulk, "events", None)
+        if deferred is not None:
+            deferred.append(event)  # разошлет bulk_import() в конце загрузки
+            return
+        for listener in list(self.change_listeners):
+            listener(event)
+
+    def migrate_schema(self):
+        """Проверка версии схемы и применение недостающих миграций"""
         conn = self.get_connection()
-        cursor = conn.cursor()
+        try:
+            version = get_schema_version(conn)
+        finally:
+            conn.close()
 
-        # Таблица филиалов
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS branches (
-                                                               branch_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                               name TEXT NOT NULL,
-                                                               floors_count INTEGER NOT NULL,
-                                                               address TEXT NOT NULL
-                       )
-                       ''')
-
-        # Таблица сотрудников
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS employees (
-                                                                worker_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                                name_id TEXT NOT NULL,
-                                                                job_title TEXT NOT NULL,
-                                                                report_count INTEGER NOT NULL,
-                                                                date_of_work TEXT NOT NULL,
-                                                                branch_id INTEGER,
-                                                                phone TEXT,
-                                                                email TEXT,
-                                                                FOREIGN KEY (branch_id) REFERENCES branches(branch_id) ON DELETE SET NULL
-                           )
-                       ''')
-
-        # Таблица окружения
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS environment (
-                                                                  environment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                                  environment_name TEXT NOT NULL,
-                                                                  branch_id INTEGER NOT NULL,
-                                                                  FOREIGN KEY (branch_id) REFERENCES branches(branch_id) ON DELETE CASCADE
-                           )
-                       ''')
-
-        # Таблица комнат
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS room (
-                                                           room_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                           room_number TEXT NOT NULL,
-                                                           room_name TEXT NOT NULL,
-                                                           branch_id INTEGER,
-                                                           floor INTEGER DEFAULT 1,
-                                                           capacity INTEGER DEFAULT 0,
-                                                           desks_count INTEGER DEFAULT 0,
-                                                           chairs_count INTEGER DEFAULT 0,
-                                                           sockets_count INTEGER DEFAULT 0,
-                                                           area REAL DEFAULT 0.0,
-                                                           responsible_employee_id INTEGER,
-                                                           notes TEXT DEFAULT '',
-                                                           FOREIGN KEY (branch_id) REFERENCES branches(branch_id) ON DELETE CASCADE,
-                           FOREIGN KEY (responsible_employee_id) REFERENCES employees(worker_id) ON DELETE SET NULL
-                           )
-                       ''')
-
-        # Таблица оборудования
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS equipment (
-                                                                equipment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                                quantity INTEGER NOT NULL,
-                                                                category TEXT NOT NULL,
-                                                                type TEXT NOT NULL,
-                                                                name TEXT NOT NULL,
-                                                                date_incoming TEXT NOT NULL,
-                                                                state_incoming INTEGER NOT NULL,
-                                                                serial_number TEXT NOT NULL UNIQUE,
-                                                                supplier TEXT NOT NULL,
-                                                                price INTEGER NOT NULL,
-                                                                phone_supplier TEXT NOT NULL,
-                                                                email_supplier TEXT NOT NULL,
-                                                                room_id INTEGER,
-                                                                branch_id INTEGER,
-                                                                status TEXT DEFAULT 'in_use',
-                                                                last_inventory_date TEXT,
-                                                                notes TEXT,
-                                                                FOREIGN KEY (room_id) REFERENCES room(room_id) ON DELETE SET NULL
-                           )
-                       ''')
-
-        # Таблица отчетов
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS reports (
-                                                              report_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                              report_name TEXT NOT NULL,
-                                                              report_date TIMESTAMP NOT NULL,
-                                                              description TEXT NOT NULL,
-                                                              order_number INTEGER NOT NULL,
-                                                              worker_id INTEGER,
-                                                              environment_id INTEGER,
-                                                              equipment_id INTEGER,
-                                                              FOREIGN KEY (worker_id) REFERENCES employees(worker_id) ON DELETE SET NULL,
-                           FOREIGN KEY (environment_id) REFERENCES environment(environment_id) ON DELETE SET NULL,
-                           FOREIGN KEY (equipment_id) REFERENCES equipment(equipment_id) ON DELETE SET NULL
-                           )
-                       ''')
-
-        # Таблица лога инвентаризации
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS inventory_log (
-                                                                    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                                    report_id INTEGER NOT NULL,
-                                                                    equipment_id INTEGER NOT NULL,
-                                                                    old_status TEXT,
-                                                                    new_status TEXT,
-                                                                    comment TEXT,
-                                                                    inventory_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                                                    worker_id INTEGER,
-                                                                    FOREIGN KEY (report_id) REFERENCES reports(report_id) ON DELETE CASCADE,
-                           FOREIGN KEY (equipment_id) REFERENCES equipment(equipment_id) ON DELETE CASCADE,
-                           FOREIGN KEY (worker_id) REFERENCES employees(worker_id) ON DELETE SET NULL
-                           )
-                       ''')
-
-        # Таблица пользователей
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS users (
-                                                            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                            username TEXT UNIQUE NOT NULL,
-                                                            password TEXT NOT NULL,
-                                                            role TEXT DEFAULT 'user'
-                       )
-                       ''')
-
-        # Таблица компании
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS company (
-                                                              id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                              name TEXT NOT NULL
-                       )
-                       ''')
-
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS floor_maps (
-                                                                 map_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                                 branch_id INTEGER NOT NULL,
-                                                                 floor_number INTEGER NOT NULL,
-                                                                 image_path TEXT NOT NULL,
-                                                                 UNIQUE(branch_id, floor_number),
-                           FOREIGN KEY (branch_id) REFERENCES branches(branch_id) ON DELETE CASCADE
-                           )
-                       ''')
-
-        # Таблица для координат точек (маркеров) кабинетов на плане
-        cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS room_markers (
-                                                                   marker_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                                   map_id INTEGER NOT NULL,
-                                                                   room_id INTEGER NOT NULL,
-                                                                   x REAL NOT NULL,
-                                                                   y REAL NOT NULL,
-                                                                   UNIQUE(map_id, room_id),
-                           FOREIGN KEY (map_id) REFERENCES floor_maps(map_id) ON DELETE CASCADE,
-                           FOREIGN KEY (room_id) REFERENCES room(room_id) ON DELETE CASCADE
-                           )
-                       ''')
+        if version >= LATEST_VERSION:
+            if version > LATEST_VERSION:
+                print(f"⚠️ Версия схемы БД ({version}) новее программы ({LATEST_VERSION})")
+            return
 
-        conn.commit()
-        conn.close()
-        print("✅ Таблицы созданы!")
+        # Миграции выполняем на отдельном соединении: у соединений пула может
+        # быть включен query_only, а для перестройки таблиц нужны выключенные
+        # внешние ключи (по умолчанию в SQLite)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
 
     # ========== МЕТОДЫ ДЛЯ ГРАФИКИ ==========
 
+    @invalidates("floor_maps")
     def save_floor_map(self, branch_id, floor_num, img_path):
         """Сохраняет или обновляет путь к картинке плана этажа"""
         conn = self.get_connection()
@@ -203,10 +438,12 @@ class DatabaseHandler:
                 VALUES (?, ?, ?)
             """, (branch_id, floor_num, img_path))
             conn.commit()
+            self._publish("floor_map", cursor.lastrowid, UPDATE)
             return cursor.lastrowid
         finally:
             conn.close()
 
+    @invalidates("room_markers")
     def add_marker(self, map_id, room_id, x, y):
         """Добавляет или обновляет координату комнаты на плане"""
         conn = self.get_connection()
@@ -217,9 +454,60 @@ class DatabaseHandler:
                 VALUES (?, ?, ?, ?)
             """, (map_id, room_id, x, y))
             conn.commit()
+            self._publish("floor_map", map_id, UPDATE)
+        finally:
+            conn.close()
+
+    @invalidates("room_markers")
+    def replace_markers(self, map_id, markers, loaded_rooms=None):
+        """Сохраняет набор точек плана одной транзакцией.
+
+        markers - список (room_id, x, y). Новые точки добавляются, сдвинутые
+        обновляются. Удаляются только точки комнат из loaded_rooms (точки,
+        которые были на плане при его открытии), которых нет в списке:
+        точки, добавленные после открытия другим окном, не теряются.
+        loaded_rooms=None - удаляются все точки комнат, которых нет в списке.
+        Возвращает словарь с количеством added, updated, deleted, unchanged.
+        """
+        new_markers = {}
+        for room_id, x, y in markers:
+            new_markers[room_id] = (x, y)  # для повторной комнаты берем последнюю точку
+
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT room_id, x, y FROM room_markers WHERE map_id = ?", (map_id,))
+            old_markers = {row['room_id']: (row['x'], row['y']) for row in cursor.fetchall()}
+
+            upserts = [(map_id, room_id, x, y) for room_id, (x, y) in new_markers.items()
+                       if old_markers.get(room_id) != (x, y)]
+            removed = [(map_id, room_id) for room_id in old_markers
+                       if room_id not in new_markers and (loaded_rooms is None or room_id in loaded_rooms)]
+
+            cursor.executemany("""
+                INSERT INTO room_markers (map_id, room_id, x, y)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(map_id, room_id) DO UPDATE SET x = excluded.x, y = excluded.y
+            """, upserts)
+            cursor.executemany("DELETE FROM room_markers WHERE map_id = ? AND room_id = ?", removed)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         finally:
             conn.close()
 
+        if upserts or removed:
+            self._publish("floor_map", map_id, UPDATE)
+        added = sum(1 for _, room_id, _, _ in upserts if room_id not in old_markers)
+        return {
+            'added': added,
+            'updated': len(upserts) - added,
+            'deleted': len(removed),
+            'unchanged': len(new_markers) - len(upserts),
+        }
+
+    @cached("floor_maps", "room_markers", "room")
     def get_map_data(self, branch_id, floor_num):
         """Получает путь к картинке и все маркеры для этажа"""
         conn = self.get_connection()
@@ -246,72 +534,128 @@ class DatabaseHandler:
         finally:
             conn.close()
 
+    @cached("floor_maps", "room_markers", "room")
+    def get_branch_map_bundle(self, branch_id, floor_num=None):
+        """Планы этажей филиала с маркерами и полями комнат одним запросом.
+
+        Возвращает {номер этажа: (map_info, markers)} - те же пары, что
+        get_map_data, но маркеры дополнительно содержат вместимость комнаты.
+        Этажей без плана в словаре нет. floor_num ограничивает выборку
+        одним этажом. Нужен для выгрузок в PDF, которым иначе пришлось бы
+        запрашивать каждый этаж и каждую комнату отдельно.
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            floor_filter = "AND fm.floor_number = ?" if floor_num is not None else ""
+            params = (branch_id, floor_num) if floor_num is not None else (branch_id,)
+            cursor.execute(f"""
+                           SELECT fm.floor_number, fm.map_id, fm.image_path,
+                                  rm.x, rm.y, rm.room_id, r.room_name, r.room_number, r.capacity
+                           FROM floor_maps fm
+                                    LEFT JOIN room_markers rm ON rm.map_id = fm.map_id
+                                    LEFT JOIN room r ON rm.room_id = r.room_id
+                           WHERE fm.branch_id = ? {floor_filter}
+                           ORDER BY fm.floor_number, rm.marker_id
+                           """, params)
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        bundle = {}
+        for row in rows:
+            floor = row['floor_number']
+            if floor not in bundle:
+                bundle[floor] = ({'map_id': row['map_id'], 'image_path': row['image_path']}, [])
+            if row['room_id'] is not None:
+                bundle[floor][1].append({
+                    'x': row['x'],
+                    'y': row['y'],
+                    'room_id': row['room_id'],
+                    'room_name': row['room_name'],
+                    'room_number': row['room_number'],
+                    'capacity': row['capacity'],
+                })
+        return bundle
+
+    @invalidates("room_markers")
     def delete_markers_by_map(self, map_id):
         """Удаляет только точки на карте"""
         conn = self.get_connection()
-        conn.execute("DELETE FROM room_markers WHERE map_id = ?", (map_id,))
-        conn.commit()
-        conn.close()
+        try:
+            conn.execute("DELETE FROM room_markers WHERE map_id = ?", (map_id,))
+            conn.commit()
+            self._publish("floor_map", map_id, UPDATE)
+        finally:
+            conn.close()
 
+    @invalidates("floor_maps")
     def delete_full_map(self, map_id):
         """Удаляет и карту, и точки (благодаря ON DELETE CASCADE)"""
         conn = self.get_connection()
-        conn.execute("DELETE FROM floor_maps WHERE map_id = ?", (map_id,))
-        conn.commit()
-        conn.close()
-        print("✅ Карта удалена!")
+        try:
+            conn.execute("DELETE FROM floor_maps WHERE map_id = ?", (map_id,))
+            conn.commit()
+            self._publish("floor_map", map_id, DELETE)
+            print("✅ Карта удалена!")
+        finally:
+            conn.close()
 
     # ========== МЕТОДЫ ДЛЯ КОМНАТ ==========
 
+    @cached("room", "employees")
     def get_rooms(self, branch_id=None):
         """Получение всех комнат филиала"""
         conn = self.get_connection()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
 
-        if branch_id:
-            cursor.execute("""
-                           SELECT
-                               r.room_id,
-                               r.room_number,
-                               r.room_name,
-                               r.floor,
-                               r.capacity,
-                               r.desks_count,
-                               r.chairs_count,
-                               r.sockets_count,
-                               r.area,
-                               r.responsible_employee_id,
-                               r.notes,
-                               e.name_id as responsible_name
-                           FROM room r
-                                    LEFT JOIN employees e ON r.responsible_employee_id = e.worker_id
-                           WHERE r.branch_id = ?
-                           ORDER BY r.floor, r.room_number
-                           """, (branch_id,))
-        else:
-            cursor.execute("""
-                           SELECT
-                               r.room_id,
-                               r.room_number,
-                               r.room_name,
-                               r.floor,
-                               r.capacity,
-                               r.desks_count,
-                               r.chairs_count,
-                               r.sockets_count,
-                               r.area,
-                               r.responsible_employee_id,
-                               r.notes,
-                               e.name_id as responsible_name
-                           FROM room r
-                                    LEFT JOIN employees e ON r.responsible_employee_id = e.worker_id
-                           ORDER BY r.branch_id, r.floor, r.room_number
-                           """)
+            if branch_id:
+                cursor.execute("""
+                               SELECT
+                                   r.room_id,
+                                   r.room_number,
+                                   r.room_name,
+                                   r.floor,
+                                   r.capacity,
+                                   r.desks_count,
+                                   r.chairs_count,
+                                   r.sockets_count,
+                                   r.area,
+                                   r.responsible_employee_id,
+                                   r.notes,
+                                   e.name_id as responsible_name
+                               FROM room r
+                                        LEFT JOIN employees e ON r.responsible_employee_id = e.worker_id
+                               WHERE r.branch_id = ?
+                               ORDER BY r.floor, r.room_number
+                               """, (branch_id,))
+            else:
+                cursor.execute("""
+                               SELECT
+                                   r.room_id,
+                                   r.room_number,
+                                   r.room_name,
+                                   r.floor,
+                                   r.capacity,
+                                   r.desks_count,
+                                   r.chairs_count,
+                                   r.sockets_count,
+                                   r.area,
+                                   r.responsible_employee_id,
+                                   r.notes,
+                                   e.name_id as responsible_name
+                               FROM room r
+                                        LEFT JOIN employees e ON r.responsible_employee_id = e.worker_id
+                               ORDER BY r.branch_id, r.floor, r.room_number
+                               """)
 
-        rooms = cursor.fetchall()
-        conn.close()
-        return rooms
+            rooms = cursor.fetchall()
+            return rooms
+        finally:
+            conn.close()
 
+    @cached("room")
     def get_rooms_by_branch_and_floor(self, branch_id, floor):
         """Получение комнат филиала по этажу"""
         conn = self.get_connection()
@@ -331,206 +675,439 @@ class DatabaseHandler:
         finally:
             conn.close()
 
+    @invalidates("room")
     def add_room(self, room_number, room_name, branch_id=None, floor=1,
                  capacity=0, desks_count=0, chairs_count=0, sockets_count=0,
                  area=0.0, responsible_id=None, notes=""):
         """Добавление новой комнаты"""
         conn = self.get_connection()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-                       INSERT INTO room (
-                           room_number, room_name, branch_id, floor,
-                           capacity, desks_count, chairs_count, sockets_count,
-                           area, responsible_employee_id, notes
-                       ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                       """, (
-                           room_number, room_name, branch_id, floor,
-                           capacity, desks_count, chairs_count, sockets_count,
-                           area, responsible_id, notes
-                       ))
+            cursor.execute("""
+                           INSERT INTO room (
+                               room_number, room_name, branch_id, floor,
+                               capacity, desks_count, chairs_count, sockets_count,
+                               area, responsible_employee_id, notes
+                           ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                           """, (
+                               room_number, room_name, branch_id, floor,
+                               capacity, desks_count, chairs_count, sockets_count,
+                               area, responsible_id, notes
+                           ))
 
-        room_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return room_id
+            room_id = cursor.lastrowid
+            conn.commit()
+            self._publish("room", room_id, INSERT)
+            return room_id
+        finally:
+            conn.close()
 
+    @invalidates("room")
     def update_room(self, room_id, room_number, room_name, floor=1,
                     capacity=0, desks_count=0, chairs_count=0, sockets_count=0,
                     area=0.0, responsible_id=None, notes=""):
         """Обновление комнаты"""
         conn = self.get_connection()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-                       UPDATE room SET
-                                       room_number = ?,
-                                       room_name = ?,
-                                       floor = ?,
-                                       capacity = ?,
-                                       desks_count = ?,
-                                       chairs_count = ?,
-                                       sockets_count = ?,
-                                       area = ?,
-                                       responsible_employee_id = ?,
-                                       notes = ?
-                       WHERE room_id = ?
-                       """, (
-                           room_number, room_name, floor,
-                           capacity, desks_count, chairs_count,
-                           sockets_count, area, responsible_id,
-                           notes, room_id
-                       ))
+            cursor.execute("""
+                           UPDATE room SET
+                                           room_number = ?,
+                                           room_name = ?,
+                                           floor = ?,
+                                           capacity = ?,
+                                           desks_count = ?,
+                                           chairs_count = ?,
+                                           sockets_count = ?,
+                                           area = ?,
+                                           responsible_employee_id = ?,
+                                           notes = ?
+                           WHERE room_id = ?
+                           """, (
+                               room_number, room_name, floor,
+                               capacity, desks_count, chairs_count,
+                               sockets_count, area, responsible_id,
+                               notes, room_id
+                           ))
 
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return success
+            success = cursor.rowcount > 0
+            conn.commit()
+            if success:
+                self._publish("room", room_id, UPDATE)
+            return success
+        finally:
+            conn.close()
 
+    @invalidates("room", "equipment")
     def delete_room(self, room_id):
         """Удаление комнаты"""
         conn = self.get_connection()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
 
-        # Сначала обновляем оборудование
-        cursor.execute("UPDATE equipment SET room_id = NULL WHERE room_id = ?", (room_id,))
-        # Удаляем комнату
-        cursor.execute("DELETE FROM room WHERE room_id = ?", (room_id,))
+            # Сначала обновляем оборудование
+            cursor.execute("UPDATE equipment SET room_id = NULL WHERE room_id = ?", (room_id,))
+            moved = cursor.rowcount
+            # Удаляем комнату
+            cursor.execute("DELETE FROM room WHERE room_id = ?", (room_id,))
 
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return success
+            success = cursor.rowcount > 0
+            conn.commit()
+            if success:
+                self._publish("room", room_id, DELETE)
+            if moved:
+                self._publish("equipment", None, UPDATE)
+            return success
+        finally:
+            conn.close()
 
+    @cached("room", "employees")
     def get_room(self, room_id):
         """Получение комнаты по ID"""
         conn = self.get_connection()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-                       SELECT
-                           r.room_id,
-                           r.room_number,
-                           r.room_name,
-                           r.floor,
-                           r.capacity,
-                           r.desks_count,
-                           r.chairs_count,
-                           r.sockets_count,
-                           r.area,
-                           r.responsible_employee_id,
-                           r.notes,
-                           e.name_id as responsible_name,
-                           r.branch_id
-                       FROM room r
-                                LEFT JOIN employees e ON r.responsible_employee_id = e.worker_id
-                       WHERE r.room_id = ?
-                       """, (room_id,))
+            cursor.execute("""
+                           SELECT
+                               r.room_id,
+                               r.room_number,
+                               r.room_name,
+                               r.floor,
+                               r.capacity,
+                               r.desks_count,
+                               r.chairs_count,
+                               r.sockets_count,
+                               r.area,
+                               r.responsible_employee_id,
+                               r.notes,
+                               e.name_id as responsible_name,
+                               r.branch_id
+                           FROM room r
+                                    LEFT JOIN employees e ON r.responsible_employee_id = e.worker_id
+                           WHERE r.room_id = ?
+                           """, (room_id,))
 
-        room = cursor.fetchone()
-        conn.close()
-        return room
+            room = cursor.fetchone()
+            return room
+        finally:
+            conn.close()
 
     # ========== МЕТОДЫ ДЛЯ ФИЛИАЛОВ ==========
 
+    @cached("branches")
     def get_all_branches(self):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT branch_id, name, floors_count, address FROM branches")
-        branches = cursor.fetchall()
-        conn.close()
-        return branches
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT branch_id, name, floors_count, address FROM branches")
+            branches = cursor.fetchall()
+            return branches
+        finally:
+            conn.close()
 
+    @cached("branches")
     def get_branch(self, branch_id):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT branch_id, name, floors_count, address FROM branches WHERE branch_id = ?", (branch_id,))
-        branch = cursor.fetchone()
-        conn.close()
-        return branch
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT branch_id, name, floors_count, address FROM branches WHERE branch_id = ?", (branch_id,))
+            branch = cursor.fetchone()
+            return branch
+        finally:
+            conn.close()
 
+    @invalidates("branches")
     def add_branch(self, name, floors_count=1, address=''):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO branches (name, floors_count, address) VALUES (?, ?, ?)",
-                       (name, floors_count, address))
-        branch_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return branch_id
+        try:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO branches (name, floors_count, address) VALUES (?, ?, ?)",
+                           (name, floors_count, address))
+            branch_id = cursor.lastrowid
+            conn.commit()
+            self._publish("branch", branch_id, INSERT)
+            return branch_id
+        finally:
+            conn.close()
 
+    @invalidates("branches")
     def update_branch(self, branch_id, name, floors_count, address):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE branches SET name = ?, floors_count = ?, address = ? WHERE branch_id = ?",
-                       (name, floors_count, address, branch_id))
-        conn.commit()
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE branches SET name = ?, floors_count = ?, address = ? WHERE branch_id = ?",
+                           (name, floors_count, address, branch_id))
+            conn.commit()
+            self._publish("branch", branch_id, UPDATE)
+        finally:
+            conn.close()
 
+    @invalidates("branches")
     def delete_branch(self, branch_id):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM branches WHERE branch_id = ?", (branch_id,))
-        conn.commit()
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM branches WHERE branch_id = ?", (branch_id,))
+            conn.commit()
+            self._publish("branch", branch_id, DELETE)
+            # Каскад внешних ключей: сотрудники, комнаты и планы филиала
+            # удалены, оборудование из его комнат осталось без комнаты
+            for entity in ("employee", "room", "floor_map"):
+                self._publish(entity, None, DELETE)
+            self._publish("equipment", None, UPDATE)
+        finally:
+            conn.close()
 
-    # ========== МЕТОДЫ ДЛЯ СОТРУДНИКОВ ==========
+    def get_branch_summary(self, branch_id):
+        """Сводка по филиалу одним запросом: число сотрудников, комнат,
+        единиц оборудования и общая стоимость оборудования.
 
-    def get_employees(self, branch_id=None):
+        Оборудование филиала - размещенное в его комнатах (по equipment_summary,
+        несколько строк на комнату) и еще не размещенное, но записанное на
+        филиал (room_id IS NULL, по индексу idx_equipment_unplaced), - без
+        прохода по таблице equipment.
+        """
         conn = self.get_connection()
-        cursor = conn.cursor()
-
-        if branch_id:
+        try:
+            cursor = conn.cursor()
             cursor.execute("""
-                           SELECT worker_id, name_id, job_title, report_count, date_of_work
-                           FROM employees WHERE branch_id = ?
-                           ORDER BY name_id
-                           """, (branch_id,))
+                           SELECT
+                               (SELECT COUNT(*) FROM employees WHERE branch_id = :branch_id) AS employees_count,
+                               (SELECT COUNT(*) FROM room WHERE branch_id = :branch_id) AS rooms_count,
+                               COALESCE(SUM(items), 0) AS equipment_count,
+                               COALESCE(SUM(total_value), 0) AS equipment_value
+                           FROM (
+                               SELECT s.items, s.total_value
+                               FROM room r
+                                        JOIN equipment_summary s ON s.room_id = r.room_id
+                               WHERE r.branch_id = :branch_id
+                               UNION ALL
+                               SELECT COUNT(*), COALESCE(SUM(price * quantity), 0)
+                               FROM equipment
+                               WHERE room_id IS NULL AND branch_id = :branch_id
+                           )
+                           """, {'branch_id': branch_id})
+            return cursor.fetchone()
+        finally:
+            conn.close()
+
+    def get_equipment_summary(self, group_by=("branch", "floor", "category"), filters=None):
+        """Сводка по оборудованию одним агрегатным запросом.
+
+        group_by - измерения из SUMMARY_DIMENSIONS (филиал, этаж, комната,
+        категория, тип, статус), filters - словарь {ключ SUMMARY_FILTERS: значение}.
+        Для каждой группы возвращаются positions (число записей), quantity
+        (сумма количества) и total_value (сумма price * quantity).
+        Оборудование без комнаты попадает в группу с пустыми филиалом,
+        этажом и комнатой, если не задан фильтр по ним.
+
+        Запрос в два шага: сначала записи сворачиваются по комнате и статусу
+        (и по категории и типу, если они нужны), затем к уже небольшим
+        группам присоединяются комнаты и филиалы. Без категории и типа
+        первый шаг читает готовые строки equipment_summary, которую ведут
+        триггеры; иначе оборудование сворачивается проходом по покрывающему
+        индексу idx_equipment_summary в его порядке - без сортировки и без
+        чтения самой таблицы. Фильтр по филиалу или этажу ищет записи
+        только комнат этого филиала или этажа.
+        """
+        filters = filters or {}
+        unknown = [name for name in group_by if name not in SUMMARY_DIMENSIONS]
+        unknown += [key for key in filters if key not in SUMMARY_FILTERS]
+        if unknown:
+            raise ValueError(f"Неизвестные измерения или фильтры сводки: {', '.join(unknown)}")
+
+        conditions = []
+        params = []
+        room_conditions = []
+        room_params = []
+        for key, value in filters.items():
+            if key in SUMMARY_ROOM_FILTERS:
+                room_conditions.append(f"{SUMMARY_FILTERS[key]} = ?")
+                room_params.append(value)
+            else:
+                conditions.append(f"{SUMMARY_FILTERS[key]} = ?")
+                params.append(value)
+        if room_conditions:
+            conditions.append(f"room_id IN (SELECT room_id FROM room WHERE {' AND '.join(room_conditions)})")
+            params.extend(room_params)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        columns = [column for name in group_by for column in SUMMARY_DIMENSIONS[name][0]]
+        keys = [column for name in group_by for column in SUMMARY_DIMENSIONS[name][1]]
+        grouping = f"GROUP BY {', '.join(keys)} ORDER BY {', '.join(keys)}" if keys else ""
+
+        if any(key in SUMMARY_DETAIL_KEYS for key in (*group_by, *filters)):
+            source = f"""
+                SELECT room_id, category, type, status,
+                       COUNT(*) AS positions,
+                       SUM(quantity) AS quantity,
+                       SUM(price * quantity) AS total_value
+                FROM equipment
+                {where}
+                GROUP BY room_id, category, type, status
+            """
         else:
-            cursor.execute("""
-                           SELECT worker_id, name_id, job_title, report_count, date_of_work
-                           FROM employees ORDER BY name_id
+            source = f"""
+                SELECT NULLIF(room_id, 0) AS room_id, NULLIF(status, '') AS status,
+                       items AS positions, quantity, total_value
+                FROM equipment_summary
+                {where}
+            """
+
+        sql = f"""
+            WITH grp AS ({source})
+            SELECT {''.join(column + ', ' for column in columns)}
+                   COALESCE(SUM(grp.positions), 0) AS positions,
+                   COALESCE(SUM(grp.quantity), 0) AS quantity,
+                   COALESCE(SUM(grp.total_value), 0) AS total_value
+            FROM grp
+                     LEFT JOIN room r ON grp.room_id = r.room_id
+                     LEFT JOIN branches b ON r.branch_id = b.branch_id
+            {grouping}
+        """
+
+        conn = self.get_connection()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def rebuild_equipment_summary(self):
+        """Пересчет equipment_summary по таблице equipment (починка сводки).
+
+        Обычно сводку ведут триггеры; пересчет нужен, если данные меняли
+        в обход них (ручная правка файла БД, восстановление из копии
+        старой версии). Возвращает число строк сводки.
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM equipment_summary")
+            cursor.execute(FILL_EQUIPMENT_SUMMARY_SQL)
+            conn.commit()
+            return cursor.execute("SELECT COUNT(*) FROM equipment_summary").fetchone()[0]
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def check_equipment_summary(self):
+        """Строки equipment_summary, расходящиеся с таблицей equipment.
+
+        Возвращает (room_id, status) несовпавших строк; пустой список -
+        сводка верна.
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                           WITH actual AS ({EQUIPMENT_SUMMARY_SELECT}),
+                                stored AS (SELECT room_id, status, items, quantity, total_value
+                                           FROM equipment_summary),
+                                missing AS (SELECT * FROM actual EXCEPT SELECT * FROM stored),
+                                extra AS (SELECT * FROM stored EXCEPT SELECT * FROM actual)
+                           SELECT room_id, status FROM missing
+                           UNION
+                           SELECT room_id, status FROM extra
+                           ORDER BY room_id, status
                            """)
+            return [(row['room_id'], row['status']) for row in cursor.fetchall()]
+        finally:
+            conn.close()
 
-        employees = cursor.fetchall()
-        conn.close()
-        return employees
+    # ========== МЕТОДЫ ДЛЯ СОТРУДНИКОВ ==========
+
+    @cached("employees")
+    def get_employees(self, branch_id=None):
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+
+            if branch_id:
+                cursor.execute("""
+                               SELECT worker_id, name_id, job_title, report_count, date_of_work
+                               FROM employees WHERE branch_id = ?
+                               ORDER BY name_id
+                               """, (branch_id,))
+            else:
+                cursor.execute("""
+                               SELECT worker_id, name_id, job_title, report_count, date_of_work
+                               FROM employees ORDER BY name_id
+                               """)
+
+            employees = cursor.fetchall()
+            return employees
+        finally:
+            conn.close()
+
+    @cached("employees")
+    def get_employee(self, worker_id):
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                           SELECT worker_id, name_id, job_title, report_count, date_of_work, branch_id
+                           FROM employees WHERE worker_id = ?
+                           """, (worker_id,))
+            return cursor.fetchone()
+        finally:
+            conn.close()
 
+    @invalidates("employees")
     def add_employee(self, name, job_title, date_of_work, branch_id=None):
         conn = self.get_connection()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-                       INSERT INTO employees (name_id, job_title, report_count, date_of_work, branch_id)
-                       VALUES (?, ?, ?, ?, ?)
-                       """, (name, job_title, 0, date_of_work, branch_id))
+            cursor.execute("""
+                           INSERT INTO employees (name_id, job_title, report_count, date_of_work, branch_id)
+                           VALUES (?, ?, ?, ?, ?)
+                           """, (name, job_title, 0, date_of_work, branch_id))
 
-        employee_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return employee_id
+            employee_id = cursor.lastrowid
+            conn.commit()
+            self._publish("employee", employee_id, INSERT)
+            return employee_id
+        finally:
+            conn.close()
 
+    @invalidates("employees")
     def update_employee(self, worker_id, name, job_title, date_of_work):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-                       UPDATE employees
-                       SET name_id = ?, job_title = ?, date_of_work = ?
-                       WHERE worker_id = ?
-                       """, (name, job_title, date_of_work, worker_id))
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return success
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                           UPDATE employees
+                           SET name_id = ?, job_title = ?, date_of_work = ?
+                           WHERE worker_id = ?
+                           """, (name, job_title, date_of_work, worker_id))
+            success = cursor.rowcount > 0
+            conn.commit()
+            if success:
+                self._publish("employee", worker_id, UPDATE)
+            return success
+        finally:
+            conn.close()
 
+    @invalidates("employees")
     def delete_employee(self, employee_id):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM employees WHERE worker_id = ?", (employee_id,))
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return success
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM employees WHERE worker_id = ?", (employee_id,))
+            success = cursor.rowcount > 0
+            conn.commit()
+            if success:
+                self._publish("employee", employee_id, DELETE)
+                # У комнат мог сброситься ответственный (ON DELETE SET NULL)
+                self._publish("room", None, UPDATE)
+            return success
+        finally:
+            conn.close()
 
     # ========== МЕТОДЫ ДЛЯ ПОЛЬЗОВАТЕЛЕЙ ==========
 
@@ -603,6 +1180,164 @@ class DatabaseHandler:
         finally:
             conn.close()
 
+    def get_equipment_page(self, after=None, limit=500):
+        """Страница оборудования в порядке (name, equipment_id).
+
+        after - ключ (name, equipment_id) последней строки предыдущей страницы.
+        Поиск следующей страницы идет по индексу, а не через OFFSET, поэтому
+        стоимость не растет с номером страницы.
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            if after is None:
+                cursor.execute("""
+                               SELECT equipment_id, name, category, type, serial_number, status,
+                                      quantity, price
+                               FROM equipment
+                               ORDER BY name, equipment_id
+                               LIMIT ?
+                               """, (limit,))
+            else:
+                cursor.execute("""
+                               SELECT equipment_id, name, category, type, serial_number, status,
+                                      quantity, price
+                               FROM equipment
+                               WHERE (name, equipment_id) > (?, ?)
+                               ORDER BY name, equipment_id
+                               LIMIT ?
+                               """, (after[0], after[1], limit))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def iter_all_equipment(self, chunk_size=500):
+        """Потоковый обход всего оборудования страницами по chunk_size.
+
+        Соединение занимается только на время чтения одной страницы.
+        """
+        after = None
+        while True:
+            page = self.get_equipment_page(after, chunk_size)
+            yield from page
+            if len(page) < chunk_size:
+                return
+            after = (page[-1]['name'], page[-1]['equipment_id'])
+
+    def has_equipment_fts(self):
+        """Есть ли в БД полнотекстовый индекс equipment_fts (миграция 4)"""
+        if self._equipment_fts is None:
+            conn = self.get_connection()
+            try:
+                row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'equipment_fts'").fetchone()
+                self._equipment_fts = row is not None
+            finally:
+                conn.close()
+        return self._equipment_fts
+
+    def search_equipment(self, query="", filters=None, limit=100):
+        """Поиск оборудования по словам из name, serial_number, supplier, notes.
+
+        Каждое слово ищется по началу ("мон" найдет "Монитор"), результаты
+        упорядочены по релевантности (bm25, совпадение в названии весит больше).
+        filters - точные условия по EQUIPMENT_SEARCH_FILTERS, а ключ 'supplier'
+        ищет слова только в поставщике. limit=None - все найденные позиции
+        без ранжирования (в порядке equipment_id).
+        Возвращает те же колонки, что get_all_equipment.
+        """
+        sql, params, ranked_order, plain_order = self._equipment_search_sql(
+            query, filters, "e.equipment_id, e.name, e.category, e.type, e.serial_number, e.status")
+        sql += f" ORDER BY {plain_order if limit is None else ranked_order} LIMIT ?"
+        params.append(-1 if limit is None else limit)
+
+        conn = self.get_connection()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def search_equipment_ids(self, query="", filters=None):
+        """Множество equipment_id всех позиций, подходящих под поиск
+        (условия как у search_equipment): для фильтрации уже загруженной
+        таблицы строки целиком не нужны"""
+        sql, params, _, _ = self._equipment_search_sql(query, filters, "e.equipment_id")
+        conn = self.get_connection()
+        try:
+            return {row[0] for row in conn.execute(sql, params)}
+        finally:
+            conn.close()
+
+    def _equipment_search_sql(self, query, filters, columns):
+        """SELECT columns для search_equipment без ORDER BY и LIMIT.
+
+        Возвращает (sql, параметры, порядок по релевантности, порядок без ранжирования).
+        """
+        filters = dict(filters or {})
+        supplier = filters.pop('supplier', None)
+        unknown = set(filters) - set(EQUIPMENT_SEARCH_FILTERS)
+        if unknown:
+            raise ValueError(f"Недопустимые фильтры поиска: {', '.join(sorted(unknown))}")
+
+        conditions = []
+        params = []
+        for key, value in filters.items():
+            if value is not None:
+                conditions.append(f"e.{key} = ?")
+                params.append(value)
+
+        words = _search_words(query)
+        supplier_words = _search_words(supplier)
+        use_fts = (words or supplier_words) and self.has_equipment_fts()
+
+        if use_fts:
+            match = [_fts_prefix(word) for word in words]
+            if supplier_words:
+                match.append("supplier : (" + " AND ".join(_fts_prefix(word) for word in supplier_words) + ")")
+            sql = f"""
+                  SELECT {columns}
+                  FROM equipment_fts
+                  JOIN equipment e ON e.equipment_id = equipment_fts.rowid
+                  WHERE equipment_fts MATCH ?
+                  """
+            params.insert(0, " AND ".join(match))
+            # Без лимита нужен весь набор - ранжирование только замедлит выборку
+            ranked_order = "bm25(equipment_fts, 10.0, 5.0, 2.0, 1.0), e.equipment_id"
+            plain_order = "equipment_fts.rowid"
+        else:
+            sql = f"""
+                  SELECT {columns}
+                  FROM equipment e
+                  WHERE 1 = 1
+                  """
+            # Без FTS5: подстрока в любом из полей, по одному условию на слово
+            for word in words:
+                conditions.append("(e.name LIKE ? ESCAPE '\\' OR e.serial_number LIKE ? ESCAPE '\\'"
+                                  " OR e.supplier LIKE ? ESCAPE '\\' OR e.notes LIKE ? ESCAPE '\\')")
+                params.extend([_like_pattern(word)] * 4)
+            for word in supplier_words:
+                conditions.append("e.supplier LIKE ? ESCAPE '\\'")
+                params.append(_like_pattern(word))
+            ranked_order = plain_order = "e.name, e.equipment_id"
+
+        for condition in conditions:
+            sql += f" AND {condition}"
+        return sql, params, ranked_order, plain_order
+
+    def get_equipment(self, equipment_id):
+        """Одна запись оборудования (колонки как у get_equipment_page и room_id)"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                           SELECT equipment_id, name, category, type, serial_number, status,
+                                  quantity, price, room_id
+                           FROM equipment
+                           WHERE equipment_id = ?
+                           """, (equipment_id,))
+            return cursor.fetchone()
+        finally:
+            conn.close()
+
     def get_equipment_by_room(self, room_id):
         """Получение оборудования по комнате"""
         conn = self.get_connection()
@@ -622,34 +1357,109 @@ class DatabaseHandler:
         finally:
             conn.close()
 
+    def get_room_dossier(self, room_id):
+        """Все данные комнаты для выгрузок одним запросом.
+
+        Возвращает словарь:
+            room        - поля комнаты и название филиала,
+            responsible - ответственный сотрудник (None, если не назначен),
+            equipment   - оборудование комнаты по названию,
+            categories  - итоги по категориям: items, quantity, total_value.
+        None, если комнаты нет. Итоги считаются оконными функциями в том же
+        запросе, что выбирает оборудование (по строке на единицу оборудования,
+        для пустой комнаты - одна строка без оборудования).
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                           SELECT r.room_id, r.room_number, r.room_name, r.floor, r.capacity,
+                                  r.desks_count, r.chairs_count, r.sockets_count, r.area, r.notes,
+                                  r.branch_id, b.name AS branch_name,
+                                  e.worker_id, e.name_id, e.job_title, e.phone, e.email,
+                                  eq.equipment_id, eq.name, eq.category, eq.type, eq.serial_number,
+                                  eq.status, eq.quantity, eq.price,
+                                  COUNT(eq.equipment_id) OVER by_category AS category_items,
+                                  SUM(eq.quantity) OVER by_category AS category_quantity,
+                                  SUM(eq.price * eq.quantity) OVER by_category AS category_value
+                           FROM room r
+                                    LEFT JOIN branches b ON r.branch_id = b.branch_id
+                                    LEFT JOIN employees e ON r.responsible_employee_id = e.worker_id
+                                    LEFT JOIN equipment eq ON eq.room_id = r.room_id
+                           WHERE r.room_id = ?
+                           WINDOW by_category AS (PARTITION BY eq.category)
+                           ORDER BY eq.name, eq.equipment_id
+                           """, (room_id,))
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        if not rows:
+            return None
+
+        first = rows[0]
+        room_fields = ("room_id", "room_number", "room_name", "floor", "capacity", "desks_count",
+                       "chairs_count", "sockets_count", "area", "notes", "branch_id", "branch_name")
+        equipment_fields = ("equipment_id", "name", "category", "type", "serial_number",
+                            "status", "quantity", "price")
+        dossier = {
+            'room': {field: first[field] for field in room_fields},
+            'responsible': None,
+            'equipment': [],
+            'categories': [],
+        }
+        if first['worker_id'] is not None:
+            dossier['responsible'] = {
+                'worker_id': first['worker_id'],
+                'name': first['name_id'],
+                'job_title': first['job_title'],
+                'phone': first['phone'],
+                'email': first['email'],
+            }
+
+        categories = {}
+        for row in rows:
+            if row['equipment_id'] is None:
+                continue
+            dossier['equipment'].append({field: row[field] for field in equipment_fields})
+            categories.setdefault(row['category'], {
+                'category': row['category'],
+                'items': row['category_items'],
+                'quantity': row['category_quantity'] or 0,
+                'total_value': row['category_value'] or 0,
+            })
+        dossier['categories'] = sorted(categories.values(), key=lambda item: item['category'] or "")
+        return dossier
+
+    @staticmethod
+    def _equipment_values(data, today=None):
+        """Значения для INSERT_EQUIPMENT_SQL из словаря с данными оборудования"""
+        return (
+            data.get('name', ''),
+            data.get('category', ''),
+            data.get('type', ''),
+            data.get('quantity', 1),
+            data.get('serial_number', ''),
+            data.get('supplier', ''),
+            data.get('price', 0),
+            data.get('date_incoming', today or datetime.now().strftime("%Y-%m-%d")),
+            data.get('state_incoming', 1),
+            data.get('phone_supplier', ''),
+            data.get('email_supplier', ''),
+            data.get('status', 'in_use'),
+            data.get('notes', '')
+        )
+
+    @invalidates("equipment")
     def add_equipment(self, data):
         """Добавление нового оборудования"""
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
-            cursor.execute("""
-                           INSERT INTO equipment (
-                               name, category, type, quantity, serial_number,
-                               supplier, price, date_incoming, state_incoming,
-                               phone_supplier, email_supplier, status, notes
-                           ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                           """, (
-                               data.get('name', ''),
-                               data.get('category', ''),
-                               data.get('type', ''),
-                               data.get('quantity', 1),
-                               data.get('serial_number', ''),
-                               data.get('supplier', ''),
-                               data.get('price', 0),
-                               data.get('date_incoming', datetime.now().strftime("%Y-%m-%d")),
-                               data.get('state_incoming', 1),
-                               data.get('phone_supplier', ''),
-                               data.get('email_supplier', ''),
-                               data.get('status', 'in_use'),
-                               data.get('notes', '')
-                           ))
+            cursor.execute(INSERT_EQUIPMENT_SQL, self._equipment_values(data))
             equip_id = cursor.lastrowid
             conn.commit()
+            self._publish("equipment", equip_id, INSERT)
             return equip_id
         except Exception as e:
             print(f"Ошибка добавления оборудования: {e}")
@@ -657,6 +1467,72 @@ class DatabaseHandler:
         finally:
             conn.close()
 
+    @invalidates("equipment")
+    def add_equipment_many(self, rows, chunk_size=1000):
+        """Массовое добавление оборудования одной транзакцией.
+
+        rows - любой итерируемый набор словарей (как для add_equipment),
+        читается потоково пачками по chunk_size. Ошибочные строки (например,
+        повтор серийного номера) не прерывают загрузку, а попадают в список
+        ошибок.
+
+        Возвращает (new_ids, errors): ID добавленных записей в порядке строк и
+        список (номер строки, серийный номер, текст ошибки).
+        """
+        new_ids = []
+        errors = []
+        today = datetime.now().strftime("%Y-%m-%d")
+        conn = self.get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            chunk = []
+            for index, data in enumerate(rows):
+                if not data.get('name') or not data.get('serial_number'):
+                    errors.append((index, data.get('serial_number', ''),
+                                   "не заполнено название или серийный номер"))
+                    continue
+                chunk.append((index, self._equipment_values(data, today)))
+                if len(chunk) >= chunk_size:
+                    self._insert_equipment_chunk(cursor, chunk, new_ids, errors)
+                    chunk = []
+            if chunk:
+                self._insert_equipment_chunk(cursor, chunk, new_ids, errors)
+            conn.commit()
+            if new_ids:
+                self._publish("equipment", None, INSERT)
+            errors.sort(key=lambda error: error[0])
+            print(f"✅ Добавлено оборудования: {len(new_ids)}, ошибок: {len(errors)}")
+            return new_ids, errors
+        finally:
+            conn.close()
+
+    def _insert_equipment_chunk(self, cursor, chunk, new_ids, errors):
+        """Вставка пачки многострочными INSERT, при ошибке - построчно"""
+        cursor.execute("SAVEPOINT equipment_chunk")
+        # Транзакция держит блокировку записи, поэтому все ID больше
+        # текущего максимума принадлежат только что вставленной пачке
+        last_id = cursor.execute("SELECT COALESCE(MAX(equipment_id), 0) FROM equipment").fetchone()[0]
+        try:
+            for start in range(0, len(chunk), EQUIPMENT_ROWS_PER_INSERT):
+                part = chunk[start:start + EQUIPMENT_ROWS_PER_INSERT]
+                params = [value for _, values in part for value in values]
+                cursor.execute(_multi_row_insert_sql(len(part)), params)
+        except sqlite3.IntegrityError:
+            cursor.execute("ROLLBACK TO equipment_chunk")
+            for index, values in chunk:
+                try:
+                    cursor.execute(INSERT_EQUIPMENT_SQL, values)
+                    new_ids.append(cursor.lastrowid)
+                except sqlite3.IntegrityError as e:
+                    errors.append((index, values[4], str(e)))
+        else:
+            cursor.execute("SELECT equipment_id FROM equipment WHERE equipment_id > ? ORDER BY equipment_id",
+                           (last_id,))
+            new_ids.extend(row[0] for row in cursor.fetchall())
+        cursor.execute("RELEASE equipment_chunk")
+
+    @invalidates("equipment")
     def update_equipment_room(self, equipment_id, room_id):
         """Обновление комнаты оборудования"""
         conn = self.get_connection()
@@ -665,6 +1541,7 @@ class DatabaseHandler:
             cursor.execute("UPDATE equipment SET room_id = ? WHERE equipment_id = ?",
                            (room_id, equipment_id))
             conn.commit()
+            self._publish("equipment", equipment_id, UPDATE)
             return True
         except Exception as e:
             print(f"Ошибка обновления оборудования: {e}")
@@ -672,28 +1549,337 @@ class DatabaseHandler:
         finally:
             conn.close()
 
+    @invalidates("equipment")
+    def update_equipment_room_many(self, equipment_ids, room_id):
+        """Перенос нескольких единиц оборудования в комнату одной транзакцией.
+
+        Возвращает перенесенные записи (equipment_id, name, category, type,
+        serial_number) в порядке equipment_ids; несуществующие ID пропускаются.
+        При ошибке не переносится ничего.
+        """
+        equipment_ids = list(dict.fromkeys(equipment_ids))
+        if not equipment_ids:
+            return []
+
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.executemany("UPDATE equipment SET room_id = ? WHERE equipment_id = ?",
+                               [(room_id, equipment_id) for equipment_id in equipment_ids])
+            found = {}
+            for start in range(0, len(equipment_ids), EQUIPMENT_ROWS_PER_INSERT):
+                part = equipment_ids[start:start + EQUIPMENT_ROWS_PER_INSERT]
+                cursor.execute(f"""
+                               SELECT equipment_id, name, category, type, serial_number
+                               FROM equipment
+                               WHERE equipment_id IN ({', '.join('?' * len(part))})
+                               """, part)
+                found.update((row['equipment_id'], row) for row in cursor.fetchall())
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        moved = [found[equipment_id] for equipment_id in equipment_ids if equipment_id in found]
+        # Событие на каждую запись: окно само переходит на полную перезагрузку,
+        # если изменений больше его лимита
+        for item in moved:
+            self._publish("equipment", item['equipment_id'], UPDATE)
+        return moved
+
+    # ========== МЕТОДЫ ДЛЯ РАБОЧИХ МЕСТ ==========
+
+    def load_room_workplaces(self, room_id):
+        """Распределение комнаты: {номер места: данные места} одним запросом.
+
+        Данные - словарь с ключами WORKPLACE_FIELDS, как у WorkplaceDialog.get_data().
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                           SELECT workplace_number, {', '.join(WORKPLACE_FIELDS)}
+                           FROM workplace_assignment
+                           WHERE room_id = ?
+                           ORDER BY workplace_number
+                           """, (room_id,))
+            return {row['workplace_number']: self._workplace_data(row) for row in cursor.fetchall()}
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _workplace_data(row):
+        data = {field: row[field] for field in WORKPLACE_FIELDS}
+        for flag in WORKPLACE_FLAGS:
+            data[flag] = bool(data[flag])
+        return data
+
+    @staticmethod
+    def _workplace_values(room_id, number, data):
+        """Значения строки workplace_assignment из данных места"""
+        values = [room_id, number]
+        for field in WORKPLACE_FIELDS:
+            value = data.get(field)
+            if field in WORKPLACE_FLAGS:
+                value = int(bool(value))
+            elif field != "equipment_id":
+                value = value or ""
+            values.append(value)
+        return tuple(values)
+
+    def _write_room_workplaces(self, cursor, room_id, workplaces):
+        """Запись распределения комнаты в открытой транзакции: измененные
+        места сохраняются, отсутствующие в workplaces удаляются.
+        Возвращает (число записанных, число удаленных)."""
+        cursor.execute(f"""
+                       SELECT workplace_number, {', '.join(WORKPLACE_FIELDS)}
+                       FROM workplace_assignment
+                       WHERE room_id = ?
+                       """, (room_id,))
+        old_rows = {row['workplace_number']: tuple(row) for row in cursor.fetchall()}
+
+        upserts = []
+        for number, data in workplaces.items():
+            values = self._workplace_values(room_id, number, data)
+            if old_rows.get(number) != values[1:]:
+                upserts.append(values)
+        removed = [(room_id, number) for number in old_rows if number not in workplaces]
+
+        cursor.executemany(WORKPLACE_UPSERT_SQL, upserts)
+        cursor.executemany("DELETE FROM workplace_assignment WHERE room_id = ? AND workplace_number = ?",
+                           removed)
+        return len(upserts), len(removed)
+
+    def save_room_workplaces(self, room_id, workplaces):
+        """Сохранение распределения комнаты одной транзакцией.
+
+        workplaces - {номер места: данные места}; места, которых нет в
+        словаре, считаются свободными. Возвращает число измененных мест.
+        """
+        return self.save_all_workplaces({room_id: workplaces})
+
+    @invalidates("workplace_assignment")
+    def save_all_workplaces(self, workplaces_by_room):
+        """Сохранение распределения нескольких комнат одной транзакцией.
+
+        workplaces_by_room - {room_id: {номер места: данные места}}.
+        Записываются только изменившиеся места. Возвращает число
+        измененных мест.
+        """
+        changed_rooms = []
+        total = 0
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            for room_id, workplaces in workplaces_by_room.items():
+                written, removed = self._write_room_workplaces(cursor, room_id, workplaces)
+                if written or removed:
+                    changed_rooms.append(room_id)
+                    total += written + removed
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        for room_id in changed_rooms:
+            self._publish("workplace", room_id, UPDATE)
+        return total
+
+    @invalidates("workplace_assignment")
+    def delete_all_workplaces(self):
+        """Удаление распределения всех комнат; возвращает число удаленных мест"""
+        conn = self.get_connection()
+        try:
+            removed = conn.execute("DELETE FROM workplace_assignment").rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        if removed:
+            self._publish("workplace", None, DELETE)
+        return removed
+
+    # ========== МЕТОДЫ ДЛЯ ИНВЕНТАРИЗАЦИИ ==========
+
+    def open_inventory_session(self, report_id=None, worker_id=None):
+        """Новый сеанс инвентаризации (см. inventory_session.InventorySession)"""
+        return InventorySession(self, report_id, worker_id)
+
+    @invalidates("inventory_log", "equipment", "reports")
+    def save_inventory_records(self, records, report_id=None, worker_id=None, report_data=None):
+        """Запись изменений статусов одной транзакцией.
+
+        records - список (equipment_id, новый статус, комментарий). Для каждой
+        записи в inventory_log сохраняются прежний статус и комната
+        оборудования, затем меняется статус в equipment. Если report_id не
+        задан, строка reports создается из report_data. Несуществующее
+        оборудование пропускается.
+
+        Записи со статусом не из EQUIPMENT_STATUSES не сохраняются, а попадают
+        в список отклоненных. Возвращает (report_id, rejected), где rejected -
+        список (equipment_id, статус, текст ошибки).
+        """
+        records = list(records)
+        rejected = [(equipment_id, status, "неизвестный статус")
+                    for equipment_id, status, _ in records if status not in EQUIPMENT_STATUSES]
+        records = [record for record in records if record[1] in EQUIPMENT_STATUSES]
+        if not records:
+            return report_id, rejected
+
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            created = report_id is None
+            if created:
+                report_data = dict(report_data or {})
+                report_data.setdefault('name', f"Инвентаризация {now}")
+                report_data.setdefault('date', now)
+                report_data.setdefault('worker_id', worker_id)
+                report_id = self._insert_report(cursor, report_data)
+
+            # Прежний статус и комната читаются из equipment тем же оператором
+            cursor.executemany("""
+                               INSERT INTO inventory_log (report_id, equipment_id, old_status, new_status,
+                                                          comment, inventory_date, worker_id, room_id)
+                               SELECT ?, equipment_id, status, ?, ?, ?, ?, room_id
+                               FROM equipment
+                               WHERE equipment_id = ?
+                               """, [(report_id, status, comment, now, worker_id, equipment_id)
+                                     for equipment_id, status, comment in records])
+            cursor.executemany("""
+                               UPDATE equipment SET status = ?, last_inventory_date = ?
+                               WHERE equipment_id = ?
+                               """, [(status, now, equipment_id) for equipment_id, status, _ in records])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        if created:
+            self._publish("report", report_id, INSERT)
+        # Событие на каждую запись: окно само переходит на полную перезагрузку,
+        # если изменений больше его лимита
+        for equipment_id, _, _ in records:
+            self._publish("equipment", equipment_id, UPDATE)
+        print(f"✅ Инвентаризация сохранена: {len(records)} изменений, отклонено: {len(rejected)} "
+              f"(отчет {report_id})")
+        return report_id, rejected
+
+    @staticmethod
+    def _log_report_join(log_table):
+        """Название отчета для строки журнала: отчет архивной строки может
+        остаться в рабочей БД, если у него есть и более новые строки"""
+        if log_table.startswith("archive."):
+            return ("COALESCE(rep.report_name, arep.report_name)",
+                    "LEFT JOIN reports rep ON l.report_id = rep.report_id "
+                    "LEFT JOIN archive.reports arep ON l.report_id = arep.report_id")
+        return "rep.report_name", "LEFT JOIN reports rep ON l.report_id = rep.report_id"
+
+    def get_equipment_history(self, equipment_id, limit=None):
+        """История инвентаризаций единицы оборудования, новые записи первыми.
+
+        Если есть архив, его строки идут следом за строками рабочей БД.
+        """
+        conn = self.get_connection()
+        try:
+            parts = []
+            for log_table in self._with_archive(conn, "inventory_log"):
+                report_name, report_join = self._log_report_join(log_table)
+                parts.append(f"""
+                             SELECT l.log_id, l.inventory_date, l.old_status, l.new_status, l.comment,
+                                    l.report_id, {report_name} AS report_name,
+                                    l.worker_id, e.name_id AS worker_name,
+                                    l.room_id, r.room_number, r.room_name
+                             FROM {log_table} l
+                                      {report_join}
+                                      LEFT JOIN employees e ON l.worker_id = e.worker_id
+                                      LEFT JOIN room r ON l.room_id = r.room_id
+                             WHERE l.equipment_id = ?
+                             """)
+            cursor = conn.cursor()
+            cursor.execute(" UNION ALL ".join(parts) + """
+                           ORDER BY inventory_date DESC, log_id DESC
+                           LIMIT ?
+                           """, (*[equipment_id] * len(parts), -1 if limit is None else limit))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def get_branch_changes(self, branch_id, date_from, date_to, limit=None):
+        """Изменения статусов в филиале за период, по времени.
+
+        Даты - строки 'YYYY-MM-DD' или 'YYYY-MM-DD HH:MM:SS', обе границы
+        включаются (дата без времени - весь день). Филиал определяется по
+        комнате, где оборудование стояло в момент проверки: журнал читается
+        по индексу (room_id, inventory_date) только для комнат филиала.
+        Если период начинается раньше границы архива, добавляется архив.
+        """
+        if len(date_to) == 10:
+            date_to = f"{date_to} 23:59:59"
+        conn = self.get_connection()
+        try:
+            parts = []
+            for log_table in self._with_archive(conn, "inventory_log", date_from):
+                parts.append(f"""
+                             SELECT l.log_id, l.inventory_date, l.equipment_id, eq.name, eq.serial_number,
+                                    l.old_status, l.new_status, l.comment, l.report_id,
+                                    l.worker_id, e.name_id AS worker_name,
+                                    r.room_id, r.room_number, r.room_name, r.floor
+                             FROM room r
+                                      JOIN {log_table} l ON l.room_id = r.room_id
+                                 AND l.inventory_date BETWEEN ? AND ?
+                                      LEFT JOIN equipment eq ON l.equipment_id = eq.equipment_id
+                                      LEFT JOIN employees e ON l.worker_id = e.worker_id
+                             WHERE r.branch_id = ?
+                             """)
+            cursor = conn.cursor()
+            cursor.execute(" UNION ALL ".join(parts) + """
+                           ORDER BY inventory_date, log_id
+                           LIMIT ?
+                           """, (*(date_from, date_to, branch_id) * len(parts), -1 if limit is None else limit))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
     # ========== МЕТОДЫ ДЛЯ ОТЧЕТОВ ==========
 
+    @staticmethod
+    def _insert_report(cursor, report_data):
+        """INSERT строки reports в открытой транзакции; возвращает report_id"""
+        cursor.execute("""
+                       INSERT INTO reports (
+                           report_name, report_date, description, order_number,
+                           worker_id, environment_id
+                       ) VALUES (?, ?, ?, ?, ?, ?)
+                       """, (
+                           report_data.get('name', ''),
+                           report_data.get('date', datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+                           report_data.get('description', ''),
+                           report_data.get('order_number', 0),
+                           report_data.get('worker_id'),
+                           report_data.get('environment_id')
+                       ))
+        return cursor.lastrowid
+
+    @invalidates("reports")
     def add_report(self, report_data):
         """Добавление нового отчета"""
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
-            cursor.execute("""
-                           INSERT INTO reports (
-                               report_name, report_date, description, order_number,
-                               worker_id, environment_id
-                           ) VALUES (?, ?, ?, ?, ?, ?)
-                           """, (
-                               report_data.get('name', ''),
-                               report_data.get('date', datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
-                               report_data.get('description', ''),
-                               report_data.get('order_number', 0),
-                               report_data.get('worker_id'),
-                               report_data.get('environment_id')
-                           ))
-            report_id = cursor.lastrowid
+            report_id = self._insert_report(cursor, report_data)
             conn.commit()
+            self._publish("report", report_id, INSERT)
             return report_id
         except Exception as e:
             print(f"Ошибка добавления отчета: {e}")
@@ -701,16 +1887,24 @@ class DatabaseHandler:
         finally:
             conn.close()
 
-    def get_all_reports(self):
-        """Получение всех отчетов"""
+    def _report_tables(self, conn, date_from):
+        """Таблицы отчетов для выборки: без date_from - только рабочая БД,
+        с датой старше границы архива - и архив"""
+        return self._with_archive(conn, "reports", date_from) if date_from else ["reports"]
+
+    def get_all_reports(self, date_from=None):
+        """Получение всех отчетов (с date_from - начиная с этой даты, включая архивные)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
-            cursor.execute("""
+            tables = self._report_tables(conn, date_from)
+            condition = "WHERE report_date >= ?" if date_from else ""
+            cursor.execute(" UNION ALL ".join(f"""
                            SELECT report_id, report_name, report_date, description, order_number
-                           FROM reports
-                           ORDER BY report_date DESC
-                           """)
+                           FROM {table}
+                           {condition}
+                           """ for table in tables) + "ORDER BY report_date DESC",
+                           (date_from,) * len(tables) if date_from else ())
             reports = cursor.fetchall()
             return reports
         except Exception as e:
@@ -719,18 +1913,63 @@ class DatabaseHandler:
         finally:
             conn.close()
 
+    def get_reports_page(self, after=None, limit=500, date_from=None):
+        """Страница отчетов, новые первыми: порядок (report_date, report_id) DESC.
+
+        after - ключ (report_date, report_id) последней строки предыдущей страницы.
+        date_from - нижняя граница даты; если она старше границы архива,
+        страницы продолжаются архивными отчетами.
+        """
+        conditions, params = [], []
+        if after is not None:
+            conditions.append("(report_date, report_id) < (?, ?)")
+            params.extend(after[:2])
+        if date_from:
+            conditions.append("report_date >= ?")
+            params.append(date_from)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        conn = self.get_connection()
+        try:
+            tables = self._report_tables(conn, date_from)
+            cursor = conn.cursor()
+            cursor.execute(" UNION ALL ".join(f"""
+                           SELECT report_id, report_name, report_date, description, order_number
+                           FROM {table}
+                           {where}
+                           """ for table in tables) + """
+                           ORDER BY report_date DESC, report_id DESC
+                           LIMIT ?
+                           """, (*params * len(tables), limit))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def iter_all_reports(self, chunk_size=500, date_from=None):
+        """Потоковый обход всех отчетов страницами по chunk_size"""
+        after = None
+        while True:
+            page = self.get_reports_page(after, chunk_size, date_from)
+            yield from page
+            if len(page) < chunk_size:
+                return
+            after = (page[-1]['report_date'], page[-1]['report_id'])
+
     def get_report(self, report_id):
-        """Получение отчета по ID"""
+        """Получение отчета по ID (если его нет в рабочей БД - из архива)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
-            cursor.execute("""
-                           SELECT report_id, report_name, report_date, description, order_number,
-                                  worker_id, environment_id
-                           FROM reports
-                           WHERE report_id = ?
-                           """, (report_id,))
-            report = cursor.fetchone()
+            report = None
+            for table in self._with_archive(conn, "reports"):
+                cursor.execute(f"""
+                               SELECT report_id, report_name, report_date, description, order_number,
+                                      worker_id, environment_id
+                               FROM {table}
+                               WHERE report_id = ?
+                               """, (report_id,))
+                report = cursor.fetchone()
+                if report:
+                    break
             return report
         except Exception as e:
             print(f"Ошибка загрузки отчета: {e}")
@@ -0,0 +1,151 @@
+import json
+import os
+
+# Файл настроек БД лежит рядом с company.db
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_config.json")
+
+# Переменная окружения имеет приоритет над файлом настроек
+PROFILE_ENV_VAR = "COMPANY_DB_PROFILE"
+
+DEFAULT_PROFILE = "interactive"
+
+# Переменная окружения COMPANY_DB_INSTRUMENT=1 включает замер запросов
+INSTRUMENT_ENV_VAR = "COMPANY_DB_INSTRUMENT"
+
+# Замер запросов (см. instrumentation.py): по умолчанию выключен.
+# dump_path - куда сохранять статистику при закрытии обработчика
+# (относительный путь - от папки с db_config.json, пусто - не сохранять)
+DEFAULT_INSTRUMENTATION = {
+    "enabled": False,
+    "slow_query_ms": 100,
+    "dump_path": "query_stats.json",
+}
+
+# Резервные копии (см. backup_service.py): папка (относительный путь -
+# от папки с db_config.json), сколько последних копий хранить, сколько
+# страниц копировать за один шаг и пауза между шагами (мс)
+DEFAULT_BACKUP = {
+    "dir": "backups",
+    "keep": 7,
+    "pages_per_step": 1024,
+    "step_pause_ms": 5,
+}
+
+# Архив старых отчетов и журнала инвентаризации (см. archive_records.py):
+# файл архива (относительный путь - от папки с company.db), сколько дней
+# строки остаются в рабочей БД и сколько строк переносить за транзакцию
+DEFAULT_ARCHIVE = {
+    "path": "archive.db",
+    "keep_days": 365,
+    "batch_size": 2000,
+}
+
+# Профили производительности SQLite, применяются при открытии соединения.
+# cache_size < 0 - размер кэша в КиБ, mmap_size - в байтах, busy_timeout - в мс.
+PROFILES = {
+    # Окна приложения: WAL, чтобы окно отчетности, настройки и plane.py
+    # не блокировали друг друга, и умеренный кэш
+    "interactive": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # Массовая загрузка поступлений: большой кэш, без fsync на каждый коммит
+    "bulk-import": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+    # Длинные выгрузки отчетов: только чтение, большой mmap
+    "read-only-report": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+        "query_only": "ON",
+    },
+}
+
+# Порядок важен: busy_timeout ставим первым, чтобы переключение в WAL
+# подождало чужую блокировку, а query_only - последним
+PRAGMA_ORDER = ("busy_timeout", "journal_mode", "synchronous", "cache_size",
+                "mmap_size", "temp_store", "query_only")
+
+
+def load_config(path=CONFIG_PATH):
+    """Чтение db_config.json (если файла нет - пустые настройки)"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка чтения настроек БД {path}: {e}")
+        return {}
+
+
+def get_profile_name(config=None):
+    """Имя профиля: переменная окружения, затем db_config.json, затем по умолчанию"""
+    name = os.environ.get(PROFILE_ENV_VAR)
+    if name:
+        return name
+    if config is None:
+        config = load_config()
+    return config.get("profile", DEFAULT_PROFILE)
+
+
+def get_instrumentation_settings(config=None):
+    """Настройки замера запросов: раздел "instrumentation" db_config.json
+    поверх значений по умолчанию; переменная окружения включает замер"""
+    if config is None:
+        config = load_config()
+    settings = dict(DEFAULT_INSTRUMENTATION)
+    settings.update(config.get("instrumentation", {}))
+    if os.environ.get(INSTRUMENT_ENV_VAR) == "1":
+        settings["enabled"] = True
+    if settings["dump_path"] and not os.path.isabs(settings["dump_path"]):
+        settings["dump_path"] = os.path.join(os.path.dirname(CONFIG_PATH), settings["dump_path"])
+    return settings
+
+
+def get_backup_settings(config=None):
+    """Настройки резервного копирования: раздел "backup" db_config.json
+    поверх значений по умолчанию"""
+    if config is None:
+        config = load_config()
+    settings = dict(DEFAULT_BACKUP)
+    settings.update(config.get("backup", {}))
+    if not os.path.isabs(settings["dir"]):
+        settings["dir"] = os.path.join(os.path.dirname(CONFIG_PATH), settings["dir"])
+    return settings
+
+
+def get_profile(name):
+    if name not in PROFILES:
+        raise ValueError(f"Неизвестный профиль БД: {name}. Доступны: {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+def apply_profile(conn, profile):
+    """Применение PRAGMA профиля к открытому соединению"""
+    for pragma in PRAGMA_ORDER:
+        if pragma in profile:
+            conn.execute(f"PRAGMA {pragma} = {profile[pragma]}")
+
+
+def get_archive_settings(config=None):
+    """Настройки архивации: раздел "archive" db_config.json поверх
+    значений по умолчанию"""
+    if config is None:
+        config = load_config()
+    settings = dict(DEFAULT_ARCHIVE)
+    settings.update(config.get("archive", {}))
+    return settings
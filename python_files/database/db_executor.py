@@ -0,0 +1,77 @@
+"""Фоновое выполнение запросов к БД для окон приложения.
+
+Медленный запрос или заблокированная другим процессом БД не должны
+замораживать интерфейс, поэтому чтения, запускаемые действиями
+пользователя, выполняются в пуле потоков. Каждый поток берет свое
+соединение из пула DatabaseHandler (соединения закрепляются за потоком).
+Результат возвращается в GUI-поток сигналом и передается в on_result.
+
+Запросы именуются ключом: новый запрос с тем же ключом отменяет
+предыдущий (например, при быстрой прокрутке этажей), и применяется
+только результат последнего.
+"""
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, Signal
+
+
+class DbExecutor(QObject):
+    """Пул потоков для запросов к БД с доставкой результата в GUI-поток"""
+
+    _done = Signal(object, object, object, object)  # ключ, номер запроса, результат, ошибка
+
+    def __init__(self, max_workers=2, parent=None):
+        super().__init__(parent)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+        self._requests = {}  # {ключ: (номер, future, on_result, on_error)}
+        self._numbers = itertools.count(1)
+        # Сигнал из рабочего потока доставляется в поток, где создан объект
+        self._done.connect(self._deliver)
+
+    def submit(self, key, func, *args, on_result=None, on_error=None, **kwargs):
+        """Запуск func(*args, **kwargs) в фоне; возвращает Future.
+
+        on_result(результат) и on_error(исключение) вызываются в GUI-потоке,
+        только если за это время не пришел более новый запрос с тем же ключом.
+        Без on_error ошибка печатается в консоль.
+        """
+        self.cancel(key)
+        number = next(self._numbers)
+        future = self.pool.submit(self._run, key, number, func, args, kwargs)
+        self._requests[key] = (number, future, on_result, on_error)
+        return future
+
+    def cancel(self, key):
+        """Отмена запроса: еще не начатый не выполнится, результат начатого отбрасывается"""
+        request = self._requests.pop(key, None)
+        if request is not None:
+            request[1].cancel()
+
+    def _run(self, key, number, func, args, kwargs):
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self._done.emit(key, number, None, e)
+            raise
+        self._done.emit(key, number, result, None)
+        return result
+
+    def _deliver(self, key, number, result, error):
+        request = self._requests.get(key)
+        if request is None or request[0] != number:
+            return  # запрос отменен или заменен более новым
+        del self._requests[key]
+        _, _, on_result, on_error = request
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                print(f"❌ Ошибка запроса к БД ({key}): {error}")
+        elif on_result:
+            on_result(result)
+
+    def shutdown(self):
+        """Остановка пула (при закрытии окна, до закрытия соединений БД)"""
+        self._requests.clear()
+        self.pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,52 @@
+import threading
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from python_files.database.events import coalesce
+
+
+class DataEventBus(QObject):
+    """Шина событий изменения данных одного DatabaseHandler.
+
+    Обработчик вызывает publish() после каждой записи (из любого потока),
+    шина копит события delay мс и отправляет сигнал changed со схлопнутым
+    списком ChangeEvent - серия правок дает одно обновление моделей.
+    """
+
+    changed = Signal(list)
+    _flush_requested = Signal()
+
+    def __init__(self, db, delay=30, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self._pending = []
+        self._lock = threading.Lock()
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.flush)
+        # Сигнал из чужого потока доставляется в поток шины (GUI)
+        self._flush_requested.connect(self.timer.start)
+
+        db.change_listeners.append(self.publish)
+
+    def publish(self, event):
+        with self._lock:
+            first = not self._pending
+            self._pending.append(event)
+        if first:
+            self._flush_requested.emit()
+
+    def flush(self):
+        with self._lock:
+            events, self._pending = self._pending, []
+        events = coalesce(events)
+        if events:
+            self.changed.emit(events)
+
+    def detach(self):
+        """Отключение от обработчика (при закрытии окна)"""
+        if self.publish in self.db.change_listeners:
+            self.db.change_listeners.remove(self.publish)
+        self.timer.stop()
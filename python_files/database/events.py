@@ -0,0 +1,51 @@
+from collections import namedtuple
+
+# Операции над записями
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+# Событие изменения данных, публикуется DatabaseHandler после коммита.
+# entity - "branch", "employee", "room", "floor_map", "equipment", "report",
+# "workplace" (распределение комнаты, entity_id - room_id);
+# entity_id = None - изменено сразу несколько записей (массовая загрузка,
+# каскадное удаление), такие модели перечитываются целиком.
+ChangeEvent = namedtuple("ChangeEvent", ["entity", "entity_id", "operation"])
+
+
+def _merge(first, second):
+    """Итоговая операция для двух событий одной записи (None - события нет)"""
+    if first == INSERT:
+        return None if second == DELETE else INSERT
+    if first == DELETE:
+        return UPDATE if second == INSERT else DELETE
+    return DELETE if second == DELETE else UPDATE
+
+
+def coalesce(events):
+    """Схлопывание пачки событий: по одному на запись, в порядке появления.
+
+    Если по сущности есть событие без ID, события отдельных записей этой
+    сущности не нужны - модель все равно перечитает все.
+    """
+    bulk = {}
+    for event in events:
+        if event.entity_id is None:
+            previous = bulk.get(event.entity)
+            bulk[event.entity] = event.operation if previous in (None, event.operation) else UPDATE
+
+    merged = {}
+    for event in events:
+        if event.entity in bulk:
+            key = (event.entity, None)
+            if key not in merged:
+                merged[key] = bulk[event.entity]
+            continue
+        key = (event.entity, event.entity_id)
+        if key in merged:
+            merged[key] = _merge(merged[key], event.operation)
+        else:
+            merged[key] = event.operation
+
+    return [ChangeEvent(entity, entity_id, operation)
+            for (entity, entity_id), operation in merged.items() if operation is not None]
@@ -0,0 +1,271 @@
+"""Опциональный замер запросов DatabaseHandler.
+
+Включается в db_config.json ("instrumentation": {"enabled": true}) или
+переменной окружения COMPANY_DB_INSTRUMENT=1. Тогда для каждого публичного
+метода обработчика и каждого SQL-оператора собираются число вызовов,
+суммарное, среднее и 95-процентильное время, для операторов - число
+прочитанных строк. Операторы дольше slow_query_ms попадают в журнал
+медленных запросов, к ним добавляется EXPLAIN QUERY PLAN.
+
+Выключенное инструментирование ничего не стоит: обработчик использует
+обычные соединения и не оборачивает методы.
+"""
+import collections
+import functools
+import inspect
+import json
+import math
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from python_files.database.connection_pool import PooledConnection
+
+# Сколько последних замеров хранить для расчета p95 (на метод или оператор)
+SAMPLES_PER_KEY = 1000
+# Сколько последних медленных запросов хранить
+SLOW_LOG_SIZE = 100
+# Методы обработчика, которые не замеряются
+NOT_TIMED = {"get_connection", "close", "get_query_stats", "dump_query_stats", "reset_query_stats"}
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return repr(value)
+
+
+def _json_params(params):
+    if isinstance(params, dict):
+        return {key: _json_value(value) for key, value in params.items()}
+    try:
+        return [_json_value(value) for value in params]
+    except TypeError:
+        return repr(params)
+
+
+class _Timing:
+    """Накопленная статистика одного метода или оператора"""
+
+    __slots__ = ("count", "total", "rows", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.rows = 0
+        self.samples = collections.deque(maxlen=SAMPLES_PER_KEY)
+
+    def add(self, seconds, rows=0):
+        self.count += 1
+        self.total += seconds
+        self.rows += rows
+        self.samples.append(seconds)
+
+    def as_dict(self, name_key, name):
+        return {
+            name_key: name,
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'mean_ms': round(self.total * 1000 / self.count, 3),
+            'p95_ms': round(_percentile(self.samples, 0.95) * 1000, 3),
+            'rows': self.rows,
+        }
+
+
+class QueryStats:
+    """Статистика вызовов одного обработчика (потокобезопасна)"""
+
+    def __init__(self, slow_query_ms=100):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.methods = {}
+            self.statements = {}
+            self.slow = collections.deque(maxlen=SLOW_LOG_SIZE)
+            self.since = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def record_method(self, name, seconds):
+        with self._lock:
+            self.methods.setdefault(name, _Timing()).add(seconds)
+
+    def record_statement(self, sql, params, seconds, rows):
+        sql = " ".join(sql.split())
+        with self._lock:
+            self.statements.setdefault(sql, _Timing()).add(seconds, rows)
+            if seconds * 1000 >= self.slow_query_ms:
+                self.slow.append({
+                    'sql': sql,
+                    'params': params,
+                    'ms': round(seconds * 1000, 3),
+                    'rows': rows,
+                    'at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'plan': None,
+                })
+
+    def explain_slow(self, conn):
+        """EXPLAIN QUERY PLAN для медленных SELECT, у которых плана еще нет.
+
+        План снимается не в момент запроса, а при просмотре статистики,
+        чтобы не замедлять и без того медленный вызов.
+        """
+        with self._lock:
+            pending = [entry for entry in self.slow if entry['plan'] is None]
+        for entry in pending:
+            if not entry['sql'].upper().startswith(("SELECT", "WITH")):
+                entry['plan'] = []
+                continue
+            try:
+                rows = conn.execute(f"EXPLAIN QUERY PLAN {entry['sql']}", entry['params']).fetchall()
+                entry['plan'] = [row[3] for row in rows]
+            except (sqlite3.Error, ValueError) as e:
+                entry['plan'] = [f"не удалось получить план: {e}"]
+
+    def summary(self):
+        """Статистика в виде словаря (самые затратные по суммарному времени первыми)"""
+        with self._lock:
+            methods = sorted((timing.as_dict('method', name) for name, timing in self.methods.items()),
+                             key=lambda item: item['total_ms'], reverse=True)
+            statements = sorted((timing.as_dict('sql', sql) for sql, timing in self.statements.items()),
+                                key=lambda item: item['total_ms'], reverse=True)
+            slow = [dict(entry, params=_json_params(entry['params'])) for entry in self.slow]
+        for item in methods:
+            del item['rows']
+        return {
+            'since': self.since,
+            'slow_query_ms': self.slow_query_ms,
+            'methods': methods,
+            'statements': statements,
+            'slow_queries': slow,
+        }
+
+    def dump(self, path, summary=None):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary or self.summary(), f, ensure_ascii=False, indent=2)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Курсор, замеряющий выполнение оператора вместе с чтением его строк.
+
+    Замер отправляется в статистику, когда строки дочитаны (fetchall),
+    начат следующий оператор или курсор закрыт.
+    """
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self._call = None  # [sql, параметры, секунды, строки]
+
+    def _finish(self):
+        call, self._call = getattr(self, "_call", None), None
+        if call is not None:
+            self.connection.stats.record_statement(*call)
+
+    def _begin(self, sql, parameters):
+        self._finish()
+        self._call = [sql, parameters, 0.0, 0]
+        return time.perf_counter()
+
+    def execute(self, sql, parameters=()):
+        start = self._begin(sql, parameters)
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._call[2] += time.perf_counter() - start
+
+    def executemany(self, sql, seq_of_parameters):
+        # Параметры executemany в журнал не попадают - их может быть много
+        start = self._begin(sql, ())
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._call[2] += time.perf_counter() - start
+
+    def _fetched(self, start, rows):
+        if self._call is not None:
+            self._call[2] += time.perf_counter() - start
+            self._call[3] += rows
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = super().fetchmany(*args, **kwargs)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        self._finish()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0)
+            self._finish()
+            raise
+        self._fetched(start, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+class InstrumentedConnection(PooledConnection):
+    """Соединение пула, все курсоры которого замеряют операторы"""
+
+    stats = None  # QueryStats, задается обработчиком при открытии
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _timed_method(method, name, stats):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stats.record_method(name, time.perf_counter() - start)
+    return wrapper
+
+
+def instrument_methods(handler, stats):
+    """Замер времени публичных методов обработчика (обертки ставятся на экземпляр).
+
+    Генераторы (iter_all_*) не оборачиваются: их время складывается из
+    вызовов страничных методов, которые замеряются сами.
+    """
+    for name, method in inspect.getmembers(type(handler), inspect.isfunction):
+        if name.startswith("_") or name in NOT_TIMED:
+            continue
+        if inspect.isgeneratorfunction(inspect.unwrap(method)):
+            continue
+        setattr(handler, name, _timed_method(getattr(handler, name), name, stats))
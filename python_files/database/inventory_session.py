@@ -0,0 +1,64 @@
+class InventorySession:
+    """Сеанс инвентаризации: изменения статусов копятся в памяти и
+    записываются в inventory_log одной транзакцией.
+
+    Сеанс привязан к строке reports (report_id) или создает ее при
+    сохранении из report_data. Повторная отметка той же единицы
+    заменяет предыдущую. В блоке with изменения сохраняются при выходе
+    без исключения и отбрасываются при исключении.
+    """
+
+    def __init__(self, db, report_id=None, worker_id=None):
+        self.db = db
+        self.report_id = report_id
+        self.worker_id = worker_id
+        self._changes = {}  # {equipment_id: (новый статус, комментарий)}
+
+    def record(self, equipment_id, new_status, comment=None):
+        """Отметить новый статус единицы оборудования"""
+        self._changes.pop(equipment_id, None)  # порядок - по последней отметке
+        self._changes[equipment_id] = (new_status, comment)
+
+    def discard(self, equipment_id=None):
+        """Отменить отметку одной единицы или всего сеанса"""
+        if equipment_id is None:
+            self._changes.clear()
+        else:
+            self._changes.pop(equipment_id, None)
+
+    def pending_status(self, equipment_id):
+        """Отмеченный, но еще не сохраненный статус (None, если отметки нет)"""
+        change = self._changes.get(equipment_id)
+        return change[0] if change else None
+
+    def __len__(self):
+        return len(self._changes)
+
+    def commit(self, report_data=None):
+        """Запись накопленных изменений; возвращает (report_id, rejected).
+
+        Если сеанс не привязан к отчету, строка reports создается из
+        report_data в той же транзакции. rejected - отметки с недопустимым
+        статусом (см. save_inventory_records); они остаются в сеансе, чтобы
+        их можно было исправить.
+        """
+        if not self._changes:
+            return self.report_id, []
+        records = [(equipment_id, status, comment)
+                   for equipment_id, (status, comment) in self._changes.items()]
+        self.report_id, rejected = self.db.save_inventory_records(
+            records, report_id=self.report_id, worker_id=self.worker_id, report_data=report_data)
+        kept = {equipment_id for equipment_id, _, _ in rejected}
+        self._changes = {equipment_id: change for equipment_id, change in self._changes.items()
+                         if equipment_id in kept}
+        return self.report_id, rejected
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+        return False
@@ -0,0 +1,550 @@
+# Миграции схемы БД. Номер текущей версии схемы хранится в PRAGMA user_version,
+# поэтому при обычном запуске проверка схемы - это одно чтение прагмы.
+# Новые изменения схемы (индексы, колонки, таблицы) добавляются только
+# новой функцией в конец MIGRATIONS, старые миграции не редактируются.
+
+
+def _migration_1_base_schema(cursor):
+    """Базовая схема (раньше создавалась в DatabaseHandler.create_tables)"""
+    # Таблица филиалов
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS branches (
+                                                           branch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                           name TEXT NOT NULL,
+                                                           floors_count INTEGER NOT NULL,
+                                                           address TEXT NOT NULL
+                   )
+                   ''')
+
+    # Таблица сотрудников
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS employees (
+                                                            worker_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                            name_id TEXT NOT NULL,
+                                                            job_title TEXT NOT NULL,
+                                                            report_count INTEGER NOT NULL,
+                                                            date_of_work TEXT NOT NULL,
+                                                            branch_id INTEGER,
+                                                            phone TEXT,
+                                                            email TEXT,
+                                                            FOREIGN KEY (branch_id) REFERENCES branches(branch_id) ON DELETE SET NULL
+                       )
+                   ''')
+
+    # Таблица окружения
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS environment (
+                                                              environment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                              environment_name TEXT NOT NULL,
+                                                              branch_id INTEGER NOT NULL,
+                                                              FOREIGN KEY (branch_id) REFERENCES branches(branch_id) ON DELETE CASCADE
+                       )
+                   ''')
+
+    # Таблица комнат
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS room (
+                                                       room_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                       room_number TEXT NOT NULL,
+                                                       room_name TEXT NOT NULL,
+                                                       branch_id INTEGER,
+                                                       floor INTEGER DEFAULT 1,
+                                                       capacity INTEGER DEFAULT 0,
+                                                       desks_count INTEGER DEFAULT 0,
+                                                       chairs_count INTEGER DEFAULT 0,
+                                                       sockets_count INTEGER DEFAULT 0,
+                                                       area REAL DEFAULT 0.0,
+                                                       responsible_employee_id INTEGER,
+                                                       notes TEXT DEFAULT '',
+                                                       FOREIGN KEY (branch_id) REFERENCES branches(branch_id) ON DELETE CASCADE,
+                       FOREIGN KEY (responsible_employee_id) REFERENCES employees(worker_id) ON DELETE SET NULL
+                       )
+                   ''')
+
+    # Таблица оборудования
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS equipment (
+                                                            equipment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                            quantity INTEGER NOT NULL,
+                                                            category TEXT NOT NULL,
+                                                            type TEXT NOT NULL,
+                                                            name TEXT NOT NULL,
+                                                            date_incoming TEXT NOT NULL,
+                                                            state_incoming INTEGER NOT NULL,
+                                                            serial_number TEXT NOT NULL UNIQUE,
+                                                            supplier TEXT NOT NULL,
+                                                            price INTEGER NOT NULL,
+                                                            phone_supplier TEXT NOT NULL,
+                                                            email_supplier TEXT NOT NULL,
+                                                            room_id INTEGER,
+                                                            branch_id INTEGER,
+                                                            status TEXT DEFAULT 'in_use',
+                                                            last_inventory_date TEXT,
+                                                            notes TEXT,
+                                                            FOREIGN KEY (room_id) REFERENCES room(room_id) ON DELETE SET NULL
+                       )
+                   ''')
+
+    # Таблица отчетов
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS reports (
+                                                          report_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                          report_name TEXT NOT NULL,
+                                                          report_date TIMESTAMP NOT NULL,
+                                                          description TEXT NOT NULL,
+                                                          order_number INTEGER NOT NULL,
+                                                          worker_id INTEGER,
+                                                          environment_id INTEGER,
+                                                          equipment_id INTEGER,
+                                                          FOREIGN KEY (worker_id) REFERENCES employees(worker_id) ON DELETE SET NULL,
+                       FOREIGN KEY (environment_id) REFERENCES environment(environment_id) ON DELETE SET NULL,
+                       FOREIGN KEY (equipment_id) REFERENCES equipment(equipment_id) ON DELETE SET NULL
+                       )
+                   ''')
+
+    # Таблица лога инвентаризации
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS inventory_log (
+                                                                log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                                report_id INTEGER NOT NULL,
+                                                                equipment_id INTEGER NOT NULL,
+                                                                old_status TEXT,
+                                                                new_status TEXT,
+                                                                comment TEXT,
+                                                                inventory_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                                                                worker_id INTEGER,
+                                                                FOREIGN KEY (report_id) REFERENCES reports(report_id) ON DELETE CASCADE,
+                       FOREIGN KEY (equipment_id) REFERENCES equipment(equipment_id) ON DELETE CASCADE,
+                       FOREIGN KEY (worker_id) REFERENCES employees(worker_id) ON DELETE SET NULL
+                       )
+                   ''')
+
+    # Таблица пользователей
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS users (
+                                                        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                        username TEXT UNIQUE NOT NULL,
+                                                        password TEXT NOT NULL,
+                                                        role TEXT DEFAULT 'user'
+                   )
+                   ''')
+
+    # Таблица компании
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS company (
+                                                          id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                          name TEXT NOT NULL
+                   )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS floor_maps (
+                                                             map_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                             branch_id INTEGER NOT NULL,
+                                                             floor_number INTEGER NOT NULL,
+                                                             image_path TEXT NOT NULL,
+                                                             UNIQUE(branch_id, floor_number),
+                       FOREIGN KEY (branch_id) REFERENCES branches(branch_id) ON DELETE CASCADE
+                       )
+                   ''')
+
+    # Таблица для координат точек (маркеров) кабинетов на плане
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS room_markers (
+                                                               marker_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                               map_id INTEGER NOT NULL,
+                                                               room_id INTEGER NOT NULL,
+                                                               x REAL NOT NULL,
+                                                               y REAL NOT NULL,
+                                                               UNIQUE(map_id, room_id),
+                       FOREIGN KEY (map_id) REFERENCES floor_maps(map_id) ON DELETE CASCADE,
+                       FOREIGN KEY (room_id) REFERENCES room(room_id) ON DELETE CASCADE
+                       )
+                   ''')
+
+
+def _migration_2_lookup_indexes(cursor):
+    """Индексы для внешних ключей и частых выборок.
+
+    room_markers(map_id) отдельно не нужен - его покрывает UNIQUE(map_id, room_id),
+    floor_maps(branch_id, floor_number) - аналогично.
+    """
+    # get_equipment_by_room: WHERE room_id = ? ORDER BY name
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_equipment_room ON equipment(room_id, name)")
+    # get_rooms / get_rooms_by_branch_and_floor: WHERE branch_id = ? [AND floor = ?] ORDER BY ...
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_room_branch_floor ON room(branch_id, floor, room_number)")
+    # get_employees: WHERE branch_id = ? ORDER BY name_id
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_employees_branch ON employees(branch_id, name_id)")
+    # get_all_reports: ORDER BY report_date DESC
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_date ON reports(report_date)")
+    # История по оборудованию и каскадное удаление отчетов
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_inventory_log_equipment ON inventory_log(equipment_id, report_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_inventory_log_report ON inventory_log(report_id)")
+
+
+def _migration_3_pagination_indexes(cursor):
+    """Индекс для постраничной выборки оборудования по (name, equipment_id).
+
+    equipment_id - это rowid, он уже хранится в каждой записи индекса,
+    поэтому индекс по name упорядочивает именно по (name, equipment_id).
+    Для отчетов аналогично подходит idx_reports_date.
+    """
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_equipment_name ON equipment(name)")
+
+
+def fts5_available(cursor):
+    """Собран ли SQLite с модулем полнотекстового поиска FTS5"""
+    cursor.execute("PRAGMA compile_options")
+    return any(row[0] == "ENABLE_FTS5" for row in cursor.fetchall())
+
+
+def _migration_4_equipment_fts(cursor):
+    """Полнотекстовый индекс equipment_fts по name, serial_number, supplier, notes.
+
+    Таблица external content: текст хранится только в equipment, индекс
+    поддерживается триггерами. Если SQLite собран без FTS5, миграция ничего
+    не создает, а search_equipment работает через LIKE.
+    """
+    if not fts5_available(cursor):
+        print("⚠️ SQLite без FTS5 - поиск оборудования будет работать через LIKE")
+        return
+
+    cursor.execute("""
+                   CREATE VIRTUAL TABLE IF NOT EXISTS equipment_fts USING fts5(
+                       name, serial_number, supplier, notes,
+                       content='equipment', content_rowid='equipment_id',
+                       tokenize='unicode61 remove_diacritics 2'
+                   )
+                   """)
+    cursor.execute("""
+                   CREATE TRIGGER IF NOT EXISTS equipment_fts_insert AFTER INSERT ON equipment BEGIN
+                       INSERT INTO equipment_fts(rowid, name, serial_number, supplier, notes)
+                       VALUES (new.equipment_id, new.name, new.serial_number, new.supplier, new.notes);
+                   END
+                   """)
+    cursor.execute("""
+                   CREATE TRIGGER IF NOT EXISTS equipment_fts_delete AFTER DELETE ON equipment BEGIN
+                       INSERT INTO equipment_fts(equipment_fts, rowid, name, serial_number, supplier, notes)
+                       VALUES ('delete', old.equipment_id, old.name, old.serial_number, old.supplier, old.notes);
+                   END
+                   """)
+    cursor.execute("""
+                   CREATE TRIGGER IF NOT EXISTS equipment_fts_update
+                   AFTER UPDATE OF name, serial_number, supplier, notes ON equipment BEGIN
+                       INSERT INTO equipment_fts(equipment_fts, rowid, name, serial_number, supplier, notes)
+                       VALUES ('delete', old.equipment_id, old.name, old.serial_number, old.supplier, old.notes);
+                       INSERT INTO equipment_fts(rowid, name, serial_number, supplier, notes)
+                       VALUES (new.equipment_id, new.name, new.serial_number, new.supplier, new.notes);
+                   END
+                   """)
+    # Индексируем уже существующее оборудование
+    cursor.execute("INSERT INTO equipment_fts(equipment_fts) VALUES ('rebuild')")
+
+
+def _migration_5_change_counters(cursor):
+    """Счетчики изменений по таблицам для DataVersionWatcher.
+
+    PRAGMA data_version говорит только, что БД изменил кто-то другой,
+    а table_changes - какие именно таблицы. Счетчик увеличивается
+    триггером на каждую вставленную, измененную или удаленную строку.
+    """
+    tables = ("branches", "employees", "room", "floor_maps", "room_markers",
+              "equipment", "reports", "inventory_log")
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS table_changes (
+                                                                table_name TEXT PRIMARY KEY,
+                                                                change_count INTEGER NOT NULL DEFAULT 0
+                   )
+                   """)
+    for table in tables:
+        cursor.execute("INSERT OR IGNORE INTO table_changes (table_name) VALUES (?)", (table,))
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f"""
+                           CREATE TRIGGER IF NOT EXISTS track_{table}_{operation.lower()}
+                           AFTER {operation} ON {table} BEGIN
+                               UPDATE table_changes SET change_count = change_count + 1
+                               WHERE table_name = '{table}';
+                           END
+                           """)
+
+
+def _migration_6_summary_index(cursor):
+    """Покрывающий индекс для сводки по оборудованию (get_equipment_summary).
+
+    Агрегату нужны только комната, категория, тип, статус, количество и цена:
+    проход по такому индексу в разы короче прохода по таблице с текстовыми
+    полями, а room_id в начале дает поиск по комнатам филиала или этажа.
+    """
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_equipment_summary
+        ON equipment(room_id, category, type, status, quantity, price)
+    """)
+
+
+# Строки equipment_summary, посчитанные по самой таблице equipment
+# (заполнение в миграции 7, пересчет и проверка в DatabaseHandler)
+EQUIPMENT_SUMMARY_SELECT = """
+    SELECT COALESCE(room_id, 0) AS room_id, COALESCE(status, '') AS status, COUNT(*) AS items,
+           COALESCE(SUM(quantity), 0) AS quantity, COALESCE(SUM(price * quantity), 0) AS total_value
+    FROM equipment
+    GROUP BY COALESCE(room_id, 0), COALESCE(status, '')
+"""
+FILL_EQUIPMENT_SUMMARY_SQL = f"""
+    INSERT INTO equipment_summary (room_id, status, items, quantity, total_value)
+    {EQUIPMENT_SUMMARY_SELECT}
+"""
+
+
+def _summary_delta_sql(row, sign):
+    """Прибавление (sign = '+') или вычитание (sign = '-') записи old/new к ее строке сводки"""
+    return f"""
+        INSERT INTO equipment_summary (room_id, status, items, quantity, total_value)
+        VALUES (COALESCE({row}.room_id, 0), COALESCE({row}.status, ''), {sign}1,
+                {sign}COALESCE({row}.quantity, 0), {sign}COALESCE({row}.price * {row}.quantity, 0))
+        ON CONFLICT (room_id, status) DO UPDATE SET
+            items = items + excluded.items,
+            quantity = quantity + excluded.quantity,
+            total_value = total_value + excluded.total_value;
+    """
+
+
+# Строки сводки без оборудования удаляются, чтобы таблица оставалась маленькой
+_DROP_EMPTY_SUMMARY_SQL = "DELETE FROM equipment_summary WHERE items = 0;"
+
+
+def _migration_7_equipment_summary(cursor):
+    """Сводка по оборудованию, которую поддерживают триггеры.
+
+    equipment_summary хранит по строке на (комнату, статус): число записей,
+    сумму количества и стоимость. Оборудование без комнаты учитывается
+    с room_id = 0. Итоги комнаты - несколько строк ее статусов, итоги
+    филиала - строки его комнат, так что панели не сканируют equipment.
+    При расхождении сводку пересчитывает rebuild_equipment_summary.
+    """
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS equipment_summary (
+                                                                    room_id INTEGER NOT NULL,
+                                                                    status TEXT NOT NULL,
+                                                                    items INTEGER NOT NULL DEFAULT 0,
+                                                                    quantity INTEGER NOT NULL DEFAULT 0,
+                                                                    total_value REAL NOT NULL DEFAULT 0,
+                                                                    PRIMARY KEY (room_id, status)
+                   ) WITHOUT ROWID
+                   """)
+    cursor.execute(f"""
+                   CREATE TRIGGER IF NOT EXISTS equipment_summary_insert
+                   AFTER INSERT ON equipment BEGIN
+                       {_summary_delta_sql("new", "+")}
+                   END
+                   """)
+    cursor.execute(f"""
+                   CREATE TRIGGER IF NOT EXISTS equipment_summary_delete
+                   AFTER DELETE ON equipment BEGIN
+                       {_summary_delta_sql("old", "-")}
+                       {_DROP_EMPTY_SUMMARY_SQL}
+                   END
+                   """)
+    cursor.execute(f"""
+                   CREATE TRIGGER IF NOT EXISTS equipment_summary_update
+                   AFTER UPDATE OF room_id, status, quantity, price ON equipment BEGIN
+                       {_summary_delta_sql("old", "-")}
+                       {_summary_delta_sql("new", "+")}
+                       {_DROP_EMPTY_SUMMARY_SQL}
+                   END
+                   """)
+    # Удаленная комната не должна оставлять строк в сводке (ее оборудование
+    # переносится в room_id = 0 триггером обновления equipment)
+    cursor.execute(f"""
+                   CREATE TRIGGER IF NOT EXISTS room_summary_delete
+                   AFTER DELETE ON room BEGIN
+                       DELETE FROM equipment_summary WHERE room_id = old.room_id;
+                   END
+                   """)
+    cursor.execute(FILL_EQUIPMENT_SUMMARY_SQL)
+
+
+def _migration_8_workplace_assignment(cursor):
+    """Распределение оборудования по рабочим местам комнат.
+
+    Раньше распределение жило только в памяти окна отчетности и терялось
+    при перезапуске. Строка - одно заполненное место комнаты; при удалении
+    комнаты ее места удаляются, при удалении оборудования ссылка обнуляется.
+    """
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS workplace_assignment (
+                                                                       room_id INTEGER NOT NULL,
+                                                                       workplace_number INTEGER NOT NULL,
+                                                                       equipment_id INTEGER,
+                                                                       type TEXT NOT NULL DEFAULT '',
+                                                                       name TEXT NOT NULL DEFAULT '',
+                                                                       serial TEXT NOT NULL DEFAULT '',
+                                                                       has_monitor INTEGER NOT NULL DEFAULT 0,
+                                                                       has_keyboard INTEGER NOT NULL DEFAULT 0,
+                                                                       has_mouse INTEGER NOT NULL DEFAULT 0,
+                                                                       has_power_cable INTEGER NOT NULL DEFAULT 0,
+                                                                       notes TEXT NOT NULL DEFAULT '',
+                                                                       PRIMARY KEY (room_id, workplace_number),
+                       FOREIGN KEY (room_id) REFERENCES room(room_id) ON DELETE CASCADE,
+                       FOREIGN KEY (equipment_id) REFERENCES equipment(equipment_id) ON DELETE SET NULL
+                       ) WITHOUT ROWID
+                   """)
+    # Для ON DELETE SET NULL при удалении оборудования
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_workplace_assignment_equipment
+        ON workplace_assignment(equipment_id)
+    """)
+
+    # Счетчик изменений для DataVersionWatcher, как у таблиц миграции 5
+    cursor.execute("INSERT OR IGNORE INTO table_changes (table_name) VALUES ('workplace_assignment')")
+    for operation in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f"""
+                       CREATE TRIGGER IF NOT EXISTS track_workplace_assignment_{operation.lower()}
+                       AFTER {operation} ON workplace_assignment BEGIN
+                           UPDATE table_changes SET change_count = change_count + 1
+                           WHERE table_name = 'workplace_assignment';
+                       END
+                       """)
+
+
+def _migration_9_inventory_log_ranges(cursor):
+    """Индексы журнала инвентаризации для выборок по времени.
+
+    room_id запоминает, где стояло оборудование в момент проверки: изменения
+    филиала за период ищутся по комнатам филиала и диапазону дат, даже если
+    оборудование потом переносили. История одной единицы - по
+    (equipment_id, inventory_date) без сортировки.
+    """
+    cursor.execute("ALTER TABLE inventory_log ADD COLUMN room_id INTEGER")
+    cursor.execute("""
+                   UPDATE inventory_log
+                   SET room_id = (SELECT eq.room_id FROM equipment eq
+                                  WHERE eq.equipment_id = inventory_log.equipment_id)
+                   """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_inventory_log_equipment_date
+        ON inventory_log(equipment_id, inventory_date)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_inventory_log_room_date
+        ON inventory_log(room_id, inventory_date)
+    """)
+
+
+def _migration_10_unplaced_equipment_index(cursor):
+    """Частичный покрывающий индекс оборудования филиала без комнаты.
+
+    Сводка по филиалу (get_branch_summary) берет размещенное оборудование
+    из equipment_summary, а еще не размещенное (room_id IS NULL) - по
+    branch_id из этого индекса, не читая таблицу.
+    """
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_equipment_unplaced
+        ON equipment(branch_id, quantity, price)
+        WHERE room_id IS NULL
+    """)
+
+
+MIGRATIONS = [
+    (1, "Базовая схема", _migration_1_base_schema),
+    (2, "Индексы для частых выборок", _migration_2_lookup_indexes),
+    (3, "Индекс для постраничной выборки оборудования", _migration_3_pagination_indexes),
+    (4, "Полнотекстовый поиск по оборудованию", _migration_4_equipment_fts),
+    (5, "Счетчики изменений таблиц", _migration_5_change_counters),
+    (6, "Индекс для сводки по оборудованию", _migration_6_summary_index),
+    (7, "Сводка по оборудованию на триггерах", _migration_7_equipment_summary),
+    (8, "Распределение по рабочим местам", _migration_8_workplace_assignment),
+    (9, "Журнал инвентаризации по комнатам и датам", _migration_9_inventory_log_ranges),
+    (10, "Индекс оборудования филиала без комнаты", _migration_10_unplaced_equipment_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Применяет недостающие миграции в одной транзакции.
+
+    Возвращает список применённых версий (пустой, если схема актуальна).
+    """
+    if get_schema_version(conn) >= LATEST_VERSION:
+        return []
+
+    # Блокируем запись сразу: другой процесс (plane.py) мог начать миграцию
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = get_schema_version(conn)
+        applied = []
+        cursor = conn.cursor()
+        for migration_version, description, apply in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            apply(cursor)
+            cursor.execute(f"PRAGMA user_version = {migration_version}")
+            applied.append(migration_version)
+            print(f"✅ Миграция {migration_version}: {description}")
+        conn.commit()
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# Схема архива (archive.db, подключается как ATTACH ... AS archive).
+# Архив ведется не миграциями: таблицы создаются заданием архивации,
+# колонки повторяют reports и inventory_log основной БД (ключи сохраняются,
+# внешних ключей между файлами нет). archive_meta.archived_before - граница:
+# все строки старше нее лежат в архиве.
+ARCHIVE_REPORT_COLUMNS = ("report_id, report_name, report_date, description, order_number, "
+                          "worker_id, environment_id, equipment_id")
+ARCHIVE_LOG_COLUMNS = ("log_id, report_id, equipment_id, old_status, new_status, comment, "
+                       "inventory_date, worker_id, room_id")
+
+
+def create_archive_schema(cursor, schema="archive"):
+    """Таблицы и индексы архива в подключенной БД schema"""
+    cursor.execute(f"""
+                   CREATE TABLE IF NOT EXISTS {schema}.reports (
+                                                                 report_id INTEGER PRIMARY KEY,
+                                                                 report_name TEXT NOT NULL,
+                                                                 report_date TIMESTAMP NOT NULL,
+                                                                 description TEXT NOT NULL,
+                                                                 order_number INTEGER NOT NULL,
+                                                                 worker_id INTEGER,
+                                                                 environment_id INTEGER,
+                                                                 equipment_id INTEGER
+                   )
+                   """)
+    cursor.execute(f"""
+                   CREATE TABLE IF NOT EXISTS {schema}.inventory_log (
+                                                                       log_id INTEGER PRIMARY KEY,
+                                                                       report_id INTEGER NOT NULL,
+                                                                       equipment_id INTEGER NOT NULL,
+                                                                       old_status TEXT,
+                                                                       new_status TEXT,
+                                                                       comment TEXT,
+                                                                       inventory_date TIMESTAMP,
+                                                                       worker_id INTEGER,
+                                                                       room_id INTEGER
+                   )
+                   """)
+    cursor.execute(f"""
+                   CREATE TABLE IF NOT EXISTS {schema}.archive_meta (
+                                                                      key TEXT PRIMARY KEY,
+                                                                      value TEXT
+                   )
+                   """)
+    # Те же индексы, что у основных таблиц: запросы к архиву и к рабочей
+    # БД объединяются UNION ALL и должны читаться одинаково
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_reports_date ON reports(report_date)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_inventory_log_report ON inventory_log(report_id)")
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS {schema}.idx_inventory_log_equipment_date
+        ON inventory_log(equipment_id, inventory_date)
+    """)
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS {schema}.idx_inventory_log_room_date
+        ON inventory_log(room_id, inventory_date)
+    """)
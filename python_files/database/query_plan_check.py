@@ -0,0 +1,152 @@
+"""Самопроверка планов запросов DatabaseHandler.
+
+Вызывает "горячие" методы обработчика на временной БД с актуальной схемой,
+перехватывает все выполненные SELECT-запросы и прогоняет их через
+EXPLAIN QUERY PLAN. Если какой-то запрос читает таблицу полным сканированием
+(SCAN) вместо поиска по индексу (SEARCH), проверка считается проваленной.
+
+Запуск из корня проекта:
+    python -m python_files.database.query_plan_check
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+from python_files.database.database_handler import DatabaseHandler
+
+# (метод, аргументы, разрешен ли полный проход по индексу)
+# Полный проход по индексу допустим только для выгрузки всего списка
+# в нужном порядке - так не требуется сортировка.
+HOT_CALLS = [
+    ("get_branch", (1,), False),
+    ("get_branch_summary", (1,), False),
+    ("get_room", (1,), False),
+    ("get_rooms", (1,), False),
+    ("get_rooms_by_branch_and_floor", (1, 1), False),
+    ("get_employees", (1,), False),
+    ("get_equipment_by_room", (1,), False),
+    ("get_room_dossier", (1,), False),
+    ("load_room_workplaces", (1,), False),
+    ("get_equipment_history", (1,), False),
+    ("get_branch_changes", (1, "2024-01-01", "2024-12-31"), False),
+    ("get_branch_changes", (1, "1999-01-01", "2024-12-31"), False),
+    ("get_map_data", (1, 1), False),
+    ("get_branch_map_bundle", (1,), False),
+    ("get_branch_map_bundle", (1, 1), False),
+    ("get_report", (1,), False),
+    ("get_all_reports", (), True),
+    ("get_equipment_page", (None, 100), True),
+    ("get_equipment_page", (("Монитор", 1), 100), False),
+    ("get_reports_page", (None, 100), True),
+    ("get_reports_page", (("2100-01-01 00:00:00", 1), 100), False),
+    ("get_reports_page", (None, 100, "1999-01-01"), False),
+    ("get_all_reports", ("1999-01-01",), False),
+    ("search_equipment", ("мон",), False),
+    ("search_equipment", ("мон", {'supplier': "dns", 'category': "Оргтехника"}, None), False),
+    ("search_equipment_ids", ("мон", {'supplier': "dns", 'category': "Оргтехника"}), False),
+    ("get_equipment_summary", (("branch", "floor", "category"),), True),
+    ("get_equipment_summary", (("room", "status"), {'branch_id': 1, 'floor': 1}), False),
+    ("get_equipment_summary", (("branch", "status"),), True),
+    ("get_equipment_summary", (("room",), {'branch_id': 1, 'floor': 1}), False),
+]
+
+# Таблицы-сводки, которые ведут триггеры: в них по несколько строк на
+# комнату, и прочитать такую таблицу целиком дешевле любого поиска
+SUMMARY_TABLES = ("equipment_summary",)
+
+
+def fill_sample_data(db):
+    """Минимальные данные, чтобы методы дошли до всех своих запросов"""
+    branch_id = db.add_branch("Филиал", 2, "ул. Тестовая, 1")
+    employee_id = db.add_employee("Сотрудник", "Медсестра", "2024-01-01", branch_id)
+    room_id = db.add_room("101", "Кабинет", branch_id, 1, capacity=2, responsible_id=employee_id)
+    equipment_id = db.add_equipment({'name': "Монитор", 'serial_number': "SN-1"})
+    db.update_equipment_room(equipment_id, room_id)
+    map_id = db.save_floor_map(branch_id, 1, "plan.png")
+    db.add_marker(map_id, room_id, 10, 20)
+    db.add_report({'name': "Отчет", 'worker_id': employee_id})
+    # Пустой архив с границей 2000 года: история и выборки с более ранней
+    # датой читают и его
+    db.archive_old_records("2000-01-01")
+
+
+def explain(conn, sql):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+
+
+def subquery_names(details):
+    """Имена подзапросов и CTE, результат которых SQLite строит сам
+    ("CO-ROUTINE g", "MATERIALIZE g") - их проход таблицу не читает"""
+    names = set()
+    for detail in details:
+        for prefix in ("CO-ROUTINE ", "MATERIALIZE "):
+            if detail.startswith(prefix):
+                names.add(detail[len(prefix):].split()[0])
+    return names
+
+
+def is_degraded(detail, allow_index_scan, subqueries=()):
+    if not detail.startswith("SCAN "):
+        return False
+    if detail.split()[1] in subqueries or detail.split()[1] in SUMMARY_TABLES:
+        return False
+    # Служебная таблица схемы и поиск по FTS5 (план вида
+    # "SCAN equipment_fts VIRTUAL TABLE INDEX 0:M...") полным проходом не являются
+    if detail.startswith("SCAN sqlite_master") or " VIRTUAL TABLE INDEX " in detail:
+        return False
+    return not (allow_index_scan and " INDEX " in detail)
+
+
+def check_query_plans(db, calls=HOT_CALLS):
+    """Возвращает список (метод, запрос, шаг плана) для запросов со SCAN"""
+    problems = []
+    conn = db.get_connection()
+    try:
+        for method_name, args, allow_index_scan in calls:
+            statements = []
+            if db.cache is not None:
+                db.cache.clear()  # иначе метод может вернуть результат без запроса
+            # Пул отдает текущему потоку то же соединение, поэтому
+            # трассировка видит все запросы вызываемого метода
+            conn.set_trace_callback(statements.append)
+            try:
+                getattr(db, method_name)(*args)
+            finally:
+                conn.set_trace_callback(None)
+
+            for sql in statements:
+                if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                    continue
+                details = explain(conn, sql)
+                subqueries = subquery_names(details)
+                for detail in details:
+                    if is_degraded(detail, allow_index_scan, subqueries):
+                        problems.append((method_name, " ".join(sql.split()), detail))
+    finally:
+        conn.close()
+    return problems
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseHandler(os.path.join(tmp_dir, "company.db"))
+            fill_sample_data(db)
+        problems = check_query_plans(db)
+        db.close()
+
+    if not problems:
+        print(f"✅ Все {len(HOT_CALLS)} горячих методов используют индексы")
+        return 0
+
+    print(f"❌ Найдено полных сканирований: {len(problems)}")
+    for method_name, sql, detail in problems:
+        print(f"  {method_name}: {detail}")
+        print(f"    {sql}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""Проверка и пересчет сводки по оборудованию (таблица equipment_summary).
+
+Сводку ведут триггеры на equipment и room. Если данные меняли в обход
+них, команда покажет расходящиеся строки и пересчитает сводку заново.
+
+Запуск из корня проекта:
+    python -m python_files.database.rebuild_summary          # проверка и пересчет
+    python -m python_files.database.rebuild_summary --check  # только проверка
+"""
+import sys
+
+from python_files.database.database_handler import DatabaseHandler
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    db = DatabaseHandler()
+    try:
+        mismatched = db.check_equipment_summary()
+        if not mismatched:
+            print("✅ Сводка по оборудованию совпадает с таблицей equipment")
+        else:
+            print(f"⚠️ Расходящихся строк сводки: {len(mismatched)}")
+            for room_id, status in mismatched:
+                print(f"  комната {room_id or 'не назначена'}, статус '{status}'")
+
+        if "--check" in argv:
+            return 1 if mismatched else 0
+
+        print("🔄 Пересчет сводки...")
+        rows = db.rebuild_equipment_summary()
+        print(f"✅ Сводка пересчитана: {rows} строк")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,7 +13,9 @@ from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib.utils import ImageReader
 
 from ui_plane import Ui_MainWindow
+from python_files.database.change_watcher import DataVersionWatcher
 from python_files.database.database_handler import DatabaseHandler
+from python_files.database.db_executor import DbExecutor
 
 
 class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
@@ -22,10 +24,12 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.setupUi(self)
 
         self.db = DatabaseHandler()
+        self.db_executor = DbExecutor(parent=self)  # фоновые запросы от действий пользователя
         self.current_map_id = None
         self.current_scene = None
         self.current_scene_display = None
         self.marker_items = []  # Точки на сцене настроек
+        self.loaded_marker_rooms = set()  # комнаты, чьи точки были в БД при открытии плана
         self.marker_items_display = []  # Точки на сцене показа
 
         # Режимы работы
@@ -47,6 +51,48 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         # Подключаем двойной клик по таблице для выбора комнаты
         self.tableView.doubleClicked.connect(self.on_table_double_click)
 
+        # Изменения комнат и филиалов из окна отчетности и настроек
+        self.watcher = DataVersionWatcher(self.db, parent=self)
+        self.watcher.tables_changed.connect(self.on_tables_changed)
+        self.watcher.start()
+
+    def closeEvent(self, event):
+        """Закрытие окна - освобождаем соединения с БД"""
+        self.watcher.stop()
+        self.db_executor.shutdown()
+        self.db.close()
+        super(MainWindow, self).closeEvent(event)
+
+    def on_tables_changed(self, tables):
+        """БД изменил другой процесс: обновляем списки и вкладку Показ.
+
+        Схему на вкладке Настройки не перерисовываем - на ней могут быть
+        несохраненные точки.
+        """
+        if "branches" in tables:
+            for combo in [self.comboBox, self.comboBox_2]:
+                current = combo.currentData()
+                combo.blockSignals(True)
+                combo.clear()
+                combo.addItem("Выберите филиал", None)
+                for branch in self.db.get_all_branches():
+                    combo.addItem(branch['name'], branch['branch_id'])
+                index = combo.findData(current)
+                combo.setCurrentIndex(max(index, 0))
+                combo.blockSignals(False)
+                if current is not None and index < 0:
+                    combo.currentIndexChanged.emit(0)
+
+        if "room" in tables:
+            self.load_rooms_to_table()
+
+        if {"room", "floor_maps", "room_markers"} & set(tables):
+            branch_id = self.comboBox_2.currentData()
+            if branch_id:
+                self.display_map_display(branch_id, self.spinBox_2.value())
+            if self.current_map_id:
+                self.show_status("Схема изменена в другом окне - откройте этаж заново, чтобы обновить")
+
     def show_status(self, message, is_error=False):
         """Показывает сообщение в статусбаре"""
         self.status_label.setText(f"  {message}  ")
@@ -102,6 +148,7 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.clear_graphics_view(self.graphicsView)
         self.current_scene = None
         self.marker_items = []
+        self.loaded_marker_rooms = set()
         self.current_map_id = None
         self.spinBox.setValue(1)
         self.load_rooms_to_table()
@@ -119,10 +166,14 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         floor = self.spinBox.value()
 
         if not branch_id:
+            self.db_executor.cancel('rooms_table')
             return
 
-        rooms = self.db.get_rooms_by_branch_and_floor(branch_id, floor)
+        self.db_executor.submit('rooms_table', self.db.get_rooms_by_branch_and_floor, branch_id, floor,
+                                on_result=self.show_rooms_table)
 
+    def show_rooms_table(self, rooms):
+        """Вывод комнат этажа в таблицу"""
         model = QStandardItemModel()
         model.setHorizontalHeaderLabels(['ID', 'Номер', 'Название', 'Вместимость'])
 
@@ -236,6 +287,7 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             self.current_map_id = None
             self.current_scene = None
             self.marker_items = []
+            self.loaded_marker_rooms = set()
             self.show_status("Схема и точки удалены")
         elif dialog.clickedButton() == delete_markers_btn:
             self.db.delete_markers_by_map(self.current_map_id)
@@ -249,20 +301,27 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         if not self.current_map_id or not self.current_scene:
             return
 
-        saved_count = 0
+        markers = []
         for item in self.marker_items:
             if isinstance(item, QGraphicsEllipseItem):
                 room_id = item.data(0)
                 if room_id:  # Сохраняем только привязанные точки
                     rect = item.rect()
                     center = item.mapToScene(rect.center())
-                    x, y = center.x(), center.y()
+                    markers.append((room_id, center.x(), center.y()))
 
-                    self.db.add_marker(self.current_map_id, room_id, x, y)
-                    saved_count += 1
+        # Удаляются только точки, открытые в этом окне: точки, которые другое
+        # окно добавило после открытия плана, остаются в БД
+        try:
+            counts = self.db.replace_markers(self.current_map_id, markers, self.loaded_marker_rooms)
+        except Exception as e:
+            self.show_status(f"Ошибка сохранения точек: {e}", True)
+            return
+        self.loaded_marker_rooms = {room_id for room_id, _, _ in markers}
 
-        if saved_count > 0:
-            self.show_status(f"Сохранено {saved_count} точек")
+        if markers or counts['deleted']:
+            self.show_status(f"Сохранено {len(markers)} точек (новых: {counts['added']}, "
+                             f"изменено: {counts['updated']}, удалено: {counts['deleted']})")
         else:
             self.show_status("Нет точек для сохранения", True)
 
@@ -317,14 +376,18 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.show_status("Точка поставлена, выберите комнату в таблице двойным кликом")
 
     def display_map_settings(self, branch_id, floor):
-        """Отображение карты в настройках"""
+        """Отображение карты в настройках (схема читается из БД в фоне)"""
         self.clear_graphics_view(self.graphicsView)
+        self.db_executor.submit('map_settings', self.db.get_map_data, branch_id, floor,
+                                on_result=self.show_map_settings)
 
-        map_info, markers = self.db.get_map_data(branch_id, floor)
+    def show_map_settings(self, map_data):
+        map_info, markers = map_data
         if not map_info:
             return
 
         self.current_map_id = map_info['map_id']
+        self.loaded_marker_rooms = {marker[2] for marker in markers}
         scene = QGraphicsScene()
         self.current_scene = scene
 
@@ -383,10 +446,13 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             self.display_map_display(branch_id, floor)
 
     def display_map_display(self, branch_id, floor):
-        """Отображение карты в показе (только для просмотра)"""
+        """Отображение карты в показе (только для просмотра, схема читается в фоне)"""
         self.clear_graphics_view(self.graphicsView_2)
+        self.db_executor.submit('map_display', self.db.get_map_data, branch_id, floor,
+                                on_result=lambda map_data: self.show_map_display(floor, map_data))
 
-        map_info, markers = self.db.get_map_data(branch_id, floor)
+    def show_map_display(self, floor, map_data):
+        map_info, markers = map_data
         if not map_info:
             self.show_status(f"Нет схемы для этажа {floor}", True)
             return
@@ -458,6 +524,13 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             from reportlab.lib import colors
             from reportlab.lib.units import mm
 
+            # Все данные отчета - филиал, планы и маркеры всех этажей - читаются
+            # из одного снимка БД до построения PDF: правки из других окон не
+            # попадут в отчет наполовину
+            with self.db.read_snapshot():
+                branch = self.db.get_branch(branch_id) or branch
+                bundle = self.db.get_branch_map_bundle(branch_id)
+
             doc = SimpleDocTemplate(file_path, pagesize=landscape(A4))
             story = []
             styles = getSampleStyleSheet()
@@ -473,7 +546,7 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
                 story.append(Paragraph(f"Этаж {floor}", styles['Heading2']))
                 story.append(Spacer(1, 5*mm))
 
-                map_info, markers = self.db.get_map_data(branch_id, floor)
+                map_info, markers = bundle.get(floor, (None, []))
 
                 # Схема
                 if map_info and os.path.exists(map_info['image_path']):
@@ -487,12 +560,11 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
                 if markers:
                     data = [['№', 'Кабинет', 'Название', 'Вместимость']]
                     for i, marker in enumerate(markers, 1):
-                        room = self.db.get_room(marker['room_id'])
                         data.append([
                             str(i),
                             marker['room_number'],
                             marker['room_name'],
-                            str(room['capacity'] if room else '')
+                            str(marker['capacity'])
                         ])
 
                     table = Table(data, colWidths=[20*mm, 30*mm, 70*mm, 30*mm])
@@ -539,6 +611,11 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             from reportlab.lib import colors
             from reportlab.lib.units import mm
 
+            # Филиал, план и маркеры этажа - из одного снимка БД
+            with self.db.read_snapshot():
+                branch = self.db.get_branch(branch_id) or branch
+                map_info, markers = self.db.get_branch_map_bundle(branch_id, floor).get(floor, (None, []))
+
             doc = SimpleDocTemplate(file_path, pagesize=landscape(A4))
             story = []
             styles = getSampleStyleSheet()
@@ -553,8 +630,6 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             story.append(Paragraph(f"Этаж {floor}", styles['Heading2']))
             story.append(Spacer(1, 5*mm))
 
-            map_info, markers = self.db.get_map_data(branch_id, floor)
-
             # Схема
             if map_info and os.path.exists(map_info['image_path']):
                 img = Image(map_info['image_path'])
@@ -567,12 +642,11 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             if markers:
                 data = [['№', 'Кабинет', 'Название', 'Вместимость']]
                 for i, marker in enumerate(markers, 1):
-                    room = self.db.get_room(marker['room_id'])
                     data.append([
                         str(i),
                         marker['room_number'],
                         marker['room_name'],
-                        str(room['capacity'] if room else '')
+                        str(marker['capacity'])
                     ])
 
                 table = Table(data, colWidths=[20*mm, 30*mm, 70*mm, 30*mm])
@@ -0,0 +1,181 @@
+"""Потоковый импорт накладных поставщиков (CSV / XLSX) во вкладку Поступление.
+
+Файл читается построчно и отправляется в БД пачками через
+DatabaseHandler.add_equipment_many, поэтому потребление памяти не зависит
+от размера файла. Весь импорт идет в DatabaseHandler.bulk_import(): профиль
+bulk-import и одно событие об изменении оборудования в конце.
+XLSX поддерживается, если установлен openpyxl.
+"""
+import csv
+import io
+import os
+from datetime import datetime
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# Допустимые заголовки колонок для каждого поля таблицы equipment
+COLUMN_ALIASES = {
+    'name': ("name", "название", "наименование"),
+    'category': ("category", "категория"),
+    'type': ("type", "тип"),
+    'quantity': ("quantity", "количество", "кол-во"),
+    'serial_number': ("serial_number", "серийный номер", "серийный №", "серийный"),
+    'supplier': ("supplier", "поставщик", "название поставщика"),
+    'price': ("price", "цена", "цена за единицу"),
+    'date_incoming': ("date_incoming", "дата поступления", "дата"),
+    'phone_supplier': ("phone_supplier", "телефон поставщика", "телефон"),
+    'email_supplier': ("email_supplier", "email поставщика", "email"),
+    'status': ("status", "статус"),
+    'notes': ("notes", "примечание", "примечания"),
+}
+
+REQUIRED_FIELDS = ('name', 'serial_number')
+
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y")
+
+# Сколько ошибок хранить для показа пользователю (остальные только считаем)
+MAX_STORED_ERRORS = 1000
+
+
+class ArrivalImportError(Exception):
+    """Файл нельзя импортировать целиком (формат, заголовки)"""
+
+
+def map_columns(header):
+    """Сопоставление колонок файла полям equipment: {поле: индекс колонки}"""
+    normalized = [str(cell or "").strip().lower() for cell in header]
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for index, title in enumerate(normalized):
+            if title in aliases:
+                mapping[field] = index
+                break
+
+    missing = [field for field in REQUIRED_FIELDS if field not in mapping]
+    if missing:
+        names = ", ".join(COLUMN_ALIASES[field][1] for field in missing)
+        raise ArrivalImportError(f"В файле нет обязательных колонок: {names}")
+    return mapping
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    raise ValueError(f"неверная дата '{value}'")
+
+
+def convert_row(mapping, values):
+    """Строка файла -> словарь для add_equipment_many (ValueError при ошибке)"""
+    data = {}
+    for field, index in mapping.items():
+        value = values[index] if index < len(values) else None
+        if value is None or str(value).strip() == "":
+            continue
+        if field == 'quantity':
+            quantity = int(float(str(value).replace(",", ".")))
+            if quantity <= 0:
+                raise ValueError(f"количество должно быть больше нуля: {value}")
+            data[field] = quantity
+        elif field == 'price':
+            data[field] = float(str(value).replace(" ", "").replace(",", "."))
+        elif field == 'date_incoming':
+            data[field] = _parse_date(value if isinstance(value, datetime) else str(value).strip())
+        else:
+            data[field] = str(value).strip()
+    return data
+
+
+def iter_csv_rows(path):
+    """Строки CSV с долей прочитанного файла: (номер строки, значения, доля)"""
+    size = os.path.getsize(path) or 1
+    with open(path, "rb") as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        first_line = text.readline()
+        delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+        yield 1, next(csv.reader([first_line], delimiter=delimiter)), raw.tell() / size
+        for line_no, values in enumerate(csv.reader(text, delimiter=delimiter), 2):
+            yield line_no, values, raw.tell() / size
+
+
+def iter_xlsx_rows(path):
+    """Строки первого листа XLSX в режиме read_only (без загрузки в память)"""
+    if openpyxl is None:
+        raise ArrivalImportError("Для импорта XLSX установите пакет openpyxl")
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        total = sheet.max_row or 0
+        for line_no, values in enumerate(sheet.iter_rows(values_only=True), 1):
+            yield line_no, list(values), (line_no / total if total else 0)
+    finally:
+        workbook.close()
+
+
+def iter_file_rows(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return iter_csv_rows(path)
+    if extension in (".xlsx", ".xlsm"):
+        return iter_xlsx_rows(path)
+    raise ArrivalImportError(f"Неподдерживаемый формат файла: {extension}")
+
+
+def import_arrival_file(db, path, batch_size=1000, progress_callback=None):
+    """Импорт файла поступления в таблицу equipment.
+
+    progress_callback(процент) вызывается после каждой пачки.
+    Возвращает словарь: added - добавлено строк, failed - строк с ошибками,
+    errors - первые MAX_STORED_ERRORS ошибок (номер строки, текст).
+    """
+    result = {'added': 0, 'failed': 0, 'errors': []}
+
+    def add_error(line_no, message):
+        result['failed'] += 1
+        if len(result['errors']) < MAX_STORED_ERRORS:
+            result['errors'].append((line_no, message))
+
+    def flush(batch, batch_lines):
+        new_ids, errors = db.add_equipment_many(batch, chunk_size=batch_size)
+        result['added'] += len(new_ids)
+        for index, serial_number, message in errors:
+            add_error(batch_lines[index], f"{serial_number}: {message}")
+
+    rows = iter_file_rows(path)
+    header = next(rows, None)
+    if header is None:
+        raise ArrivalImportError("Файл пустой")
+    mapping = map_columns(header[1])
+
+    with db.bulk_import():
+        batch = []
+        batch_lines = []
+        for line_no, values, progress in rows:
+            if not any(str(value or "").strip() for value in values):
+                continue
+            try:
+                batch.append(convert_row(mapping, values))
+                batch_lines.append(line_no)
+            except (ValueError, TypeError) as e:
+                add_error(line_no, str(e))
+                continue
+
+            if len(batch) >= batch_size:
+                flush(batch, batch_lines)
+                batch = []
+                batch_lines = []
+                if progress_callback:
+                    progress_callback(int(progress * 100))
+
+        if batch:
+            flush(batch, batch_lines)
+    if progress_callback:
+        progress_callback(100)
+    return result
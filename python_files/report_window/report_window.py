@@ -1,5 +1,6 @@
 import sys
 import os
+import itertools
 from datetime import datetime
 from PySide6.QtWidgets import (QApplication, QMainWindow, QMessageBox,
                                QTableWidget, QTableWidgetItem, QHeaderView,
@@ -10,7 +11,7 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QMessageBox,
                                QDialogButtonBox, QFileDialog, QScrollArea, QGridLayout,
                                QDoubleSpinBox, QDateEdit, QDateTimeEdit, QPlainTextEdit,
                                QListView, QMenuBar, QMenu, QSplitter, QFrame)
-from PySide6.QtCore import Qt, QDate, QDateTime, Signal, QFile, QIODevice
+from PySide6.QtCore import Qt, QDate, QDateTime, Signal, QFile, QIODevice, QTimer
 from PySide6.QtGui import QAction, QStandardItemModel, QStandardItem
 from PySide6.QtUiTools import QUiLoader
 
@@ -31,11 +32,22 @@ except ImportError as e:
     SETTINGS_AVAILABLE = False
     SettingsWindow = None
 
+from python_files.database.backup_service import BackupService
+from python_files.database.change_watcher import DataVersionWatcher
+from python_files.database.database_handler import EQUIPMENT_STATUSES
+from python_files.database.db_executor import DbExecutor
+from python_files.database.event_bus import DataEventBus
+from python_files.database.events import DELETE
+from python_files.report_window.arrival_import import import_arrival_file
+
 # Путь к БД (ОДИН ПУТЬ!)
 python_files_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 db_path = os.path.join(python_files_dir, "database", "company.db")
 ui_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ReportWindow.ui")
 
+# Больше точечных изменений оборудования за раз - таблицы перечитываются целиком
+EQUIPMENT_PATCH_LIMIT = 200
+
 print(f"Путь к БД: {db_path}")
 print(f"Файл БД существует: {os.path.exists(db_path)}")
 print(f"Путь к UI: {ui_path}")
@@ -79,10 +91,9 @@ class ReportsListDialog(QDialog):
         self.load_reports()
 
     def load_reports(self):
-        reports = self.db.get_all_reports()
-        self.table.setRowCount(len(reports))
-
-        for i, report in enumerate(reports):
+        self.table.setRowCount(0)
+        for i, report in enumerate(self.db.iter_all_reports()):
+            self.table.insertRow(i)
             self.table.setItem(i, 0, QTableWidgetItem(str(report[0])))
             self.table.setItem(i, 1, QTableWidgetItem(report[1]))
             self.table.setItem(i, 2, QTableWidgetItem(report[2]))
@@ -96,6 +107,206 @@ class ReportsListDialog(QDialog):
             self.accept()
 
 
+# ========== ДИАЛОГ СВОДКИ ПО ОБОРУДОВАНИЮ ==========
+class EquipmentSummaryDialog(QDialog):
+    """Сводка: количество и стоимость оборудования по филиалам, этажам,
+    комнатам, категориям, типам и статусам (считается в БД одним запросом)"""
+
+    DIMENSIONS = [
+        ("branch", "Филиал"),
+        ("floor", "Этаж"),
+        ("room", "Комната"),
+        ("category", "Категория"),
+        ("type", "Тип"),
+        ("status", "Статус"),
+    ]
+
+    def __init__(self, db, executor, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.executor = executor
+        self.setWindowTitle("Сводка по оборудованию")
+        self.setMinimumSize(900, 600)
+
+        layout = QVBoxLayout(self)
+
+        # Группировка
+        group_box = QGroupBox("Группировать по")
+        group_layout = QHBoxLayout(group_box)
+        self.dimension_checks = {}
+        for name, title in self.DIMENSIONS:
+            check = QCheckBox(title)
+            check.setChecked(name in ("branch", "floor", "category"))
+            check.toggled.connect(self.load_summary)
+            group_layout.addWidget(check)
+            self.dimension_checks[name] = check
+        layout.addWidget(group_box)
+
+        # Фильтры
+        filter_layout = QHBoxLayout()
+        self.branch_combo = QComboBox()
+        self.branch_combo.addItem("Все филиалы", None)
+        for branch in self.db.get_all_branches():
+            self.branch_combo.addItem(branch['name'], branch['branch_id'])
+        self.floor_spin = QSpinBox()
+        self.floor_spin.setRange(0, 50)
+        self.floor_spin.setSpecialValueText("Все этажи")
+        self.category_edit = QLineEdit()
+        self.category_edit.setPlaceholderText("Категория (точно)")
+        self.branch_combo.currentIndexChanged.connect(self.load_summary)
+        self.floor_spin.valueChanged.connect(self.load_summary)
+        self.category_edit.editingFinished.connect(self.load_summary)
+        filter_layout.addWidget(QLabel("Филиал:"))
+        filter_layout.addWidget(self.branch_combo)
+        filter_layout.addWidget(QLabel("Этаж:"))
+        filter_layout.addWidget(self.floor_spin)
+        filter_layout.addWidget(self.category_edit)
+        layout.addLayout(filter_layout)
+
+        self.table = QTableWidget()
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+        self.total_label = QLabel()
+        layout.addWidget(self.total_label)
+
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(self.accept)
+        layout.addWidget(close_btn)
+
+        self.finished.connect(lambda: self.executor.cancel('equipment_summary'))
+        self.load_summary()
+
+    def load_summary(self):
+        group_by = [name for name, _ in self.DIMENSIONS if self.dimension_checks[name].isChecked()]
+        filters = {}
+        if self.branch_combo.currentData():
+            filters['branch_id'] = self.branch_combo.currentData()
+        if self.floor_spin.value():
+            filters['floor'] = self.floor_spin.value()
+        if self.category_edit.text().strip():
+            filters['category'] = self.category_edit.text().strip()
+
+        self.total_label.setText("Расчет...")
+        self.executor.submit('equipment_summary', self.db.get_equipment_summary, group_by, filters,
+                             on_result=lambda rows: self.show_summary(group_by, rows),
+                             on_error=lambda e: self.total_label.setText(f"Ошибка расчета сводки: {e}"))
+
+    def dimension_text(self, name, row):
+        if name == "branch":
+            return row['branch_name'] or "Без филиала"
+        if name == "room":
+            return f"{row['room_number']} - {row['room_name']}" if row['room_id'] else "Не распределено"
+        value = row[name]
+        return "—" if value is None else str(value)
+
+    def show_summary(self, group_by, rows):
+        titles = dict(self.DIMENSIONS)
+        headers = [titles[name] for name in group_by] + ["Позиций", "Количество", "Стоимость, руб."]
+        self.table.setColumnCount(len(headers))
+        self.table.setHorizontalHeaderLabels(headers)
+        self.table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            values = [self.dimension_text(name, row) for name in group_by]
+            values += [row['positions'], row['quantity'], row['total_value']]
+            for j, value in enumerate(values):
+                self.table.setItem(i, j, QTableWidgetItem(str(value)))
+        self.table.resizeColumnsToContents()
+
+        positions = sum(row['positions'] for row in rows)
+        value = sum(row['total_value'] for row in rows)
+        self.total_label.setText(f"Итого: {positions} позиций на сумму {value} руб.")
+
+
+# ========== ДИАЛОГ ДИАГНОСТИКИ БД ==========
+class QueryStatsDialog(QDialog):
+    """Статистика запросов к БД: методы, SQL-операторы и медленные запросы"""
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.setWindowTitle("Диагностика БД")
+        self.setMinimumSize(900, 600)
+
+        layout = QVBoxLayout(self)
+        self.info_label = QLabel()
+        layout.addWidget(self.info_label)
+
+        tabs = QTabWidget()
+        self.methods_table = QTableWidget()
+        self.statements_table = QTableWidget()
+        self.slow_text = QPlainTextEdit()
+        self.slow_text.setReadOnly(True)
+        tabs.addTab(self.methods_table, "Методы")
+        tabs.addTab(self.statements_table, "SQL-операторы")
+        tabs.addTab(self.slow_text, "Медленные запросы")
+        layout.addWidget(tabs)
+
+        # Кнопки
+        btn_layout = QHBoxLayout()
+        refresh_btn = QPushButton("Обновить")
+        refresh_btn.clicked.connect(self.load_stats)
+        save_btn = QPushButton("Сохранить в JSON...")
+        save_btn.clicked.connect(self.save_stats)
+        reset_btn = QPushButton("Сбросить")
+        reset_btn.clicked.connect(self.reset_stats)
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(self.accept)
+
+        btn_layout.addWidget(refresh_btn)
+        btn_layout.addWidget(save_btn)
+        btn_layout.addWidget(reset_btn)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+
+        self.load_stats()
+
+    def fill_table(self, table, headers, rows):
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setRowCount(len(rows))
+        for i, values in enumerate(rows):
+            for j, value in enumerate(values):
+                table.setItem(i, j, QTableWidgetItem(str(value)))
+        table.resizeColumnsToContents()
+
+    def load_stats(self):
+        stats = self.db.get_query_stats()
+        self.info_label.setText(f"Замер с {stats['since']}, медленные запросы - от {stats['slow_query_ms']} мс")
+
+        self.fill_table(self.methods_table,
+                        ["Метод", "Вызовов", "Всего, мс", "Среднее, мс", "p95, мс"],
+                        [(m['method'], m['count'], m['total_ms'], m['mean_ms'], m['p95_ms'])
+                         for m in stats['methods']])
+        self.fill_table(self.statements_table,
+                        ["SQL", "Вызовов", "Всего, мс", "Среднее, мс", "p95, мс", "Строк"],
+                        [(st['sql'], st['count'], st['total_ms'], st['mean_ms'], st['p95_ms'], st['rows'])
+                         for st in stats['statements']])
+
+        lines = []
+        for entry in reversed(stats['slow_queries']):  # новые первыми
+            lines.append(f"[{entry['at']}] {entry['ms']} мс, строк: {entry['rows']}")
+            lines.append(entry['sql'])
+            lines.append(f"Параметры: {entry['params']}")
+            for detail in entry['plan'] or []:
+                lines.append(f"    {detail}")
+            lines.append("")
+        self.slow_text.setPlainText("\n".join(lines) or "Медленных запросов нет")
+
+    def save_stats(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Сохранить статистику", self.db.stats_path,
+                                                   "JSON (*.json)")
+        if not file_path:
+            return
+        try:
+            self.db.dump_query_stats(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить файл:\n{e}")
+
+    def reset_stats(self):
+        self.db.reset_query_stats()
+        self.load_stats()
+
+
 # ========== ДИАЛОГ ПОДТВЕРЖДЕНИЯ ==========
 class ConfirmationDialog(QDialog):
     """Диалог подтверждения действия"""
@@ -248,17 +459,44 @@ class WorkplaceWidget(QWidget):
 class ReportWindow(QMainWindow):
     """Главное окно отчетности"""
 
+    backup_progress = Signal(int, int)  # скопировано страниц, всего (из потока копирования)
+    arrival_import_progress = Signal(int)  # процент импорта накладной (из потока импорта)
+
     def __init__(self):
         super().__init__()
         self.db = DatabaseHandler(db_path)
+        self.db_executor = DbExecutor(parent=self)  # фоновые запросы от действий пользователя
         self.current_report_id = None
         self.current_room_id = None
-        self.workplaces_data = {}  # {номер_места: данные}
+        self.workplaces_data = {}  # {номер_места: данные} текущей комнаты
+        self.workplaces_by_room = {}  # {room_id: workplaces_data} открытых комнат, пока не сохранены
+        self.inventory_session = self.db.open_inventory_session()  # статусы, отмеченные на вкладке инвентаризации
+        self.backup_service = BackupService(self.db.db_path)
+        # Свой поток для копирования: долгий backup не занимает потоки db_executor
+        self.backup_executor = DbExecutor(max_workers=1, parent=self)
+        self.backup_running = False
+        self.backup_progress.connect(self.show_backup_progress)
         self.arrival_items = []  # Список позиций поступления для переноса
+        self.arrival_import_running = False
+        self.arrival_import_progress.connect(self.show_arrival_import_progress)
         self.distribution_model = None  # Модель для таблицы распределения
+        self.arrival_rows = {}  # {equipment_id: строка таблицы поступлений}
+        self.distribution_rows = {}  # {equipment_id: строка модели распределения}
         self.settings_window = None  # Для окна настроек
+        self.paged_loads = {}  # {ключ загрузки: номер текущей загрузки}
+        self.loading_keys = set()  # загрузки, которые еще не закончились
+        self.distribution_checked_ids = set()  # отмеченные позиции при перезагрузке
         self.setup_ui()
         self.load_initial_data()
+
+        # Изменения из окна настроек и plane.py
+        self.watcher = DataVersionWatcher(self.db, parent=self)
+        self.watcher.tables_changed.connect(self.on_tables_changed)
+        self.watcher.start()
+        # Изменения, сделанные этим окном
+        self.bus = DataEventBus(self.db, parent=self)
+        self.bus.changed.connect(self.on_data_changed)
+
         self.showMaximized()
 
     def setup_ui(self):
@@ -292,11 +530,15 @@ class ReportWindow(QMainWindow):
         file_menu = menubar.addMenu("Файл")
         file_menu.addAction("Новая отчетность", self.new_report)
         file_menu.addAction("Новое поступление", self.new_arrival)
+        self.import_arrival_action = file_menu.addAction("Импорт поступления из файла...",
+                                                         self.import_arrival_from_file)
         file_menu.addSeparator()
         file_menu.addAction("Сохранить отчет", self.save_report_txt)
         file_menu.addAction("Сохранить как...", self.save_report_as)
         file_menu.addSeparator()
         file_menu.addAction("Полный список отчетов", self.show_reports_list)
+        file_menu.addAction("Сводка по оборудованию", self.show_equipment_summary)
+        file_menu.addAction("Сохранить инвентаризацию", self.save_inventory)
         file_menu.addSeparator()
         file_menu.addAction("Выход", self.close)
 
@@ -317,6 +559,9 @@ class ReportWindow(QMainWindow):
         help_menu = menubar.addMenu("Справка")
         help_menu.addAction("Версия", self.show_version)
         help_menu.addAction("О программе", self.show_project_info)
+        help_menu.addSeparator()
+        help_menu.addAction("Диагностика БД", self.show_db_diagnostics)
+        help_menu.addAction("Резервная копия БД", self.start_backup)
 
         # Открыть схему
         schema_menu = menubar.addMenu("Открыть схему")
@@ -410,23 +655,55 @@ class ReportWindow(QMainWindow):
         self.load_arrival_data()
 
     def load_arrival_data(self):
-        """Загрузка данных из БД в таблицу поступлений"""
+        """Загрузка данных из БД в таблицу поступлений (порциями)"""
+        self.ui.tableWidget.setRowCount(0)
+        self.arrival_rows.clear()
+        self.start_paged_load(
+            'arrival', self.db.iter_all_equipment(), self.add_arrival_page,
+            on_done=lambda: print(f"Загружено позиций: {self.ui.tableWidget.rowCount()}"))
+
+    def add_arrival_page(self, equipment):
+        """Добавление страницы оборудования в таблицу поступлений"""
         try:
-            equipment = self.db.get_all_equipment()
-            self.ui.tableWidget.setRowCount(0)
-            for i, item in enumerate(equipment):
+            start = self.ui.tableWidget.rowCount()
+            for i, item in enumerate(equipment, start):
                 self.ui.tableWidget.insertRow(i)
-                self.ui.tableWidget.setItem(i, 0, QTableWidgetItem(str(i + 1)))
-                self.ui.tableWidget.setItem(i, 1, QTableWidgetItem(item[1]))  # name
-                self.ui.tableWidget.setItem(i, 2, QTableWidgetItem(item[2]))  # category
-                self.ui.tableWidget.setItem(i, 3, QTableWidgetItem(item[3]))  # type
-                self.ui.tableWidget.setItem(i, 4, QTableWidgetItem("1"))  # quantity
-                self.ui.tableWidget.setItem(i, 5, QTableWidgetItem("0"))  # price
-                self.ui.tableWidget.setItem(i, 6, QTableWidgetItem(item[4]))  # serial_number
-            print(f"Загружено позиций: {len(equipment)}")
+                self.set_arrival_row(i, item)
         except Exception as e:
             print(f"Ошибка загрузки поступлений: {e}")
 
+    def set_arrival_row(self, i, item):
+        """Заполнение строки поступлений (ID записи хранится в колонке номера)"""
+        number_item = QTableWidgetItem(str(i + 1))
+        number_item.setData(Qt.UserRole, item['equipment_id'])
+        self.ui.tableWidget.setItem(i, 0, number_item)
+        self.ui.tableWidget.setItem(i, 1, QTableWidgetItem(item['name']))
+        self.ui.tableWidget.setItem(i, 2, QTableWidgetItem(item['category']))
+        self.ui.tableWidget.setItem(i, 3, QTableWidgetItem(item['type']))
+        self.ui.tableWidget.setItem(i, 4, QTableWidgetItem(str(item['quantity'])))
+        self.ui.tableWidget.setItem(i, 5, QTableWidgetItem(str(item['price'])))
+        self.ui.tableWidget.setItem(i, 6, QTableWidgetItem(item['serial_number']))
+        self.arrival_rows[item['equipment_id']] = i
+
+    def find_arrival_row(self, equipment_id):
+        return self.arrival_rows.get(equipment_id, -1)
+
+    def renumber_arrival_rows(self, start):
+        """Номера в колонке "№" со строки start (после удаления строки выше)"""
+        for row in range(start, self.ui.tableWidget.rowCount()):
+            number_item = self.ui.tableWidget.item(row, 0)
+            if number_item:
+                number_item.setText(str(row + 1))
+
+    @staticmethod
+    def forget_row(rows, equipment_id):
+        """Удаление записи из индекса {equipment_id: строка}: строки ниже сдвигаются вверх"""
+        removed = rows.pop(equipment_id)
+        for key, row in rows.items():
+            if row > removed:
+                rows[key] = row - 1
+        return removed
+
     def add_arrival_position(self):
         """Добавление позиции в таблицу поступления и БД"""
         data = {
@@ -449,21 +726,54 @@ class ReportWindow(QMainWindow):
             return
 
         try:
+            # Строку в таблицу добавит on_data_changed
             equip_id = self.db.add_equipment(data)
-            row = self.ui.tableWidget.rowCount()
-            self.ui.tableWidget.insertRow(row)
-            self.ui.tableWidget.setItem(row, 0, QTableWidgetItem(str(row + 1)))
-            self.ui.tableWidget.setItem(row, 1, QTableWidgetItem(data['name']))
-            self.ui.tableWidget.setItem(row, 2, QTableWidgetItem(data['category']))
-            self.ui.tableWidget.setItem(row, 3, QTableWidgetItem(data['type']))
-            self.ui.tableWidget.setItem(row, 4, QTableWidgetItem(str(data['quantity'])))
-            self.ui.tableWidget.setItem(row, 5, QTableWidgetItem(str(data['price'])))
-            self.ui.tableWidget.setItem(row, 6, QTableWidgetItem(data['serial_number']))
             self.clear_arrival_form()
             QMessageBox.information(self, "Успех", f"Позиция добавлена (ID: {equip_id})")
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить: {e}")
 
+    def import_arrival_from_file(self):
+        """Импорт позиций поступления из накладной поставщика (CSV/XLSX).
+
+        Файл разбирается в фоне, прогресс приходит сигналом; пока импорт
+        идет, повторный импорт недоступен, а окно не закрывается.
+        """
+        if self.arrival_import_running:
+            return
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Импорт поступления", "",
+            "Накладные (*.csv *.xlsx);;CSV (*.csv);;Excel (*.xlsx)"
+        )
+        if not file_path:
+            return
+
+        self.arrival_import_running = True
+        self.import_arrival_action.setEnabled(False)
+        self.ui.progressBar.setValue(0)
+        self.db_executor.submit('arrival_import', import_arrival_file, self.db, file_path,
+                                progress_callback=self.arrival_import_progress.emit,
+                                on_result=self.on_arrival_import_done, on_error=self.on_arrival_import_failed)
+
+    def show_arrival_import_progress(self, percent):
+        self.ui.progressBar.setValue(percent)
+
+    def finish_arrival_import(self):
+        self.arrival_import_running = False
+        self.import_arrival_action.setEnabled(True)
+
+    def on_arrival_import_failed(self, error):
+        self.finish_arrival_import()
+        QMessageBox.critical(self, "Ошибка", f"Не удалось импортировать файл:\n{error}")
+
+    def on_arrival_import_done(self, result):
+        self.finish_arrival_import()
+        message = f"Добавлено позиций: {result['added']}\nСтрок с ошибками: {result['failed']}"
+        if result['errors']:
+            message += "\n\nПервые ошибки:\n" + "\n".join(
+                f"строка {line_no}: {text}" for line_no, text in result['errors'][:10])
+        QMessageBox.information(self, "Импорт поступления", message)
+
     def clear_arrival_form(self):
         """Очистка формы поступления"""
         if hasattr(self.ui, 'lineEdit_15'):
@@ -570,6 +880,8 @@ class ReportWindow(QMainWindow):
             model = self.ui.tableView.model()
             if model:
                 model.setHorizontalHeaderLabels(["ID", "Название", "Категория", "Серийный №", "Статус"])
+                # Правка статуса отмечается в сеансе инвентаризации
+                model.itemChanged.connect(self.on_inventory_item_changed)
 
         # Фильтры
         if hasattr(self.ui, 'comboBox_12'):
@@ -604,18 +916,22 @@ class ReportWindow(QMainWindow):
         branch_id = self.ui.comboBox_4.currentData()
         floor = self.ui.spinBox_3.value() if hasattr(self.ui, 'spinBox_3') else 1
         if branch_id and floor and hasattr(self.ui, 'comboBox_7'):
-            self.load_rooms_to_combo(self.ui.comboBox_7, branch_id, floor)
+            self.load_rooms_to_combo_async(self.ui.comboBox_7, branch_id, floor)
 
     def on_room_changed_inventory(self):
         """При изменении комнаты загружаем оборудование"""
         room_id = self.ui.comboBox_7.currentData() if hasattr(self.ui, 'comboBox_7') else None
 
         if not room_id:
+            self.db_executor.cancel('inventory_equipment')
             return
 
-        # Загружаем оборудование в tableView
-        equipment = self.db.get_equipment_by_room(room_id)
+        # Загружаем оборудование в tableView (запрос в фоне)
+        self.db_executor.submit('inventory_equipment', self.db.get_equipment_by_room, room_id,
+                                on_result=self.show_inventory_equipment)
 
+    def show_inventory_equipment(self, equipment):
+        """Вывод оборудования выбранной комнаты во вкладке инвентаризация"""
         model = self.ui.tableView.model()
         if model:
             model.removeRows(0, model.rowCount())
@@ -625,7 +941,10 @@ class ReportWindow(QMainWindow):
                 row.append(QStandardItem(item[1]))  # Название
                 row.append(QStandardItem(item[2]))  # Категория
                 row.append(QStandardItem(item[4]))  # Серийный номер
-                row.append(QStandardItem(item[5]))  # Статус
+                for cell in row:
+                    cell.setEditable(False)
+                # Статус (отмеченный, но еще не сохраненный - из сеанса)
+                row.append(QStandardItem(self.inventory_session.pending_status(item[0]) or item[5]))
                 model.appendRow(row)
 
             print(f"Загружено оборудование: {len(equipment)} шт.")
@@ -634,6 +953,40 @@ class ReportWindow(QMainWindow):
         """Применение фильтров инвентаризации"""
         pass
 
+    def on_inventory_item_changed(self, item):
+        """Новый статус в таблице инвентаризации - в буфер сеанса"""
+        if item.column() != 4:
+            return
+        id_item = item.model().item(item.row(), 0)
+        status = item.text().strip()
+        if id_item and status:
+            self.inventory_session.record(int(id_item.text()), status)
+
+    def save_inventory(self):
+        """Сохранение отмеченных статусов одной транзакцией"""
+        if not len(self.inventory_session):
+            QMessageBox.information(self, "Инвентаризация", "Нет измененных статусов")
+            return
+
+        self.inventory_session.worker_id = self.ui.comboBox.currentData()
+        room_text = self.ui.comboBox_7.currentText() if hasattr(self.ui, 'comboBox_7') else ""
+        count = len(self.inventory_session)
+        try:
+            report_id, rejected = self.inventory_session.commit({
+                'name': f"Инвентаризация {room_text}".strip(),
+                'description': f"Изменено статусов: {count}",
+            })
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить инвентаризацию:\n{e}")
+            return
+        if rejected:
+            lines = [f"ID {equipment_id}: '{status}' - {message}" for equipment_id, status, message in rejected[:20]]
+            QMessageBox.warning(self, "Инвентаризация",
+                                f"Сохранено изменений: {count - len(rejected)}, отклонено: {len(rejected)}\n"
+                                f"Допустимые статусы: {', '.join(EQUIPMENT_STATUSES)}\n\n" + "\n".join(lines))
+            return
+        QMessageBox.information(self, "Успех", f"Инвентаризация сохранена (отчет №{report_id}, изменений: {count})")
+
     def export_inventory_room_report(self):
         """Выгрузка отчета по инвентаризации комнаты в .txt"""
         # Получаем выбранную комнату
@@ -643,19 +996,18 @@ class ReportWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Выберите комнату")
             return
 
-        # Получаем данные о комнате
-        room = self.db.get_room(room_id)
-        if not room:
+        # Комната, ответственный и оборудование одним запросом
+        dossier = self.db.get_room_dossier(room_id)
+        if not dossier:
             QMessageBox.warning(self, "Ошибка", "Комната не найдена")
             return
-
-        # Получаем оборудование в комнате
-        equipment = self.db.get_equipment_by_room(room_id)
+        room = dossier['room']
+        equipment = dossier['equipment']
 
         # Диалог сохранения файла
         file_path, _ = QFileDialog.getSaveFileName(
             self, "Сохранить отчет по инвентаризации",
-            f"Инвентаризация_{room[1]}.txt",
+            f"Инвентаризация_{room['room_number']}.txt",
             "Текстовые файлы (*.txt)"
         )
 
@@ -669,11 +1021,17 @@ class ReportWindow(QMainWindow):
                 f.write("=" * 60 + "\n\n")
 
                 # Информация о комнате
-                f.write(f"Комната: {room[1]} - {room[2]}\n")
-                f.write(f"Этаж: {room[3]}\n")
-                f.write(f"Вместимость: {room[4]} чел.\n")
-                f.write(f"Площадь: {room[8]} м²\n")
-                f.write(f"Столов: {room[5]}, Стульев: {room[6]}, Розеток: {room[7]}\n")
+                f.write(f"Комната: {room['room_number']} - {room['room_name']}\n")
+                if room['branch_name']:
+                    f.write(f"Филиал: {room['branch_name']}\n")
+                f.write(f"Этаж: {room['floor']}\n")
+                f.write(f"Вместимость: {room['capacity']} чел.\n")
+                f.write(f"Площадь: {room['area']} м²\n")
+                f.write(f"Столов: {room['desks_count']}, Стульев: {room['chairs_count']}, "
+                        f"Розеток: {room['sockets_count']}\n")
+                if dossier['responsible']:
+                    f.write(f"Ответственный: {dossier['responsible']['name']} "
+                            f"({dossier['responsible']['job_title']})\n")
                 f.write(f"Дата инвентаризации: {QDateTime.currentDateTime().toString('dd.MM.yyyy hh:mm')}\n\n")
 
                 f.write("=" * 60 + "\n")
@@ -688,11 +1046,19 @@ class ReportWindow(QMainWindow):
                     f.write("-" * 90 + "\n")
 
                     for i, item in enumerate(equipment, 1):
-                        f.write(f"{i:<4} {item[1]:<30} {item[2]:<15} {item[3]:<15} {item[4]:<15} {item[5]:<10}\n")
+                        f.write(f"{i:<4} {item['name']:<30} {item['category']:<15} {item['type']:<15} "
+                                f"{item['serial_number']:<15} {item['status'] or '':<10}\n")
 
                     f.write("-" * 90 + "\n")
                     f.write(f"Всего единиц: {len(equipment)}\n\n")
 
+                    f.write("ИТОГИ ПО КАТЕГОРИЯМ\n")
+                    f.write("-" * 60 + "\n")
+                    for subtotal in dossier['categories']:
+                        f.write(f"{subtotal['category']:<30} {subtotal['items']:>5} поз. "
+                                f"{subtotal['quantity']:>6} шт. {subtotal['total_value']:>12} руб.\n")
+                    f.write("\n")
+
                 # Подписи
                 f.write("\n" + "=" * 60 + "\n")
                 f.write("Ответственный за инвентаризацию:\n\n")
@@ -723,11 +1089,16 @@ class ReportWindow(QMainWindow):
             self.ui.pushButton_15.clicked.connect(self.transfer_selected_items)
             print("✅ Кнопка переноса подключена")
 
+        # Поиск при вводе текста запускается после паузы в наборе
+        self.distribution_filter_timer = QTimer(self)
+        self.distribution_filter_timer.setSingleShot(True)
+        self.distribution_filter_timer.setInterval(250)
+        self.distribution_filter_timer.timeout.connect(self.apply_distribution_filters)
         self.ui.comboBox_17.currentIndexChanged.connect(self.apply_distribution_filters)
         self.ui.comboBox_18.currentIndexChanged.connect(self.apply_distribution_filters)
-        self.ui.lineEdit_27.textChanged.connect(self.apply_distribution_filters)
-        self.ui.lineEdit_26.textChanged.connect(self.apply_distribution_filters)
-        self.ui.lineEdit_25.textChanged.connect(self.apply_distribution_filters)
+        self.ui.lineEdit_27.textChanged.connect(self.distribution_filter_timer.start)
+        self.ui.lineEdit_26.textChanged.connect(self.distribution_filter_timer.start)
+        self.ui.lineEdit_25.textChanged.connect(self.distribution_filter_timer.start)
 
         self.load_categories_to_combo(self.ui.comboBox_17)
         self.load_types_to_combo(self.ui.comboBox_18)
@@ -758,38 +1129,55 @@ class ReportWindow(QMainWindow):
         self.load_distribution_equipment()
 
     def load_distribution_equipment(self):
-        """Загрузка оборудования для распределения"""
+        """Загрузка оборудования для распределения (порциями)"""
+        # Отметки сохраняем, чтобы перезагрузка после чужих изменений их не сбросила
+        self.distribution_checked_ids = set()
+        for row in range(self.distribution_model.rowCount()):
+            check_item = self.distribution_model.item(row, 5)
+            if check_item and check_item.checkState() == Qt.Checked:
+                self.distribution_checked_ids.add(self.distribution_model.item(row, 0).text())
+        self.distribution_model.removeRows(0, self.distribution_model.rowCount())
+        self.distribution_rows.clear()
+        self.start_paged_load(
+            'distribution', self.db.iter_all_equipment(), self.add_distribution_page,
+            on_done=self.on_distribution_loaded)
+
+    def on_distribution_loaded(self):
+        self.apply_distribution_filters()
+        print(f"Загружено оборудования для распределения: {self.distribution_model.rowCount()}")
+
+    def add_distribution_page(self, equipment):
+        """Добавление страницы оборудования в модель распределения"""
         try:
-            equipment = self.db.get_all_equipment()
-            self.distribution_model.removeRows(0, self.distribution_model.rowCount())
             for item in equipment:
-                row = []
-                id_item = QStandardItem(str(item[0]))
-                id_item.setEditable(False)
-                row.append(id_item)
-                name_item = QStandardItem(item[1])
-                name_item.setEditable(False)
-                row.append(name_item)
-                cat_item = QStandardItem(item[2])
-                cat_item.setEditable(False)
-                row.append(cat_item)
-                type_item = QStandardItem(item[3])
-                type_item.setEditable(False)
-                row.append(type_item)
-                serial_item = QStandardItem(item[4])
-                serial_item.setEditable(False)
-                row.append(serial_item)
-                check_item = QStandardItem()
-                check_item.setCheckable(True)
-                check_item.setEditable(False)
-                row.append(check_item)
-                self.distribution_model.appendRow(row)
-            print(f"Загружено оборудования для распределения: {len(equipment)}")
+                self.append_distribution_row(item)
         except Exception as e:
             print(f"Ошибка загрузки оборудования: {e}")
 
+    def append_distribution_row(self, item):
+        self.distribution_rows[item[0]] = self.distribution_model.rowCount()
+        self.distribution_model.appendRow(self.make_distribution_row(item))
+
+    def make_distribution_row(self, item):
+        """Ячейки строки модели распределения для записи оборудования"""
+        row = []
+        for value in (str(item[0]), item[1], item[2], item[3], item[4]):  # ID, название, категория, тип, серийный №
+            cell = QStandardItem(value)
+            cell.setEditable(False)
+            row.append(cell)
+        check_item = QStandardItem()
+        check_item.setCheckable(True)
+        check_item.setEditable(False)
+        if row[0].text() in self.distribution_checked_ids:
+            check_item.setCheckState(Qt.Checked)
+        row.append(check_item)
+        return row
+
+    def find_distribution_row(self, equipment_id):
+        return self.distribution_rows.get(equipment_id, -1)
+
     def transfer_selected_items(self):
-        """Перенос выбранных позиций в рабочее место"""
+        """Перенос выбранных позиций на свободные рабочие места комнаты"""
         if not self.current_room_id:
             QMessageBox.warning(self, "Ошибка", "Сначала выберите комнату")
             return
@@ -806,49 +1194,53 @@ class ReportWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Выберите позиции для переноса")
             return
 
-        free_spot = None
         room = self.db.get_room(self.current_room_id)
         capacity = room[4] if room else 10
+        free_spots = [i for i in range(1, capacity + 1) if i not in self.workplaces_data]
 
-        for i in range(1, capacity + 1):
-            if i not in self.workplaces_data:
-                free_spot = i
-                break
-
-        if not free_spot:
+        if not free_spots:
             QMessageBox.warning(self, "Ошибка", "Нет свободных мест")
             return
+        if len(selected_ids) > len(free_spots):
+            QMessageBox.warning(self, "Ошибка",
+                                f"Выбрано позиций: {len(selected_ids)}, свободных мест: {len(free_spots)}")
+            return
 
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT name, category, type, serial_number FROM equipment WHERE equipment_id = ?",
-                       (selected_ids[0],))
-        equip = cursor.fetchone()
-        conn.close()
+        # Все позиции переносятся в комнату одной транзакцией
+        try:
+            moved = self.db.update_equipment_room_many(selected_ids, self.current_room_id)
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось перенести позиции:\n{e}")
+            return
 
-        if equip:
+        for spot, equip in zip(free_spots, moved):
             data = {
-                'type': equip[2] if equip[2] else "Оборудование",
-                'name': equip[1],
-                'serial': equip[3],
+                'type': equip['type'] if equip['type'] else "Оборудование",
+                'name': equip['name'],
+                'serial': equip['serial_number'],
                 'has_monitor': False,
                 'has_keyboard': False,
                 'has_mouse': False,
                 'has_power_cable': True,
-                'notes': f"ID в БД: {selected_ids[0]}"
+                'notes': f"ID в БД: {equip['equipment_id']}",
+                'equipment_id': equip['equipment_id'],
             }
-            self.workplaces_data[free_spot] = data
-            self.update_workplace_widget(free_spot, data)
-            self.db.update_equipment_room(selected_ids[0], self.current_room_id)
-
-            for row in range(self.distribution_model.rowCount()):
-                id_item = self.distribution_model.item(row, 0)
-                if id_item and int(id_item.text()) in selected_ids:
-                    check_item = self.distribution_model.item(row, 5)
-                    if check_item:
-                        check_item.setCheckState(Qt.Unchecked)
+            self.workplaces_data[spot] = data
+            self.update_workplace_widget(spot, data)
 
-            QMessageBox.information(self, "Успех", f"Позиция перенесена на место №{free_spot}")
+        for row in range(self.distribution_model.rowCount()):
+            id_item = self.distribution_model.item(row, 0)
+            if id_item and int(id_item.text()) in selected_ids:
+                check_item = self.distribution_model.item(row, 5)
+                if check_item:
+                    check_item.setCheckState(Qt.Unchecked)
+
+        if len(moved) == 1:
+            QMessageBox.information(self, "Успех", f"Позиция перенесена на место №{free_spots[0]}")
+        elif moved:
+            QMessageBox.information(self, "Успех",
+                                    f"Перенесено позиций: {len(moved)}, "
+                                    f"места №{free_spots[0]}-{free_spots[len(moved) - 1]}")
 
     def on_branch_changed_distribution(self):
         """Изменение филиала во вкладке распределение"""
@@ -864,40 +1256,73 @@ class ReportWindow(QMainWindow):
         branch_id = self.ui.comboBox_14.currentData()
         floor = self.ui.spinBox_6.value()
         if branch_id and floor:
-            self.load_rooms_to_combo(self.ui.comboBox_16, branch_id, floor)
+            self.load_rooms_to_combo_async(self.ui.comboBox_16, branch_id, floor)
 
     def on_room_changed_distribution(self):
-        """Изменение комнаты - создаем рабочие места"""
+        """Изменение комнаты - создаем рабочие места.
+
+        Пока комната загружается, текущей комнаты нет: сохранение и перенос
+        недоступны, иначе места прежней комнаты записались бы в новую.
+        """
         room_id = self.ui.comboBox_16.currentData()
+        self.current_room_id = None
+        self.workplaces_data = {}
+        self.clear_workplaces()
         if not room_id:
+            self.db_executor.cancel('distribution_room')
             return
-        self.current_room_id = room_id
-        room = self.db.get_room(room_id)
+        self.db_executor.submit('distribution_room', self.read_distribution_room, room_id,
+                                on_result=self.show_distribution_room)
+
+    def read_distribution_room(self, room_id):
+        """Комната и ее сохраненное распределение (выполняется в фоне)"""
+        return self.db.get_room(room_id), self.db.load_room_workplaces(room_id)
+
+    def show_distribution_room(self, result):
+        room, saved = result
         if room:
+            # Несохраненные правки комнаты важнее сохраненного распределения
+            self.current_room_id = room['room_id']
+            self.workplaces_data = self.workplaces_by_room.setdefault(room['room_id'], saved)
             capacity = room[4]
             self.create_workplaces(capacity)
 
     def apply_distribution_filters(self):
-        """Применение фильтров распределения"""
+        """Применение фильтров распределения.
+
+        Подбор позиций выполняет БД в фоне (search_equipment_ids по
+        полнотекстовому индексу, только ID), здесь только скрываются строки,
+        которых нет в результате; новый запрос отменяет незаконченный.
+        Название и модель ищутся по всем текстовым полям, производитель -
+        по поставщику.
+        """
+        self.distribution_filter_timer.stop()
         category = self.ui.comboBox_17.currentData()
         type_ = self.ui.comboBox_18.currentData()
-        name_filter = self.ui.lineEdit_27.text().lower()
+        query = f"{self.ui.lineEdit_27.text()} {self.ui.lineEdit_26.text()}".strip()
+        supplier = self.ui.lineEdit_25.text().strip()
+
+        if not (category or type_ or query or supplier):
+            self.db_executor.cancel('distribution_search')
+            self.show_distribution_filter(None)  # фильтров нет, показываем все
+            return
 
+        filters = {'category': category, 'type': type_, 'supplier': supplier}
+        self.db_executor.submit('distribution_search', self.db.search_equipment_ids, query, filters,
+                                on_result=self.show_distribution_filter,
+                                on_error=lambda e: print(f"Ошибка поиска оборудования: {e}"))
+
+    def show_distribution_filter(self, visible_ids):
+        """Скрытие строк распределения, которых нет в visible_ids (None - показать все)"""
+        view = self.ui.tableView_2
         for row in range(self.distribution_model.rowCount()):
-            show = True
-            if category and category != "Все категории":
-                cat_item = self.distribution_model.item(row, 2)
-                if cat_item and cat_item.text() != category:
-                    show = False
-            if show and type_ and type_ != "Все типы":
-                type_item = self.distribution_model.item(row, 3)
-                if type_item and type_item.text() != type_:
-                    show = False
-            if show and name_filter:
-                name_item = self.distribution_model.item(row, 1)
-                if name_item and name_filter not in name_item.text().lower():
-                    show = False
-            self.ui.tableView_2.setRowHidden(row, not show)
+            hide = False
+            if visible_ids is not None:
+                id_item = self.distribution_model.item(row, 0)
+                hide = id_item is None or int(id_item.text()) not in visible_ids
+            # Строки, видимость которых не меняется, не трогаем
+            if view.isRowHidden(row) != hide:
+                view.setRowHidden(row, hide)
 
     def save_room_distribution(self):
         """Сохранение распределения для комнаты"""
@@ -906,31 +1331,57 @@ class ReportWindow(QMainWindow):
             return
         dlg = ConfirmationDialog("Сохранить распределение для этой комнаты?", self)
         if dlg.exec() == QDialog.Accepted:
-            QMessageBox.information(self, "Успех", "Распределение сохранено")
+            try:
+                changed = self.db.save_room_workplaces(self.current_room_id, self.workplaces_data)
+            except Exception as e:
+                QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить распределение:\n{e}")
+                return
+            QMessageBox.information(self, "Успех", f"Распределение сохранено (изменено мест: {changed})")
 
     def reset_room_distribution(self):
         """Сброс распределения для комнаты"""
+        if not self.current_room_id:
+            QMessageBox.warning(self, "Ошибка", "Выберите комнату")
+            return
         dlg = ConfirmationDialog("Сбросить распределение для этой комнаты?", self)
         if dlg.exec() == QDialog.Accepted:
             self.workplaces_data.clear()
-            room_id = self.ui.comboBox_16.currentData()
-            if room_id:
-                room = self.db.get_room(room_id)
-                if room:
-                    self.create_workplaces(room[4])
+            room = self.db.get_room(self.current_room_id)
+            if room:
+                self.create_workplaces(room[4])
 
     def save_all_distribution(self):
         """Сохранение всего распределения"""
         dlg = ConfirmationDialog("Сохранить все распределения?", self)
         if dlg.exec() == QDialog.Accepted:
-            QMessageBox.information(self, "Успех", "Все распределения сохранены")
+            # Все открытые комнаты одной транзакцией
+            try:
+                changed = self.db.save_all_workplaces(self.workplaces_by_room)
+            except Exception as e:
+                QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить распределения:\n{e}")
+                return
+            QMessageBox.information(self, "Успех",
+                                    f"Все распределения сохранены (комнат: {len(self.workplaces_by_room)}, "
+                                    f"изменено мест: {changed})")
 
     def delete_all_distribution(self):
-        """Удаление всего распределения"""
-        dlg = ConfirmationDialog("Удалить все распределения?", self)
+        """Удаление распределения всех комнат (и сохраненного в БД)"""
+        dlg = ConfirmationDialog("Удалить все распределения?\n"
+                                 "Будут удалены и сохраненные распределения всех комнат.", self)
         if dlg.exec() == QDialog.Accepted:
+            try:
+                removed = self.db.delete_all_workplaces()
+            except Exception as e:
+                QMessageBox.critical(self, "Ошибка", f"Не удалось удалить распределения:\n{e}")
+                return
+            for workplaces in self.workplaces_by_room.values():
+                workplaces.clear()
             self.workplaces_data.clear()
-            self.clear_workplaces()
+            if self.current_room_id:
+                room = self.db.get_room(self.current_room_id)
+                if room:
+                    self.create_workplaces(room[4])
+            QMessageBox.information(self, "Успех", f"Распределения удалены (освобождено мест: {removed})")
 
     def export_room_report(self):
         """Выгрузка отчетности по комнате в .txt"""
@@ -939,9 +1390,10 @@ class ReportWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Выберите комнату")
             return
 
-        room = self.db.get_room(room_id)
-        if not room:
+        dossier = self.db.get_room_dossier(room_id)
+        if not dossier:
             return
+        room = dossier['room']
 
         file_path, _ = QFileDialog.getSaveFileName(
             self, "Сохранить отчет по комнате", "", "Текстовые файлы (*.txt)"
@@ -953,15 +1405,18 @@ class ReportWindow(QMainWindow):
         try:
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write("=" * 50 + "\n")
-                f.write(f"ОТЧЕТ ПО КОМНАТЕ: {room[1]} - {room[2]}\n")
+                f.write(f"ОТЧЕТ ПО КОМНАТЕ: {room['room_number']} - {room['room_name']}\n")
                 f.write("=" * 50 + "\n\n")
-                f.write(f"Этаж: {room[3]}\n")
-                f.write(f"Вместимость: {room[4]} чел.\n")
-                f.write(f"Столов: {room[5]}, Стульев: {room[6]}\n")
-                f.write(f"Розеток: {room[7]}, Площадь: {room[8]} м²\n\n")
+                f.write(f"Этаж: {room['floor']}\n")
+                f.write(f"Вместимость: {room['capacity']} чел.\n")
+                f.write(f"Столов: {room['desks_count']}, Стульев: {room['chairs_count']}\n")
+                f.write(f"Розеток: {room['sockets_count']}, Площадь: {room['area']} м²\n")
+                if dossier['responsible']:
+                    f.write(f"Ответственный: {dossier['responsible']['name']}\n")
+                f.write(f"Оборудования в комнате: {len(dossier['equipment'])}\n\n")
                 f.write("РАБОЧИЕ МЕСТА:\n")
                 f.write("-" * 50 + "\n")
-                for i in range(1, room[4] + 1):
+                for i in range(1, room['capacity'] + 1):
                     data = self.workplaces_data.get(i, {})
                     f.write(f"\nМесто №{i}:\n")
                     if data:
@@ -1050,6 +1505,10 @@ class ReportWindow(QMainWindow):
         dlg = WorkplaceDialog(self.db, self.current_room_id, number, self)
         if dlg.exec() == QDialog.Accepted:
             data = dlg.get_data()
+            # Связь с записью оборудования сохраняется, пока серийный номер тот же
+            previous = self.workplaces_data.get(number) or {}
+            if previous.get('equipment_id') and previous.get('serial') == data['serial']:
+                data['equipment_id'] = previous['equipment_id']
             self.workplaces_data[number] = data
             self.update_workplace_widget(number, data)
 
@@ -1075,6 +1534,145 @@ class ReportWindow(QMainWindow):
             self.update_workplace_widget(number, None)
 
     # ========== ОБЩИЕ МЕТОДЫ ==========
+    def start_paged_load(self, key, rows, add_page, on_done=None, page_size=500):
+        """Порционная загрузка строк в таблицу без блокировки интерфейса.
+
+        rows - итератор строк из БД (например, iter_all_equipment), add_page
+        получает очередную страницу. Между страницами управление возвращается
+        циклу событий, так что первая страница видна сразу. Повторный запуск
+        с тем же key отменяет незаконченную загрузку.
+        """
+        generation = self.paged_loads.get(key, 0) + 1
+        self.paged_loads[key] = generation
+        self.loading_keys.add(key)
+        rows = iter(rows)
+
+        def load_next_page():
+            if self.paged_loads.get(key) != generation:
+                return  # загрузка отменена более новой
+            try:
+                page = list(itertools.islice(rows, page_size))
+            except Exception as e:
+                print(f"❌ Ошибка загрузки ({key}): {e}")
+                self.loading_keys.discard(key)
+                return
+            if page:
+                add_page(page)
+            if len(page) < page_size:
+                self.loading_keys.discard(key)
+                if on_done:
+                    on_done()
+                return
+            QTimer.singleShot(0, load_next_page)
+
+        load_next_page()
+
+    def on_tables_changed(self, tables):
+        """БД изменили другое окно или процесс - обновляем только затронутое"""
+        print(f"🔄 Изменены таблицы: {', '.join(tables)}")
+        if "branches" in tables:
+            for combo in (self.ui.comboBox_3, self.ui.comboBox_4, self.ui.comboBox_5,
+                          self.ui.comboBox_6, self.ui.comboBox_14, self.ui.comboBox_15):
+                self.reload_combo(combo, self.load_branches_to_combo)
+        if "employees" in tables:
+            for combo in (self.ui.comboBox, self.ui.comboBox_2, self.ui.comboBox_8):
+                self.reload_combo(combo, self.load_employees_to_combo)
+            self.reload_combo(self.ui.comboBox_13, self.load_employees_with_position)
+        if "room" in tables:
+            self.reload_combo(self.ui.comboBox_7, lambda combo: self.load_rooms_to_combo(
+                combo, self.ui.comboBox_4.currentData(), self.ui.spinBox_3.value()))
+            self.reload_combo(self.ui.comboBox_16, lambda combo: self.load_rooms_to_combo(
+                combo, self.ui.comboBox_14.currentData(), self.ui.spinBox_6.value()))
+        if "equipment" in tables:
+            self.load_arrival_data()
+            self.load_distribution_equipment()
+            self.on_room_changed_inventory()
+
+    def on_data_changed(self, events):
+        """Изменения из этого окна: строки оборудования правятся точечно"""
+        equipment = [event for event in events if event.entity == "equipment"]
+        if not equipment:
+            return
+
+        # Массовое изменение - одна перезагрузка вместо запроса на каждую запись
+        if any(event.entity_id is None for event in equipment) or len(equipment) > EQUIPMENT_PATCH_LIMIT:
+            self.load_arrival_data()
+            self.load_distribution_equipment()
+        else:
+            # Идущая загрузка может дойти до измененной строки сама -
+            # такую таблицу проще перезапустить, чем искать дубликаты
+            if 'arrival' in self.loading_keys:
+                self.load_arrival_data()
+            if 'distribution' in self.loading_keys:
+                self.load_distribution_equipment()
+            for event in equipment:
+                self.patch_equipment_rows(event)
+            if 'distribution' not in self.loading_keys:
+                self.apply_distribution_filters()
+        self.on_room_changed_inventory()
+
+    def patch_equipment_rows(self, event):
+        """Обновление одной записи оборудования в таблицах поступления и распределения"""
+        item = None if event.operation == DELETE else self.db.get_equipment(event.entity_id)
+
+        if 'arrival' not in self.loading_keys:
+            row = self.find_arrival_row(event.entity_id)
+            if item is None:
+                if row >= 0:
+                    self.ui.tableWidget.removeRow(self.forget_row(self.arrival_rows, event.entity_id))
+                    self.renumber_arrival_rows(row)
+            else:
+                if row < 0:
+                    row = self.ui.tableWidget.rowCount()
+                    self.ui.tableWidget.insertRow(row)
+                self.set_arrival_row(row, item)
+
+        if 'distribution' not in self.loading_keys:
+            row = self.find_distribution_row(event.entity_id)
+            if item is None:
+                if row >= 0:
+                    self.distribution_model.removeRow(self.forget_row(self.distribution_rows, event.entity_id))
+            elif row < 0:
+                self.append_distribution_row(item)
+            else:
+                for column, value in ((1, item[1]), (2, item[2]), (3, item[3]), (4, item[4])):
+                    self.distribution_model.item(row, column).setText(value)
+
+    def reload_combo(self, combo, fill):
+        """Перезаполнение комбобокса с сохранением выбора.
+
+        Сигнал смены выбора отправляется, только если выбранного элемента
+        больше нет (например, филиал удалили в окне настроек).
+        """
+        if not combo:
+            return
+        current = combo.currentData()
+        combo.blockSignals(True)
+        try:
+            fill(combo)
+            index = combo.findData(current) if current is not None else 0
+            combo.setCurrentIndex(max(index, 0))
+        finally:
+            combo.blockSignals(False)
+        if current is not None and index < 0:
+            combo.currentIndexChanged.emit(combo.currentIndex())
+
+    def closeEvent(self, event):
+        """Закрытие окна - освобождаем соединения с БД"""
+        if self.arrival_import_running:
+            # Импорт пишет в БД пачками - закрытие посреди него оставило бы накладную наполовину
+            QMessageBox.information(self, "Импорт поступления", "Дождитесь окончания импорта накладной")
+            event.ignore()
+            return
+        self.watcher.stop()
+        self.bus.detach()
+        self.backup_service.cancel()  # иначе поток копирования дождется ее конца
+        self.backup_executor.shutdown()
+        self.db_executor.shutdown()
+        self.paged_loads.clear()  # останавливаем незаконченные загрузки
+        self.db.close()
+        super().closeEvent(event)
+
     def load_initial_data(self):
         """Загрузка начальных данных"""
         print("Загрузка начальных данных...")
@@ -1093,7 +1691,12 @@ class ReportWindow(QMainWindow):
         if hasattr(self.ui, 'dateTimeEdit'):
             self.ui.dateTimeEdit.setDateTime(QDateTime.currentDateTime())
         self.ui.progressBar.setValue(0)
-        print("Загрузка данных завершена")
+        if self.db.cache is not None:
+            stats = self.db.cache.stats()
+            print(f"Загрузка данных завершена (кэш: запросов к БД {stats['misses']}, "
+                  f"из кэша {stats['hits']})")
+        else:
+            print("Загрузка данных завершена")
 
     def load_branches_to_combo(self, combo):
         """Загрузка филиалов в комбобокс"""
@@ -1158,16 +1761,29 @@ class ReportWindow(QMainWindow):
         """Загрузка комнат в комбобокс"""
         if not combo:
             return
-        combo.clear()
-        combo.addItem("Выберите комнату", None)
+        rooms = []
         if branch_id and floor:
             try:
                 rooms = self.db.get_rooms_by_branch_and_floor(branch_id, floor)
-                for room in rooms:
-                    combo.addItem(f"{room[1]} - {room[2]}", room[0])
-                print(f"Загружено комнат: {len(rooms)}")
             except Exception as e:
                 print(f"Ошибка загрузки комнат: {e}")
+        self.fill_rooms_combo(combo, rooms)
+
+    def load_rooms_to_combo_async(self, combo, branch_id, floor):
+        """Загрузка комнат в комбобокс в фоне; при быстрой смене этажа
+        применяется только результат последнего запроса"""
+        if not combo:
+            return
+        self.db_executor.submit(('rooms', combo.objectName()), self.db.get_rooms_by_branch_and_floor,
+                                branch_id, floor, on_result=lambda rooms: self.fill_rooms_combo(combo, rooms),
+                                on_error=lambda e: print(f"Ошибка загрузки комнат: {e}"))
+
+    def fill_rooms_combo(self, combo, rooms):
+        combo.clear()
+        combo.addItem("Выберите комнату", None)
+        for room in rooms:
+            combo.addItem(f"{room[1]} - {room[2]}", room[0])
+        print(f"Загружено комнат: {len(rooms)}")
 
     # ========== МЕТОДЫ МЕНЮ ==========
     def new_report(self):
@@ -1231,6 +1847,43 @@ class ReportWindow(QMainWindow):
                                 "Telegram: @katwell1\n\n"
                                 "© 2026")
 
+    def show_equipment_summary(self):
+        EquipmentSummaryDialog(self.db, self.db_executor, self).exec()
+
+    def show_db_diagnostics(self):
+        """Статистика запросов к БД (если включен замер)"""
+        if self.db.stats is None:
+            QMessageBox.information(self, "Диагностика БД",
+                                    "Замер запросов выключен.\n\n"
+                                    "Включите его в database/db_config.json "
+                                    "(\"instrumentation\": {\"enabled\": true}) или переменной "
+                                    "окружения COMPANY_DB_INSTRUMENT=1 и перезапустите программу.")
+            return
+        QueryStatsDialog(self.db, self).exec()
+
+    def start_backup(self):
+        """Резервная копия БД в фоне: окно продолжает работать"""
+        if self.backup_running:
+            QMessageBox.information(self, "Резервная копия", "Резервное копирование уже идет")
+            return
+        self.backup_running = True
+        self.statusBar().showMessage("Резервное копирование: 0%")
+        self.backup_executor.submit('backup', self.backup_service.backup, self.backup_progress.emit,
+                                on_result=self.on_backup_done, on_error=self.on_backup_failed)
+
+    def show_backup_progress(self, copied, total):
+        percent = copied * 100 // total if total else 100
+        self.statusBar().showMessage(f"Резервное копирование: {percent}%")
+
+    def on_backup_done(self, path):
+        self.backup_running = False
+        self.statusBar().showMessage(f"Резервная копия сохранена: {os.path.basename(path)}", 5000)
+
+    def on_backup_failed(self, error):
+        self.backup_running = False
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Ошибка", f"Резервная копия не создана:\n{error}")
+
     def open_environment_settings(self):
         """Открыть настройки окружения (старый метод)"""
         self.open_settings_window()
@@ -1251,6 +1904,8 @@ class ReportWindow(QMainWindow):
             self.ui.plainTextEdit.clear()
 
     def clear_inventory_tab(self):
+        # Новая отчетность - новый сеанс, несохраненные отметки отбрасываются
+        self.inventory_session = self.db.open_inventory_session()
         if hasattr(self.ui, 'lineEdit'):
             self.ui.lineEdit.clear()
         if hasattr(self.ui, 'textEdit'):
@@ -1269,8 +1924,10 @@ class ReportWindow(QMainWindow):
             self.ui.textEdit_5.clear()
         if hasattr(self.ui, 'lineEdit_24'):
             self.ui.lineEdit_24.clear()
-        self.workplaces_data.clear()
-        self.clear_workplaces()
+        # Несохраненные правки распределения отбрасываются, сохраненное остается в БД:
+        # открытая комната перечитывается из БД
+        self.workplaces_by_room.clear()
+        self.on_room_changed_distribution()
 
 
 # ========== ЗАПУСК ==========
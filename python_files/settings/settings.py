@@ -12,7 +12,11 @@ from PySide6.QtUiTools import QUiLoader
 from PySide6.QtCore import QFile, QIODevice
 from PySide6.QtGui import QScreen
 from datetime import datetime
+from python_files.database.change_watcher import DataVersionWatcher
 from python_files.database.database_handler import DatabaseHandler
+from python_files.database.db_executor import DbExecutor
+from python_files.database.event_bus import DataEventBus
+from python_files.database.events import DELETE
 
 # Путь к твоей БД
 python_files_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -21,12 +25,22 @@ db_path = os.path.join(python_files_dir, "database", "database", "company.db")
 print(f"Путь к БД: {db_path}")
 print(f"Файл существует: {os.path.exists(db_path)}")
 
+
+def find_table_row(table, entity_id):
+    """Номер строки таблицы с ID в колонке 0 (-1 - такой строки нет)"""
+    for row in range(table.rowCount()):
+        item = table.item(row, 0)
+        if item and item.text() == str(entity_id):
+            return row
+    return -1
+
 class EmployeesDialog(QDialog):
     """Диалог для управления сотрудниками"""
 
-    def __init__(self, db, branch_id, branch_name, parent=None):
+    def __init__(self, db, bus, branch_id, branch_name, parent=None):
         super().__init__(parent)
         self.db = db
+        self.bus = bus
         self.branch_id = branch_id
         self.selected_employee_id = None
         self.setWindowTitle(f"Сотрудники филиала: {branch_name}")
@@ -88,17 +102,45 @@ class EmployeesDialog(QDialog):
         # Загружаем данные
         self.load_employees()
 
+        # Таблица правится по событиям изменения данных
+        self.bus.changed.connect(self.on_data_changed)
+        self.finished.connect(lambda: self.bus.changed.disconnect(self.on_data_changed))
+
     def load_employees(self):
         """Загрузка сотрудников в таблицу"""
         employees = self.db.get_employees(self.branch_id)
         self.table.setRowCount(len(employees))
 
         for i, emp in enumerate(employees):
-            self.table.setItem(i, 0, QTableWidgetItem(str(emp[0])))  # ID
-            self.table.setItem(i, 1, QTableWidgetItem(emp[1]))  # Имя
-            self.table.setItem(i, 2, QTableWidgetItem(emp[2]))  # Должность
-            self.table.setItem(i, 3, QTableWidgetItem(str(emp[3])))  # Отчеты
-            self.table.setItem(i, 4, QTableWidgetItem(emp[4]))  # Дата
+            self.set_employee_row(i, emp)
+
+    def set_employee_row(self, i, emp):
+        """Заполнение одной строки таблицы"""
+        self.table.setItem(i, 0, QTableWidgetItem(str(emp[0])))  # ID
+        self.table.setItem(i, 1, QTableWidgetItem(emp[1]))  # Имя
+        self.table.setItem(i, 2, QTableWidgetItem(emp[2]))  # Должность
+        self.table.setItem(i, 3, QTableWidgetItem(str(emp[3])))  # Отчеты
+        self.table.setItem(i, 4, QTableWidgetItem(emp[4]))  # Дата
+
+    def on_data_changed(self, events):
+        """Точечное обновление строк вместо перезагрузки всей таблицы"""
+        for event in events:
+            if event.entity != "employee":
+                continue
+            if event.entity_id is None:
+                self.load_employees()
+                return
+
+            row = find_table_row(self.table, event.entity_id)
+            emp = None if event.operation == DELETE else self.db.get_employee(event.entity_id)
+            if emp is None or emp['branch_id'] != self.branch_id:
+                if row >= 0:
+                    self.table.removeRow(row)
+                continue
+            if row < 0:
+                row = self.table.rowCount()
+                self.table.insertRow(row)
+            self.set_employee_row(row, emp)
 
     def on_row_selected(self, row, column):
         """Выбор строки в таблице"""
@@ -147,7 +189,6 @@ class EmployeesDialog(QDialog):
         self.update_btn.setEnabled(False)
         self.delete_btn.setEnabled(False)
         self.add_btn.setText("➕ Добавить")
-        self.load_employees()
 
     def update_employee(self):
         """Обновление сотрудника"""
@@ -173,7 +214,6 @@ class EmployeesDialog(QDialog):
             self.name_edit.clear()
             self.job_edit.clear()
             self.date_edit.setDate(QDate.currentDate())
-            self.load_employees()
 
     def delete_employee(self):
         """Удаление сотрудника"""
@@ -196,15 +236,15 @@ class EmployeesDialog(QDialog):
                 self.name_edit.clear()
                 self.job_edit.clear()
                 self.date_edit.setDate(QDate.currentDate())
-                self.load_employees()
 
 
 class RoomsDialog(QDialog):
     """Диалог для управления комнатами с расширенной информацией"""
 
-    def __init__(self, db, branch_id, branch_name, parent=None):
+    def __init__(self, db, bus, branch_id, branch_name, parent=None):
         super().__init__(parent)
         self.db = db
+        self.bus = bus
         self.branch_id = branch_id
         self.selected_room_id = None
         self.setWindowTitle(f"Комнаты филиала: {branch_name}")
@@ -316,6 +356,10 @@ class RoomsDialog(QDialog):
         # Загружаем данные
         self.load_rooms()
 
+        # Таблица правится по событиям изменения данных
+        self.bus.changed.connect(self.on_data_changed)
+        self.finished.connect(lambda: self.bus.changed.disconnect(self.on_data_changed))
+
     def load_responsible_employees(self):
         """Загрузка списка сотрудников для выбора ответственного"""
         try:
@@ -334,27 +378,54 @@ class RoomsDialog(QDialog):
             self.table.setRowCount(len(rooms))
 
             for i, room in enumerate(rooms):
-                # room: (room_id, room_number, room_name, floor, capacity,
-                #        desks_count, chairs_count, sockets_count, area,
-                #        responsible_id, notes, responsible_name)
-
-                self.table.setItem(i, 0, QTableWidgetItem(str(room[0])))  # ID
-                self.table.setItem(i, 1, QTableWidgetItem(room[1] or ""))  # Номер
-                self.table.setItem(i, 2, QTableWidgetItem(room[2] or ""))  # Название
-                self.table.setItem(i, 3, QTableWidgetItem(str(room[3] or "1")))  # Этаж
-                self.table.setItem(i, 4, QTableWidgetItem(str(room[4] or "0")))  # Вместимость
-                self.table.setItem(i, 5, QTableWidgetItem(str(room[5] or "0")))  # Столов
-                self.table.setItem(i, 6, QTableWidgetItem(str(room[6] or "0")))  # Стульев
-                self.table.setItem(i, 7, QTableWidgetItem(str(room[7] or "0")))  # Розеток
-                self.table.setItem(i, 8, QTableWidgetItem(str(room[8] or "0.0")))  # Площадь
-
-                # Ответственный
-                responsible_name = room[11] if len(room) > 11 and room[11] else "Не назначен"
-                self.table.setItem(i, 9, QTableWidgetItem(responsible_name))
+                self.set_room_row(i, room)
 
         except Exception as e:
             print(f"Ошибка загрузки комнат: {e}")
 
+    def set_room_row(self, i, room):
+        """Заполнение одной строки таблицы"""
+        # room: (room_id, room_number, room_name, floor, capacity,
+        #        desks_count, chairs_count, sockets_count, area,
+        #        responsible_id, notes, responsible_name)
+
+        self.table.setItem(i, 0, QTableWidgetItem(str(room[0])))  # ID
+        self.table.setItem(i, 1, QTableWidgetItem(room[1] or ""))  # Номер
+        self.table.setItem(i, 2, QTableWidgetItem(room[2] or ""))  # Название
+        self.table.setItem(i, 3, QTableWidgetItem(str(room[3] or "1")))  # Этаж
+        self.table.setItem(i, 4, QTableWidgetItem(str(room[4] or "0")))  # Вместимость
+        self.table.setItem(i, 5, QTableWidgetItem(str(room[5] or "0")))  # Столов
+        self.table.setItem(i, 6, QTableWidgetItem(str(room[6] or "0")))  # Стульев
+        self.table.setItem(i, 7, QTableWidgetItem(str(room[7] or "0")))  # Розеток
+        self.table.setItem(i, 8, QTableWidgetItem(str(room[8] or "0.0")))  # Площадь
+
+        # Ответственный
+        responsible_name = room[11] if len(room) > 11 and room[11] else "Не назначен"
+        self.table.setItem(i, 9, QTableWidgetItem(responsible_name))
+
+    def on_data_changed(self, events):
+        """Точечное обновление строк вместо перезагрузки всей таблицы"""
+        try:
+            for event in events:
+                if event.entity != "room":
+                    continue
+                if event.entity_id is None:
+                    self.load_rooms()
+                    return
+
+                row = find_table_row(self.table, event.entity_id)
+                room = None if event.operation == DELETE else self.db.get_room(event.entity_id)
+                if room is None or room['branch_id'] != self.branch_id:
+                    if row >= 0:
+                        self.table.removeRow(row)
+                    continue
+                if row < 0:
+                    row = self.table.rowCount()
+                    self.table.insertRow(row)
+                self.set_room_row(row, room)
+        except Exception as e:
+            print(f"Ошибка обновления комнат: {e}")
+
     def on_row_selected(self, row, column):
         """Выбор строки в таблице"""
         id_item = self.table.item(row, 0)
@@ -435,8 +506,6 @@ class RoomsDialog(QDialog):
             self.responsible_combo.setCurrentIndex(0)
             self.notes_edit.clear()
 
-            self.load_rooms()
-
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось добавить комнату: {e}")
 
@@ -486,8 +555,6 @@ class RoomsDialog(QDialog):
                 self.area_spin.setValue(0.0)
                 self.responsible_combo.setCurrentIndex(0)
                 self.notes_edit.clear()
-
-                self.load_rooms()
             else:
                 QMessageBox.warning(self, "Ошибка", "Не удалось обновить комнату")
 
@@ -528,8 +595,6 @@ class RoomsDialog(QDialog):
                     self.area_spin.setValue(0.0)
                     self.responsible_combo.setCurrentIndex(0)
                     self.notes_edit.clear()
-
-                    self.load_rooms()
                 else:
                     QMessageBox.warning(self, "Ошибка", "Не удалось удалить комнату")
 
@@ -545,15 +610,24 @@ class MainWindow(QMainWindow):
 
         # Подключаемся к БД
         self.db = DatabaseHandler(db_path)
+        self.db_executor = DbExecutor(parent=self)  # фоновые запросы от действий пользователя
 
         self.current_branch_id = None
         self.original_company_name = ""  # Для отслеживания изменений
         self.changes_made = False  # Флаг наличия изменений
 
+        # Изменения из окна отчетности и plane.py
+        self.watcher = DataVersionWatcher(self.db, parent=self)
+        self.watcher.tables_changed.connect(self.on_tables_changed)
+        # Изменения, сделанные этим окном и его диалогами
+        self.bus = DataEventBus(self.db, parent=self)
+        self.bus.changed.connect(self.on_data_changed)
+
         self.load_ui()
         if self.ui:
             self.setup_connections()
             self.load_initial_data()
+            self.watcher.start()
             self.showMaximized()  # 👈 РАЗВОРАЧИВАЕМ НА ВЕСЬ ЭКРАН
 
     def load_ui(self):
@@ -629,6 +703,81 @@ class MainWindow(QMainWindow):
 
         self.reset_all_btn.clicked.connect(self.reset_all)
 
+    def closeEvent(self, event):
+        """Закрытие окна - освобождаем соединения с БД"""
+        self.watcher.stop()
+        self.bus.detach()
+        self.db_executor.shutdown()
+        self.db.close()
+        super().closeEvent(event)
+
+    def on_tables_changed(self, tables):
+        """БД изменили другое окно или процесс: обновляем список и счетчики,
+        не трогая поля редактируемого филиала"""
+        if "branches" in tables:
+            changes_made = self.changes_made
+            self.load_branches()
+            self.changes_made = changes_made
+
+            item = self.find_branch_item(self.current_branch_id)
+            if item is not None:
+                self.branches_list.setCurrentItem(item)
+            elif self.current_branch_id:
+                self.current_branch_id = None
+                self.branch_group.setEnabled(False)
+                self.statusBar().showMessage("Выбранный филиал удален в другом окне")
+
+        if self.current_branch_id and {"employees", "room", "equipment"} & set(tables):
+            self.update_branch_counters()
+
+    def on_data_changed(self, events):
+        """Изменения из этого окна: список филиалов правится точечно"""
+        update_counters = False
+        for event in events:
+            if event.entity == "branch":
+                self.patch_branch_item(event)
+            elif event.entity in ("employee", "room", "equipment"):
+                update_counters = True
+
+        if update_counters and self.current_branch_id:
+            self.update_branch_counters()
+
+    def find_branch_item(self, branch_id):
+        for i in range(self.branches_list.count()):
+            item = self.branches_list.item(i)
+            if item.data(Qt.UserRole) == branch_id:
+                return item
+        return None
+
+    def patch_branch_item(self, event):
+        """Добавление, переименование или удаление одного филиала в списке"""
+        if event.entity_id is None:
+            changes_made = self.changes_made
+            self.load_branches()
+            self.changes_made = changes_made
+            return
+
+        item = self.find_branch_item(event.entity_id)
+        branch = None if event.operation == DELETE else self.db.get_branch(event.entity_id)
+        if branch is None:
+            if item is not None:
+                self.branches_list.takeItem(self.branches_list.row(item))
+        elif item is None:
+            item = QListWidgetItem(branch[1])  # name
+            item.setData(Qt.UserRole, branch[0])  # branch_id
+            self.branches_list.addItem(item)
+        else:
+            item.setText(branch[1])
+        self.update_branches_total()
+
+    def update_branches_total(self):
+        """Счетчик филиалов (без отметки о несохраненных изменениях)"""
+        count = self.branches_list.count()
+        self.branches_spin.blockSignals(True)
+        self.branches_spin.setValue(count)
+        self.branches_spin.blockSignals(False)
+        self.total_branches_label.setText(f"Всего филиалов: {count}")
+
     def on_change(self):
         """Отслеживание изменений"""
         self.changes_made = True
@@ -674,26 +823,37 @@ class MainWindow(QMainWindow):
         if target > current:
             for i in range(current + 1, target + 1):
                 self.db.add_branch(f"Филиал №{i}")
-            self.load_branches()
             self.changes_made = False
             QMessageBox.information(self, "Успех", f"Добавлено {target - current} филиалов")
 
     def on_branch_selected(self, item):
         """Выбор филиала"""
         self.current_branch_id = item.data(Qt.UserRole)
-        branch = self.db.get_branch(self.current_branch_id)
+        self.db_executor.submit('branch', self.db.get_branch, self.current_branch_id,
+                                on_result=self.show_branch)
 
-        if branch:
+    def show_branch(self, branch):
+        """Заполнение полей выбранного филиала"""
+        if branch and branch[0] == self.current_branch_id:
             self.branch_name_edit.setText(branch[1])
             self.floors_spin.setValue(branch[2])
             self.branch_address_edit.setText(branch[3] or "")
             self.branch_group.setEnabled(True)
 
-            # Подсчитываем сотрудников и комнаты
-            employees = self.db.get_employees(self.current_branch_id)
-            rooms = self.db.get_rooms(self.current_branch_id)
-            self.employees_spin.setValue(len(employees))
-            self.rooms_spin.setValue(len(rooms))
+            self.update_branch_counters()
+
+    def update_branch_counters(self):
+        """Счетчики филиала одним агрегатным запросом (в фоне)"""
+        self.db_executor.submit('branch_summary', self.db.get_branch_summary, self.current_branch_id,
+                                on_result=self.show_branch_counters)
+
+    def show_branch_counters(self, summary):
+        self.employees_spin.setValue(summary['employees_count'])
+        self.rooms_spin.setValue(summary['rooms_count'])
+        self.statusBar().showMessage(
+            f"Оборудование филиала: {summary['equipment_count']} шт. "
+            f"на сумму {summary['equipment_value']} руб."
+        )
 
     def save_branch(self):
         """Сохранение текущего филиала"""
@@ -712,13 +872,6 @@ class MainWindow(QMainWindow):
             self.branch_address_edit.text().strip()
         )
 
-        # Обновляем название в списке
-        for i in range(self.branches_list.count()):
-            item = self.branches_list.item(i)
-            if item.data(Qt.UserRole) == self.current_branch_id:
-                item.setText(name)
-                break
-
         QMessageBox.information(self, "Успех", "Филиал сохранен")
 
     def delete_branch(self):
@@ -732,7 +885,6 @@ class MainWindow(QMainWindow):
 
         if reply == QMessageBox.Yes:
             self.db.delete_branch(self.current_branch_id)
-            self.load_branches()
             self.branch_group.setEnabled(False)
             self.current_branch_id = None
             self.changes_made = True
@@ -740,23 +892,17 @@ class MainWindow(QMainWindow):
     def open_employees_dialog(self):
         """Открыть диалог сотрудников"""
         if self.current_branch_id:
-            dialog = EmployeesDialog(self.db, self.current_branch_id,
+            dialog = EmployeesDialog(self.db, self.bus, self.current_branch_id,
                                      self.branch_name_edit.text(), self)
             dialog.exec()
-            # Обновляем счетчик
-            employees = self.db.get_employees(self.current_branch_id)
-            self.employees_spin.setValue(len(employees))
             self.changes_made = True
 
     def open_rooms_dialog(self):
         """Открыть диалог комнат"""
         if self.current_branch_id:
-            dialog = RoomsDialog(self.db, self.current_branch_id,
+            dialog = RoomsDialog(self.db, self.bus, self.current_branch_id,
                                  self.branch_name_edit.text(), self)
             dialog.exec()
-            # Обновляем счетчик
-            rooms = self.db.get_rooms(self.current_branch_id)
-            self.rooms_spin.setValue(len(rooms))
             self.changes_made = True
 
     def save_all_changes(self):